@@ -42,6 +42,10 @@ class ChatMessage(models.Model):
     class Meta:
         db_table = 'chat_messages'
         ordering = ['timestamp']
+        indexes = [
+            # Historique d'une session dans l'ordre chronologique
+            models.Index(fields=['session', 'timestamp'], name='chat_message_session_ts_idx'),
+        ]
 
 
 class ChatContext(models.Model):
@@ -3,10 +3,12 @@ import json
 import uuid
 from datetime import datetime
 from django.conf import settings
+from django.db import transaction
 from .models import ChatSession, ChatMessage, ChatContext
 from users.models import User
 from detection.models import SkinAnalysis
 from recommendations.models import Product
+from skin_ai.bulk import bulk_save
 import os
 
 
@@ -370,6 +372,16 @@ Réponds en français de manière naturelle et professionnelle."""
             tokens_used=tokens_used
         )
     
+    def save_messages(self, session, messages):
+        """
+        Sauvegarde plusieurs messages (ex: question + réponse) et met à jour
+        la date de modification de la session, en une seule transaction
+        """
+        with transaction.atomic():
+            created = bulk_save(ChatMessage, messages)
+            session.save(update_fields=['updated_at'])
+        return created
+    
     def get_session_messages(self, session, limit=20):
         """Récupère les messages d'une session"""
         return ChatMessage.objects.filter(session=session).order_by('timestamp')[:limit]
@@ -0,0 +1,42 @@
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+from .models import ChatMessage, ChatSession
+
+
+class ChatHistoryTest(TestCase):
+    """Le message utilisateur est enregistré avant l'appel au LLM"""
+
+    url = '/api/chat-ai/chat/'
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(username='chat', email='chat@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        key_patch = mock.patch('chat_ai.views.GROQ_API_KEY', 'cle-de-test')
+        key_patch.start()
+        self.addCleanup(key_patch.stop)
+
+    def history(self):
+        session = ChatSession.objects.get(user=self.user)
+        return list(ChatMessage.objects.filter(session=session).order_by('timestamp', 'id').values_list('role', 'content'))
+
+    def test_user_message_precedes_reply(self):
+        def groq_reply(*args, **kwargs):
+            # Le message utilisateur est déjà en base pendant l'appel
+            self.assertEqual(self.history(), [('user', 'Ma peau tiraille')])
+            return mock.Mock(status_code=200, json=lambda: {
+                'choices': [{'message': {'content': 'Hydratez matin et soir.'}}], 'usage': {'total_tokens': 12},
+            })
+
+        with mock.patch('chat_ai.views.requests.post', side_effect=groq_reply):
+            response = self.client.post(self.url, {'message': 'Ma peau tiraille'}, format='json')
+        self.assertEqual(response.json()['response'], 'Hydratez matin et soir.')
+        self.assertEqual(self.history(), [('user', 'Ma peau tiraille'), ('assistant', 'Hydratez matin et soir.')])
+
+    def test_user_message_kept_when_llm_call_fails(self):
+        with mock.patch('chat_ai.views.requests.post', side_effect=ConnectionError('timeout')):
+            response = self.client.post(self.url, {'message': 'Ma peau tiraille'}, format='json')
+        self.assertIn('problème technique', response.json()['response'])
+        self.assertEqual(self.history(), [('user', 'Ma peau tiraille')])
@@ -186,7 +186,8 @@ def chat_with_ai(request):
             else:
                 chat_session = chat_service.create_session(user)
             
-            # Sauvegarder le message utilisateur dans la base de données
+            # Sauvegarder le message utilisateur avant l'appel au LLM : il précède
+            # la réponse dans l'historique et est conservé si l'appel échoue
             if chat_session and user_msg:
                 ChatMessage.objects.create(
                     session=chat_session,
@@ -240,12 +241,12 @@ Tu dois répondre en tenant compte de ces résultats d'analyse spécifiques. Exp
             
             # Sauvegarder la réponse fallback dans la base de données si utilisateur authentifié
             if chat_session and user:
-                ChatMessage.objects.create(
+                chat_service.save_messages(chat_session, [ChatMessage(
                     session=chat_session,
                     role='assistant',
                     content=fallback_response,
                     tokens_used=0
-                )
+                )])
             
             return Response({
                 "response": fallback_response,
@@ -286,12 +287,12 @@ Tu dois répondre en tenant compte de ces résultats d'analyse spécifiques. Exp
             
             # Sauvegarder la réponse fallback dans la base de données si utilisateur authentifié
             if chat_session and user:
-                ChatMessage.objects.create(
+                chat_service.save_messages(chat_session, [ChatMessage(
                     session=chat_session,
                     role='assistant',
                     content=fallback_response,
                     tokens_used=0
-                )
+                )])
             
             return Response({
                 "response": fallback_response,
@@ -325,12 +326,12 @@ Tu dois répondre en tenant compte de ces résultats d'analyse spécifiques. Exp
                     
                     # Sauvegarder la réponse fallback dans la base de données si utilisateur authentifié
                     if chat_session and user:
-                        ChatMessage.objects.create(
+                        chat_service.save_messages(chat_session, [ChatMessage(
                             session=chat_session,
                             role='assistant',
                             content=fallback_response,
                             tokens_used=0
-                        )
+                        )])
                     
                     return Response({
                         "response": fallback_response,
@@ -346,14 +347,13 @@ Tu dois répondre en tenant compte de ces résultats d'analyse spécifiques. Exp
         
         # Sauvegarder la réponse de l'IA dans la base de données si utilisateur authentifié
         if chat_session and user:
-            ChatMessage.objects.create(
+            # Réponse + date de modification de la session en une transaction
+            chat_service.save_messages(chat_session, [ChatMessage(
                 session=chat_session,
                 role='assistant',
                 content=ai_text,
                 tokens_used=tokens_used
-            )
-            # Mettre à jour la date de modification de la session
-            chat_session.save()
+            )])
         
         print(f"Groq Response (preview): {ai_text[:200]}...")
         
@@ -0,0 +1,169 @@
+"""
+Broker d'inférence local avec micro-batching dynamique
+======================================================
+
+Les requêtes d'analyse provenant des vues sont mises en file d'attente puis
+regroupées en micro-batches (bornés par une taille maximale et un temps
+d'attente maximal) avant d'être envoyées à SkinAnalysisService.analyze_skin_batch.
+Chaque requête reçoit un Future qui sera résolu avec son propre résultat.
+
+Configuration (settings.INFERENCE_BROKER):
+    ENABLED: Activer le broker (sinon les vues appellent analyze_skin directement)
+    MAX_BATCH_SIZE: Nombre maximal d'images par micro-batch
+    MAX_WAIT_MS: Temps d'attente maximal pour compléter un micro-batch
+    TIMEOUT: Temps maximal d'attente d'un résultat côté requête (secondes)
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BROKER_CONFIG = {
+    'ENABLED': True,
+    'MAX_BATCH_SIZE': 8,
+    'MAX_WAIT_MS': 10,
+    'TIMEOUT': 120,
+}
+
+
+def get_broker_config():
+    """Configuration du broker, complétée par les valeurs par défaut"""
+    config = dict(DEFAULT_BROKER_CONFIG)
+    config.update(getattr(settings, 'INFERENCE_BROKER', {}))
+    return config
+
+
+class InferenceBroker:
+    """File d'attente d'inférence avec micro-batching et métriques"""
+
+    def __init__(self, service, max_batch_size=8, max_wait_ms=10):
+        self.service = service
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms / 1000.0)
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+
+        # Métriques
+        self._total_requests = 0
+        self._total_batches = 0
+        self._batch_size_counts = {}
+        self._max_queue_depth = 0
+        self._total_wait_time = 0.0
+        self._total_batch_time = 0.0
+
+    def _ensure_worker(self):
+        """Démarrer le thread de traitement au premier usage"""
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name='inference-broker', daemon=True
+                )
+                self._worker.start()
+
+    def submit(self, image, user=None):
+        """
+        Mettre une analyse en file d'attente
+
+        Args:
+            image: Image à analyser (chemin, octets ou tableau RGB décodé)
+            user: Instance User Django (optionnel)
+
+        Returns:
+            Future résolu avec le dictionnaire de résultats de analyze_skin
+        """
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((image, user, future, time.time()))
+
+        with self._lock:
+            self._total_requests += 1
+            self._max_queue_depth = max(self._max_queue_depth, self._queue.qsize())
+
+        return future
+
+    def analyze(self, image, user=None, timeout=None):
+        """Soumettre une analyse et attendre son résultat"""
+        return self.submit(image, user=user).result(timeout=timeout)
+
+    def _collect_batch(self):
+        """Attendre une requête puis compléter le batch jusqu'à la taille ou au délai maximal"""
+        batch = [self._queue.get()]
+        deadline = time.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.time()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _run(self):
+        """Boucle principale du thread de traitement"""
+        while True:
+            batch = self._collect_batch()
+
+            # Ignorer les requêtes annulées par l'appelant
+            batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            images = [item[0] for item in batch]
+            users = [item[1] for item in batch]
+            started_at = time.time()
+
+            try:
+                results = self.service.analyze_skin_batch(images, users=users)
+                for (_, _, future, _), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                logger.error(f"Erreur lors du traitement d'un micro-batch: {e}", exc_info=True)
+                self._run_isolated(batch)
+
+            finished_at = time.time()
+            with self._lock:
+                self._total_batches += 1
+                self._batch_size_counts[len(batch)] = self._batch_size_counts.get(len(batch), 0) + 1
+                self._total_wait_time += sum(started_at - item[3] for item in batch)
+                self._total_batch_time += finished_at - started_at
+
+    def _run_isolated(self, batch):
+        """
+        Rejouer un micro-batch en échec requête par requête
+
+        Seul le Future de la requête fautive reçoit l'exception : les autres
+        requêtes du lot (y compris celles d'autres utilisateurs) obtiennent
+        leur résultat.
+        """
+        for image, user, future, _ in batch:
+            try:
+                future.set_result(self.service.analyze_skin_batch([image], users=[user])[0])
+            except Exception as e:
+                future.set_exception(e)
+
+    def get_metrics(self):
+        """Métriques de la file d'attente et des micro-batches"""
+        with self._lock:
+            processed = sum(size * count for size, count in self._batch_size_counts.items())
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000.0,
+                'queue_depth': self._queue.qsize(),
+                'max_queue_depth': self._max_queue_depth,
+                'total_requests': self._total_requests,
+                'total_batches': self._total_batches,
+                'batch_size_histogram': dict(sorted(self._batch_size_counts.items())),
+                'average_batch_size': processed / self._total_batches if self._total_batches else 0.0,
+                'average_queue_wait_ms': 1000.0 * self._total_wait_time / processed if processed else 0.0,
+                'average_batch_time_ms': 1000.0 * self._total_batch_time / self._total_batches if self._total_batches else 0.0,
+            }
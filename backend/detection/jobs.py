@@ -0,0 +1,336 @@
+"""
+Analyses de peau asynchrones
+============================
+
+L'upload en mode asynchrone crée la ligne SkinAnalysis puis délègue l'analyse
+à un pool de workers local. Chaque étape (YOLO, EfficientNet, fusion XGBoost)
+met à jour la ligne dès qu'elle se termine, ce qui permet au client de suivre
+la progression par polling (analysis/<id>/status/, le mode recommandé) ou via
+server-sent events (analysis/<id>/events/). Un flux SSE occupe un worker
+pendant toute l'analyse, jusqu'à EVENTS_TIMEOUT : avec des workers
+synchrones (gunicorn sync), chaque client SSE bloque un worker ; ne l'utiliser
+qu'avec des workers à threads (gthread) ou un serveur ASGI.
+
+La mise en file, le démarrage et chaque étape renouvellent heartbeat_at. Si le
+serveur s'arrête pendant une analyse, la ligne reste PENDING ou RUNNING avec un
+heartbeat_at qui vieillit : resume_analysis_jobs (au démarrage ou via la
+commande du même nom) la reprend par une mise à jour conditionnelle (un seul
+processus gagne) et relance l'analyse depuis l'image enregistrée. Si l'image
+ne peut pas être relue, l'analyse passe en FAILED.
+
+Une analyse restée trop longtemps dans la file du pool peut ainsi être
+relancée alors que la tâche d'origine n'a pas encore démarré (ou tourne
+encore). Le démarrage d'une analyse est donc une mise à jour conditionnelle
+qui enregistre un nouveau claim_token, et chaque écriture du worker (étapes,
+résultat, échec) est filtrée sur ce jeton, comme pour les explorations
+(scraped_products/jobs.py) : la reprise efface le jeton, le worker d'origine
+voit sa prochaine écriture refusée (AnalysisReleased) et abandonne, et une
+seule exécution publie le résultat.
+
+Configuration (settings.ANALYSIS_JOBS):
+    MAX_WORKERS: Nombre de threads du pool d'analyse
+    STALE_AFTER: Délai sans heartbeat après lequel une analyse active est reprise (secondes)
+    RESUME_ON_STARTUP: Relancer les analyses interrompues au démarrage du serveur (gunicorn.conf.py)
+    EVENTS_POLL_INTERVAL: Intervalle de rafraîchissement du flux SSE (secondes)
+    EVENTS_TIMEOUT: Durée maximale d'un flux SSE (secondes)
+"""
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+from skin_ai.mlops import MLOPS_ENABLED, mlops_integration  # Import MLOps (optionnel)
+from .models import SkinAnalysis
+from .services import skin_analysis_service
+
+logger = logging.getLogger(__name__)
+
+# Étapes du pipeline, dans l'ordre d'exécution
+ANALYSIS_STAGES = ['yolo', 'efficientnet', 'fusion']
+
+# États d'une analyse pouvant être (re)prise par un worker
+ACTIVE_STATUSES = ('PENDING', 'RUNNING')
+
+DEFAULT_JOBS_CONFIG = {
+    'MAX_WORKERS': 2,
+    'STALE_AFTER': 300,
+    'RESUME_ON_STARTUP': False,
+    'EVENTS_POLL_INTERVAL': 0.5,
+    'EVENTS_TIMEOUT': 300,
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class AnalysisReleased(Exception):
+    """L'analyse n'appartient plus à ce worker (supprimée ou relancée ailleurs)"""
+
+
+def get_jobs_config():
+    """Configuration des analyses asynchrones, complétée par les valeurs par défaut"""
+    config = dict(DEFAULT_JOBS_CONFIG)
+    config.update(getattr(settings, 'ANALYSIS_JOBS', {}))
+    return config
+
+
+def get_executor():
+    """Pool de workers partagé, créé au premier usage"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=get_jobs_config()['MAX_WORKERS'],
+                thread_name_prefix='skin-analysis'
+            )
+        return _executor
+
+
+def detection_fields(detections):
+    """Valeurs des champs *_detected / *_severity / *_confidence à partir des détections agrégées"""
+    fields = {}
+    for trouble in ('acne', 'wrinkles', 'dark_spots', 'redness'):
+        fields[f'{trouble}_detected'] = detections[trouble]['detected']
+        fields[f'{trouble}_severity'] = detections[trouble]['severity']
+        fields[f'{trouble}_confidence'] = detections[trouble]['confidence']
+    return fields
+
+
+def _log_prediction(analysis_id, results, processing_time):
+    """MLOps: Logger la prédiction et tracker les performances"""
+    if MLOPS_ENABLED and mlops_integration:
+        try:
+            mlops_integration.track_inference_performance('ensemble', processing_time)
+            mlops_integration.log_prediction_for_monitoring(
+                prediction={
+                    'skin_type': results['skin_type']['prediction'],
+                    'confidence': results['skin_type']['confidence'],
+                    'detections': results['detections'],
+                    'analysis_id': analysis_id
+                },
+                model_name='ensemble'
+            )
+        except Exception as e:
+            logger.warning(f"MLOps logging failed: {e}")
+
+
+def analysis_result_fields(results, processing_time, progress=None):
+    """
+    Valeurs des champs SkinAnalysis à partir des résultats d'une analyse
+
+    Args:
+        results: Dictionnaire retourné par SkinAnalysisService.analyze_skin
+        processing_time: Durée de l'analyse en secondes
+        progress: Progression actuelle de la ligne (complétée par la durée des étapes)
+    """
+    detections = results['detections']
+    fields = {
+        'skin_type_prediction': results['skin_type']['prediction'],
+        'skin_type_confidence': results['skin_type']['confidence'],
+        'processing_time': processing_time,
+        **detection_fields(detections),
+        # Sauvegarder les résultats bruts
+        'raw_cnn_results': results['skin_type'],
+        # Stocker les détections agrégées ET les détections individuelles avec coordonnées
+        'raw_yolo_results': {
+            'aggregated': detections,  # Détections agrégées par type de problème
+            'detections': results.get('raw_results', {}).get('detections', [])  # Détections individuelles avec coordonnées
+        },
+        'model_outputs': results.get('model_outputs'),
+    }
+
+    # Durée de chaque étape du pipeline (YOLO et EfficientNet tournent en parallèle)
+    if results.get('timings_ms'):
+        fields['progress'] = dict(progress or {}, timings_ms=results['timings_ms'])
+    return fields
+
+
+def apply_analysis_results(skin_analysis, results, processing_time):
+    """
+    Enregistrer les résultats d'une analyse sur la ligne SkinAnalysis
+
+    Args:
+        skin_analysis: Instance SkinAnalysis à mettre à jour
+        results: Dictionnaire retourné par SkinAnalysisService.analyze_skin
+        processing_time: Durée de l'analyse en secondes
+    """
+    _log_prediction(skin_analysis.id, results, processing_time)
+
+    # Mettre à jour l'analyse avec les résultats
+    for field, value in analysis_result_fields(results, processing_time, skin_analysis.progress).items():
+        setattr(skin_analysis, field, value)
+    skin_analysis.save()
+
+
+def _queued_progress():
+    return {'current_stage': None, 'completed_stages': [], 'stages': ANALYSIS_STAGES}
+
+
+def submit_analysis_job(skin_analysis, image_bytes):
+    """
+    Mettre une analyse en file d'attente dans le pool de workers
+
+    Args:
+        skin_analysis: Instance SkinAnalysis déjà créée (image sauvegardée)
+        image_bytes: Octets de l'image uploadée (évite de relire le fichier)
+    """
+    skin_analysis.status = 'PENDING'
+    skin_analysis.progress = _queued_progress()
+    skin_analysis.heartbeat_at = timezone.now()
+    skin_analysis.claim_token = None
+    skin_analysis.save(update_fields=['status', 'progress', 'heartbeat_at', 'claim_token'])
+
+    get_executor().submit(run_analysis_job, skin_analysis.id, image_bytes)
+
+
+def _unattended():
+    """Analyses actives sans signal de vie récent d'un worker (filtre)"""
+    stale_before = timezone.now() - timedelta(seconds=get_jobs_config()['STALE_AFTER'])
+    return Q(status__in=ACTIVE_STATUSES) & (Q(heartbeat_at__isnull=True) | Q(heartbeat_at__lt=stale_before))
+
+
+def interrupted_analyses():
+    """Analyses actives dont aucun worker ne donne signe de vie (serveur arrêté pendant l'analyse)"""
+    return SkinAnalysis.objects.filter(_unattended())
+
+
+def resume_analysis_jobs():
+    """
+    Relancer les analyses interrompues depuis leur image enregistrée
+
+    Returns:
+        Nombre d'analyses remises en file d'attente
+    """
+    resumed = 0
+    for analysis_id in interrupted_analyses().values_list('id', flat=True):
+        # Mise à jour conditionnelle : un seul processus reprend chaque analyse ;
+        # claim_token effacé : les écritures d'un worker encore vivant sont refusées
+        if interrupted_analyses().filter(id=analysis_id).update(
+            status='PENDING', progress=_queued_progress(), heartbeat_at=timezone.now(), error_message=None,
+            claim_token=None
+        ):
+            get_executor().submit(run_analysis_job, analysis_id, None)
+            resumed += 1
+    if resumed:
+        logger.info(f"{resumed} analyse(s) interrompue(s) relancée(s)")
+    return resumed
+
+
+def _claim(analysis_id):
+    """
+    Démarrer une analyse en file d'attente ou abandonnée (mise à jour conditionnelle : un seul worker gagne)
+
+    Returns:
+        Jeton du worker, à fournir à chaque écriture, ou None si l'analyse n'est pas disponible
+    """
+    token = uuid.uuid4()
+    claimed = SkinAnalysis.objects.filter(
+        Q(status='PENDING', claim_token__isnull=True) | _unattended(), id=analysis_id
+    ).update(
+        status='RUNNING',
+        progress={'current_stage': ANALYSIS_STAGES[0], 'completed_stages': [], 'stages': ANALYSIS_STAGES},
+        heartbeat_at=timezone.now(),
+        claim_token=token,
+    )
+    return token if claimed else None
+
+
+def _owned(analysis_id, token):
+    """Analyse encore exécutée par le worker détenteur du jeton (filtre des écritures)"""
+    return SkinAnalysis.objects.filter(id=analysis_id, status='RUNNING', claim_token=token)
+
+
+def run_analysis_job(analysis_id, image_bytes=None):
+    """
+    Exécuter une analyse en arrière-plan en publiant chaque étape sur la ligne SkinAnalysis
+
+    Args:
+        analysis_id: Identifiant de la SkinAnalysis
+        image_bytes: Octets de l'image (None : relus depuis SkinAnalysis.image, reprise après arrêt)
+    """
+    token = None
+    close_old_connections()
+    try:
+        token = _claim(analysis_id)
+        if token is None:
+            return  # Déjà terminée, ou exécutée par un autre worker
+        skin_analysis = SkinAnalysis.objects.select_related('user').get(id=analysis_id)
+        if image_bytes is None:
+            with skin_analysis.image.open('rb') as image_file:
+                image_bytes = image_file.read()
+        completed_stages = []
+
+        def progress(current_stage):
+            return {
+                'current_stage': current_stage,
+                'completed_stages': list(completed_stages),
+                'stages': ANALYSIS_STAGES
+            }
+
+        def on_stage(stage, payload):
+            completed_stages.append(stage)
+            remaining = [s for s in ANALYSIS_STAGES if s not in completed_stages]
+            fields = {'progress': progress(remaining[0] if remaining else None), 'heartbeat_at': timezone.now()}
+
+            # Publier les résultats partiels sans attendre la fin du pipeline
+            if stage == 'yolo':
+                detections = skin_analysis_service.map_detections(
+                    payload['detected_troubles'], payload['yolo_probs']
+                )
+                fields.update(detection_fields(detections))
+                fields['raw_yolo_results'] = {
+                    'aggregated': detections,
+                    'detections': payload['detections']
+                }
+            elif stage == 'efficientnet':
+                skin_type = payload['skin_type']
+                fields['skin_type_prediction'] = skin_analysis_service.SKIN_TYPE_MAP.get(skin_type, 'NORMAL')
+                fields['skin_type_confidence'] = payload['skin_probs'].get(skin_type, 0.0)
+
+            # Une exception ici interrompt le pipeline (relayée en résultat d'erreur par analyze_skin)
+            if not _owned(analysis_id, token).update(**fields):
+                raise AnalysisReleased(analysis_id)
+
+        start_time = time.time()
+        results = skin_analysis_service.analyze_skin(
+            image_bytes, user=skin_analysis.user, on_stage=on_stage
+        )
+        processing_time = time.time() - start_time
+
+        if 'error' in results:
+            if not _owned(analysis_id, token).update(status='FAILED', error_message=results['error']):
+                raise AnalysisReleased(analysis_id)
+            return
+
+        fields = analysis_result_fields(results, processing_time, progress(None))
+        fields.setdefault('progress', progress(None))
+        if not _owned(analysis_id, token).update(status='COMPLETED', heartbeat_at=timezone.now(), **fields):
+            raise AnalysisReleased(analysis_id)
+        _log_prediction(analysis_id, results, processing_time)
+
+    except AnalysisReleased:
+        logger.info(f"Analyse {analysis_id} interrompue: relancée ailleurs ou supprimée")
+    except Exception as e:
+        logger.error(f"Erreur lors de l'analyse asynchrone {analysis_id}: {e}", exc_info=True)
+        if token is not None:
+            _owned(analysis_id, token).update(status='FAILED', error_message=str(e))
+    finally:
+        close_old_connections()
+
+
+def analysis_status_payload(skin_analysis):
+    """État courant d'une analyse, renvoyé par le polling et le flux SSE"""
+    return {
+        'id': skin_analysis.id,
+        'status': skin_analysis.status,
+        'progress': skin_analysis.progress,
+        'error_message': skin_analysis.error_message,
+        'skin_type_prediction': skin_analysis.skin_type_prediction,
+        'skin_type_confidence': skin_analysis.skin_type_confidence,
+        'detections': (skin_analysis.raw_yolo_results or {}).get('aggregated'),
+    }
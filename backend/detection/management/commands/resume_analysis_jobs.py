@@ -0,0 +1,40 @@
+"""
+Relancer les analyses interrompues
+
+Les analyses PENDING ou RUNNING dont le worker ne donne plus signe de vie
+(settings.ANALYSIS_JOBS['STALE_AFTER']) sont relancées une par une, dans ce
+processus, depuis leur image enregistrée.
+
+Usage:
+    python manage.py resume_analysis_jobs
+    python manage.py resume_analysis_jobs --list
+"""
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from detection.jobs import interrupted_analyses, run_analysis_job
+from detection.models import SkinAnalysis
+
+
+class Command(BaseCommand):
+    help = "Relance les analyses interrompues depuis leur image enregistrée"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--list', action='store_true', help='Lister les analyses interrompues sans les relancer')
+
+    def handle(self, *args, **options):
+        analyses = list(interrupted_analyses().order_by('id'))
+        if not analyses:
+            self.stdout.write("Aucune analyse à relancer")
+            return
+
+        for analysis in analyses:
+            self.stdout.write(f"#{analysis.id} {analysis.status} ({analysis.image.name})")
+            if options['list']:
+                continue
+            # Mise à jour conditionnelle : ignorée si un autre processus l'a reprise entre-temps
+            if not interrupted_analyses().filter(id=analysis.id).update(heartbeat_at=timezone.now()):
+                continue
+            run_analysis_job(analysis.id)
+            analysis = SkinAnalysis.objects.get(id=analysis.id)
+            style = self.style.SUCCESS if analysis.status == 'COMPLETED' else self.style.ERROR
+            self.stdout.write(style(f"   {analysis.status}" + (f": {analysis.error_message}" if analysis.error_message else '')))
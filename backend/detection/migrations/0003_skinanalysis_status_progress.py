@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-17 15:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('detection', '0002_skinanalysis_annotated_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='skinanalysis',
+            name='error_message',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='skinanalysis',
+            name='progress',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='skinanalysis',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'En attente'), ('RUNNING', 'En cours'), ('COMPLETED', 'Terminé'), ('FAILED', 'Échoué')], default='COMPLETED', max_length=20),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 16:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('detection', '0003_skinanalysis_status_progress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='skinanalysis',
+            name='model_outputs',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-17 16:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('detection', '0004_skinanalysis_model_outputs'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='skinanalysis',
+            index=models.Index(fields=['user', '-analysis_date'], name='skin_analysis_user_date_idx'),
+        ),
+    ]
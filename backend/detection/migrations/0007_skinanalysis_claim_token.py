@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 18:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('detection', '0006_skinanalysis_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='skinanalysis',
+            name='claim_token',
+            field=models.UUIDField(blank=True, editable=False, null=True),
+        ),
+    ]
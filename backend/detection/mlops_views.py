@@ -5,21 +5,11 @@ from rest_framework import status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 import logging
+from skin_ai.mlops import MLOPS_ENABLED, mlops_integration  # Import MLOps (optionnel)
+from .result_cache import analysis_result_cache
 
 logger = logging.getLogger(__name__)
 
-# Import MLOps (optionnel)
-try:
-    import sys
-    from pathlib import Path
-    BASE_DIR = Path(__file__).parent.parent.parent.parent
-    sys.path.insert(0, str(BASE_DIR))
-    from mlops.integration.django_integration import mlops_integration
-    MLOPS_ENABLED = True
-except ImportError:
-    MLOPS_ENABLED = False
-    mlops_integration = None
-
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
@@ -46,9 +36,10 @@ def mlops_health_check(request):
 @permission_classes([permissions.IsAuthenticated])
 def mlops_model_stats(request):
     """Obtenir les statistiques des modèles"""
-    if not MLOPS_ENABLED:
+    if not MLOPS_ENABLED or not mlops_integration.enabled:
         return Response({
-            'error': 'MLOps not available'
+            'error': 'MLOps not available',
+            'result_cache': analysis_result_cache.get_stats()
         }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
     
     try:
@@ -56,7 +47,8 @@ def mlops_model_stats(request):
             'prediction_stats': mlops_integration.monitor.get_prediction_stats(hours=24),
             'performance_metrics': mlops_integration.performance_tracker.get_latest_metrics('ensemble'),
             'average_inference_time': mlops_integration.performance_tracker.get_average_inference_time('ensemble'),
-            'error_summary': mlops_integration.performance_tracker.get_error_summary()
+            'error_summary': mlops_integration.performance_tracker.get_error_summary(),
+            'result_cache': analysis_result_cache.get_stats()
         }
         return Response(stats, status=status.HTTP_200_OK)
     except Exception as e:
@@ -65,3 +57,23 @@ def mlops_model_stats(request):
             'error': str(e)
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def inference_broker_stats(request):
+    """Obtenir les métriques du broker de micro-batching (profondeur de file, taille des batches)"""
+    from .services import inference_broker
+    from .inference_broker import get_broker_config
+    
+    stats = inference_broker.get_metrics()
+    stats['enabled'] = get_broker_config()['ENABLED']
+    return Response(stats, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def startup_report(request):
+    """Rapport de démarrage : durées de chargement des services et mémoire du worker"""
+    from skin_ai.lazy_services import get_startup_report
+    
+    return Response(get_startup_report(), status=status.HTTP_200_OK)
@@ -38,12 +38,36 @@ class SkinAnalysis(models.Model):
     raw_cnn_results = models.JSONField(default=dict, blank=True)
     raw_yolo_results = models.JSONField(default=dict, blank=True)
     
+    # Sorties compactes des modèles (probabilités YOLO / EfficientNet + fusion)
+    # permettant de relancer uniquement la fusion XGBoost (voir refit_analysis)
+    model_outputs = models.JSONField(null=True, blank=True)
+    
+    # Suivi du traitement (analyses asynchrones)
+    status = models.CharField(
+        max_length=20,
+        choices=[
+            ('PENDING', 'En attente'),
+            ('RUNNING', 'En cours'),
+            ('COMPLETED', 'Terminé'),
+            ('FAILED', 'Échoué'),
+        ],
+        default='COMPLETED'
+    )
+    progress = models.JSONField(default=dict, blank=True)  # {'current_stage': 'yolo', 'completed_stages': [...]}
+    error_message = models.TextField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)  # Dernier signal du worker (mise en file, étapes)
+    claim_token = models.UUIDField(null=True, blank=True, editable=False)  # Jeton du worker qui exécute l'analyse
+    
     def __str__(self):
         return f"Analyse {self.id} - {self.user.username} - {self.analysis_date}"
     
     class Meta:
         db_table = 'skin_analyses'
         ordering = ['-analysis_date']
+        indexes = [
+            # Historique d'un utilisateur, du plus récent au plus ancien
+            models.Index(fields=['user', '-analysis_date'], name='skin_analysis_user_date_idx'),
+        ]
 
 
 class SegmentationResult(models.Model):
@@ -0,0 +1,194 @@
+"""
+Cache des résultats d'analyse par contenu d'image
+=================================================
+
+Une même photo ré-uploadée (ou renvoyée par un retry du frontend) ne repasse
+pas par les modèles : le résultat brut de SkinDiagnostic (sorties YOLO,
+EfficientNet et fusion) est mis en cache sous une clé dérivée :
+    - du hash SHA-256 du contenu de l'image,
+    - de l'empreinte des modèles chargés (SkinDiagnostic.model_version),
+    - des infos utilisateur normalisées.
+
+Deux niveaux : un LRU borné en mémoire et, optionnellement, des fichiers JSON
+sur disque partagés entre workers et redémarrages. L'image annotée n'est pas
+stockée, elle est redessinée à partir des détections lors d'un hit.
+
+Configuration (settings.ANALYSIS_RESULT_CACHE):
+    ENABLED: Activer le cache
+    MAX_ENTRIES: Taille du LRU en mémoire
+    DISK_DIR: Dossier du niveau disque (None = désactivé)
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RESULT_CACHE_CONFIG = {
+    'ENABLED': True,
+    'MAX_ENTRIES': 512,
+    'DISK_DIR': None,
+}
+
+
+def get_result_cache_config():
+    """Configuration du cache de résultats, complétée par les valeurs par défaut"""
+    config = dict(DEFAULT_RESULT_CACHE_CONFIG)
+    config.update(getattr(settings, 'ANALYSIS_RESULT_CACHE', {}))
+    return config
+
+
+def image_content_hash(image):
+    """
+    Hash SHA-256 du contenu d'une image
+
+    Args:
+        image: Chemin, octets encodés ou tableau RGB décodé
+
+    Returns:
+        Hash hexadécimal, ou None si l'image ne peut pas être lue
+    """
+    if isinstance(image, np.ndarray):
+        digest = hashlib.sha256(f"{image.shape}|{image.dtype}|".encode('utf-8'))
+        digest.update(np.ascontiguousarray(image).tobytes())
+        return digest.hexdigest()
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(image).hexdigest()
+    if hasattr(image, 'read'):
+        return None
+    try:
+        digest = hashlib.sha256()
+        with open(image, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    except (OSError, TypeError):
+        return None
+
+
+def normalize_user_info(user_info, defaults):
+    """Infos utilisateur canoniques : valeurs par défaut complétées, nombres en float"""
+    normalized = dict(defaults)
+    normalized.update(user_info or {})
+    return {
+        key: float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else value
+        for key, value in sorted(normalized.items())
+    }
+
+
+class AnalysisResultCache:
+    """Cache LRU en mémoire avec niveau disque optionnel et compteurs hit/miss"""
+
+    def __init__(self, max_entries=512, disk_dir=None, enabled=True):
+        self.max_entries = max(1, int(max_entries))
+        self.disk_dir = disk_dir
+        self.enabled = enabled
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Compteurs
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def make_key(self, image_hash, model_version, user_info):
+        """Clé de cache : contenu de l'image + version des modèles + infos utilisateur"""
+        payload = json.dumps([image_hash, model_version, user_info], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def get(self, key):
+        """Résultat brut en cache (sans image annotée) ou None"""
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self._memory_hits += 1
+                return result
+
+        if self.disk_dir:
+            try:
+                with open(self._disk_path(key), 'r', encoding='utf-8') as f:
+                    result = json.load(f)
+                self._store_memory(key, result)
+                with self._lock:
+                    self._disk_hits += 1
+                return result
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError) as e:
+                logger.warning(f"Entrée de cache disque illisible {key}: {e}")
+
+        with self._lock:
+            self._misses += 1
+        return None
+
+    def set(self, key, result):
+        """Mettre en cache un résultat brut de SkinDiagnostic"""
+        if not self.enabled:
+            return
+
+        entry = {k: v for k, v in result.items() if k != 'annotated_image'}
+        self._store_memory(key, entry)
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(entry, f)
+                os.replace(tmp_path, path)
+            except (OSError, TypeError, ValueError) as e:
+                logger.warning(f"Écriture du cache disque impossible {key}: {e}")
+
+    def _store_memory(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self):
+        """Vider le niveau mémoire"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        """Compteurs du cache (hits mémoire/disque, misses, taux de hit)"""
+        with self._lock:
+            hits = self._memory_hits + self._disk_hits
+            lookups = hits + self._misses
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'disk_enabled': bool(self.disk_dir),
+                'hits': hits,
+                'memory_hits': self._memory_hits,
+                'disk_hits': self._disk_hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'hit_rate': hits / lookups if lookups else 0.0,
+            }
+
+
+_cache_config = get_result_cache_config()
+analysis_result_cache = AnalysisResultCache(
+    max_entries=_cache_config['MAX_ENTRIES'],
+    disk_dir=_cache_config['DISK_DIR'],
+    enabled=_cache_config['ENABLED']
+)
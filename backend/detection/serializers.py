@@ -13,9 +13,10 @@ class SkinAnalysisSerializer(serializers.ModelSerializer):
             'wrinkles_detected', 'wrinkles_severity', 'wrinkles_confidence',
             'dark_spots_detected', 'dark_spots_severity', 'dark_spots_confidence',
             'redness_detected', 'redness_severity', 'redness_confidence',
-            'analysis_date', 'processing_time', 'raw_cnn_results', 'raw_yolo_results'
+            'analysis_date', 'processing_time', 'raw_cnn_results', 'raw_yolo_results',
+            'status', 'progress', 'error_message', 'model_outputs'
         ]
-        read_only_fields = ['id', 'analysis_date']
+        read_only_fields = ['id', 'analysis_date', 'status', 'progress', 'error_message', 'model_outputs']
 
 
 class SegmentationResultSerializer(serializers.ModelSerializer):
@@ -2,17 +2,12 @@
 Services pour l'analyse de peau avec IA - Utilise les 5 modèles intégrés
 """
 import os
+import time
 import logging
 from django.conf import settings
-
-# Import optionnel pour permettre le démarrage sans dépendances ML
-try:
-    from .skin_diagnostic import SkinDiagnostic
-    SKIN_DIAGNOSTIC_AVAILABLE = True
-except ImportError as e:
-    SKIN_DIAGNOSTIC_AVAILABLE = False
-    SkinDiagnostic = None
-    logging.getLogger(__name__).warning(f"SkinDiagnostic non disponible: {e}")
+from skin_ai.lazy_services import LazyService
+from .inference_broker import InferenceBroker, get_broker_config
+from .result_cache import analysis_result_cache, image_content_hash, normalize_user_info
 
 logger = logging.getLogger(__name__)
 
@@ -20,13 +15,41 @@ logger = logging.getLogger(__name__)
 class SkinAnalysisService:
     """Service principal pour l'analyse de peau utilisant les 5 modèles"""
     
+    # Conversion des labels EfficientNet vers les valeurs stockées en base
+    SKIN_TYPE_MAP = {
+        'Dry': 'DRY',
+        'Normal': 'NORMAL',
+        'Oily': 'OILY'
+    }
+    
     def __init__(self):
         self.models_path = os.path.join(settings.ML_MODELS_PATH, 'model skin', 'models')
         self.diagnostic = None
+        self.model_version = None
+        
+        # Import optionnel pour permettre le démarrage sans dépendances ML
+        # (différé ici : torch et ultralytics ne sont importés qu'au premier usage)
+        try:
+            from .skin_diagnostic import SkinDiagnostic
+        except ImportError as e:
+            SkinDiagnostic = None
+            logger.warning(f"SkinDiagnostic non disponible: {e}")
         
-        if SKIN_DIAGNOSTIC_AVAILABLE:
+        if SkinDiagnostic is not None:
             try:
-                self.diagnostic = SkinDiagnostic(models_dir=self.models_path)
+                diagnostic_config = getattr(settings, 'SKIN_DIAGNOSTIC', {})
+                self.diagnostic = SkinDiagnostic(
+                    models_dir=self.models_path,
+                    parallel_stages=diagnostic_config.get('PARALLEL_STAGES', True),
+                    stage_threads={
+                        'yolo': diagnostic_config.get('YOLO_THREADS'),
+                        'efficientnet': diagnostic_config.get('EFFICIENTNET_THREADS'),
+                    },
+                    runtime=diagnostic_config.get('RUNTIME', 'eager'),
+                    quantized=diagnostic_config.get('QUANTIZED', False),
+                    mmap_weights=diagnostic_config.get('MMAP_WEIGHTS', False)
+                )
+                self.model_version = self.diagnostic.model_version()
                 logger.info("✅ Système de diagnostic dermatologique initialisé avec succès")
             except Exception as e:
                 logger.error(f"❌ Erreur lors de l'initialisation du système de diagnostic: {e}")
@@ -66,100 +89,294 @@ class SkinAnalysisService:
         
         return user_info
     
-    def analyze_skin(self, image_path, user=None):
+    def analyze_skin(self, image, user=None, on_stage=None):
         """
         Analyser complètement la peau avec les 5 modèles
         
         Args:
-            image_path: Chemin vers l'image à analyser
+            image: Image à analyser (chemin, octets de l'upload ou tableau RGB décodé)
             user: Instance User Django (optionnel) pour utiliser les infos utilisateur
+            on_stage: Callback optionnel (stage, payload) appelé après chaque modèle
         
         Returns:
             Dictionnaire avec tous les résultats de l'analyse
         """
-        if not SKIN_DIAGNOSTIC_AVAILABLE or self.diagnostic is None:
+        if self.diagnostic is None:
             logger.error("Système de diagnostic non disponible")
-            return {
-                'error': 'Système de diagnostic non disponible',
-                'skin_type': {'prediction': None, 'confidence': 0.0},
-                'detections': {}
-            }
+            return self._error_result('Système de diagnostic non disponible')
         
         try:
             # Préparer les infos utilisateur
             user_info = self._get_user_info(user) if user else None
             
-            # Analyser l'image avec tous les modèles
-            result = self.diagnostic.analyze_image(image_path, user_info=user_info)
+            # Même image, mêmes modèles, mêmes infos : réutiliser le résultat
+            cache_key = self._cache_key(image, user_info)
+            cached = analysis_result_cache.get(cache_key) if cache_key else None
+            if cached is not None:
+                return self._format_result(self._result_from_cache(image, cached, on_stage))
             
-            # Convertir les résultats au format attendu par Django
-            skin_type_map = {
-                'Dry': 'DRY',
-                'Normal': 'NORMAL',
-                'Oily': 'OILY'
-            }
+            # Analyser l'image avec tous les modèles
+            result = self.diagnostic.analyze_image(image, user_info=user_info, on_stage=on_stage)
+            if cache_key:
+                analysis_result_cache.set(cache_key, result)
             
-            # Mapper les troubles détectés
-            trouble_map = {
-                'Acne': 'acne',
-                'Wrinkles': 'wrinkles',
-                'Dark-Spots': 'dark_spots',
-                'Skin-Redness': 'redness',
-                'Blackheads': 'acne',
-                'Whiteheads': 'acne',
-                'Dry-Skin': None,  # Pas de mapping direct
-                'Oily-Skin': None,  # Pas de mapping direct
-                'Englarged-Pores': None,  # Pas de mapping direct
-                'Eyebags': None  # Pas de mapping direct
-            }
+            return self._format_result(result)
             
-            # Préparer les détections
-            detections = {
-                'acne': {'detected': False, 'severity': 'NONE', 'confidence': 0.0},
-                'wrinkles': {'detected': False, 'severity': 'NONE', 'confidence': 0.0},
-                'dark_spots': {'detected': False, 'severity': 'NONE', 'confidence': 0.0},
-                'redness': {'detected': False, 'severity': 'NONE', 'confidence': 0.0}
-            }
+        except Exception as e:
+            logger.error(f"Erreur lors de l'analyse: {e}", exc_info=True)
+            return self._error_result(str(e))
+    
+    def analyze_skin_batch(self, images, users=None):
+        """
+        Analyser plusieurs images en un seul passage par modèle
+        
+        Utilisé pour les ré-analyses en masse, les tests de charge et le broker
+        de micro-batching : YOLO, EfficientNet et XGBoost ne sont appelés
+        qu'une fois pour tout le lot. Chaque image est décodée avant la mise
+        en lot : une image illisible reçoit son propre résultat d'erreur sans
+        faire échouer les autres analyses du lot.
+        
+        Args:
+            images: Liste d'images (chemins, octets ou tableaux RGB décodés)
+            users: Liste d'instances User (optionnel), une par image
+        
+        Returns:
+            Liste de dictionnaires au même format que analyze_skin
+        """
+        if self.diagnostic is None:
+            logger.error("Système de diagnostic non disponible")
+            return [self._error_result('Système de diagnostic non disponible') for _ in images]
+        
+        if users is None:
+            users = [None] * len(images)
+        
+        try:
+            user_infos = [self._get_user_info(user) if user else None for user in users]
+            results = [None] * len(images)
+            errors = {}
             
-            # Traiter les troubles détectés
-            for trouble in result.get('detected_troubles', []):
-                mapped_trouble = trouble_map.get(trouble)
-                if mapped_trouble and mapped_trouble in detections:
-                    confidence = result.get('yolo_probs', {}).get(trouble, 0.0)
-                    detections[mapped_trouble]['detected'] = True
-                    detections[mapped_trouble]['confidence'] = confidence
-                    
-                    # Déterminer la sévérité
-                    if confidence > 0.8:
-                        detections[mapped_trouble]['severity'] = 'HIGH'
-                    elif confidence > 0.6:
-                        detections[mapped_trouble]['severity'] = 'MODERATE'
-                    else:
-                        detections[mapped_trouble]['severity'] = 'LOW'
+            # Décodage et validation image par image, avant la mise en lot
+            decoded = [None] * len(images)
+            for i, image in enumerate(images):
+                try:
+                    decoded[i] = self.diagnostic.load_image(image)
+                except Exception as e:
+                    logger.warning(f"Image {i} du lot illisible: {e}")
+                    errors[i] = self._error_result(str(e))
             
-            # Résultats finaux
-            skin_type = skin_type_map.get(result.get('skin_type', 'Normal'), 'NORMAL')
-            skin_confidence = result.get('skin_probs', {}).get(result.get('skin_type', 'Normal'), 0.0)
+            # Résultats en cache, puis une seule analyse par clé manquante
+            # (les doublons d'un même lot, ex: retries, sont analysés une fois)
+            pending = {}
+            for i, (image, user_info) in enumerate(zip(images, user_infos)):
+                if i in errors:
+                    continue
+                cache_key = self._cache_key(image, user_info)
+                cached = analysis_result_cache.get(cache_key) if cache_key else None
+                if cached is not None:
+                    results[i] = self._result_from_cache(decoded[i], cached)
+                else:
+                    pending.setdefault(cache_key or f"nocache-{i}", []).append(i)
             
-            return {
-                'skin_type': {
-                    'prediction': skin_type,
-                    'confidence': skin_confidence
-                },
-                'detections': detections,
-                'annotated_image': result.get('annotated_image'),  # Image annotée avec les zones détectées
-                'raw_results': result,  # Résultats bruts pour référence
-                'processing_time': 0.0  # À calculer si nécessaire
-            }
+            if pending:
+                indices = [group[0] for group in pending.values()]
+                batch_results = self.diagnostic.analyze_batch(
+                    [decoded[i] for i in indices],
+                    user_infos=[user_infos[i] for i in indices]
+                )
+                for (cache_key, group), result in zip(pending.items(), batch_results):
+                    if not cache_key.startswith('nocache-'):
+                        analysis_result_cache.set(cache_key, result)
+                    results[group[0]] = result
+                    for i in group[1:]:
+                        results[i] = self._result_from_cache(decoded[i], result)
             
+            formatted = []
+            for i, (image, result) in enumerate(zip(images, results)):
+                if i in errors:
+                    formatted.append(errors[i])
+                    continue
+                # Les tableaux décodés ne portent pas le chemin d'origine
+                result['image_path'] = str(image) if isinstance(image, (str, os.PathLike)) else None
+                formatted.append(self._format_result(result))
+            return formatted
         except Exception as e:
-            logger.error(f"Erreur lors de l'analyse: {e}", exc_info=True)
-            return {
-                'error': str(e),
-                'skin_type': {'prediction': None, 'confidence': 0.0},
-                'detections': {}
-            }
+            logger.error(f"Erreur lors de l'analyse batch: {e}", exc_info=True)
+            return [self._error_result(str(e)) for _ in images]
+    
+    def refit(self, model_outputs, user=None):
+        """
+        Réévaluer une analyse avec le profil actuel sans relancer les CNN
+        
+        Seule la fusion XGBoost est recalculée à partir des probabilités YOLO et
+        EfficientNet stockées (SkinAnalysis.model_outputs).
+        
+        Args:
+            model_outputs: Sorties compactes stockées lors de l'analyse
+            user: Instance User Django (optionnel) dont le profil est utilisé
+        
+        Returns:
+            Dictionnaire {xgb_label_id, xgb_confidence, fusion_probs, user_info,
+            model_version_changed, processing_time_ms} ou {'error': ...}
+        """
+        if self.diagnostic is None:
+            logger.error("Système de diagnostic non disponible")
+            return {'error': 'Système de diagnostic non disponible'}
+        
+        try:
+            start = time.perf_counter()
+            fusion = self.diagnostic.predict_fusion_from_outputs(
+                model_outputs, self._get_user_info(user) if user else None
+            )
+            fusion['model_version_changed'] = model_outputs.get('model_version') != self.model_version
+            fusion['processing_time_ms'] = (time.perf_counter() - start) * 1000.0
+            return fusion
+        except Exception as e:
+            logger.error(f"Erreur lors de la réévaluation: {e}", exc_info=True)
+            return {'error': str(e)}
+    
+    def _cache_key(self, image, user_info):
+        """Clé du cache de résultats, ou None si le cache ne s'applique pas"""
+        if not analysis_result_cache.enabled:
+            return None
+        image_hash = image_content_hash(image)
+        if image_hash is None:
+            return None
+        return analysis_result_cache.make_key(
+            image_hash,
+            self.model_version,
+            normalize_user_info(user_info, self.diagnostic.DEFAULT_USER_INFO)
+        )
+    
+    def _result_from_cache(self, image, cached, on_stage=None):
+        """
+        Reconstruire un résultat complet depuis le cache sans relancer les modèles
+        
+        L'image annotée est redessinée à partir des détections stockées et les
+        callbacks de progression sont appelés comme pour une vraie analyse.
+        """
+        start = time.perf_counter()
+        result = dict(cached)
+        result['image_path'] = str(image) if isinstance(image, (str, os.PathLike)) else None
+        result['annotated_image'] = self.diagnostic.annotate_detections(
+            self.diagnostic.load_image(image), result.get('detections', [])
+        )
+        result['cached'] = True
+        
+        if on_stage:
+            on_stage('yolo', {
+                'yolo_probs': result['yolo_probs'],
+                'detections': result['detections'],
+                'detected_troubles': result['detected_troubles']
+            })
+            on_stage('efficientnet', {'skin_type': result['skin_type'], 'skin_probs': result['skin_probs']})
+            on_stage('fusion', {'xgb_label_id': result['xgb_label_id'], 'xgb_confidence': result['xgb_confidence']})
+        
+        elapsed = (time.perf_counter() - start) * 1000.0
+        result['timings_ms'] = {'cache': elapsed, 'total': elapsed}
+        return result
+    
+    def _error_result(self, message):
+        """Résultat d'erreur au format attendu par les vues"""
+        return {
+            'error': message,
+            'skin_type': {'prediction': None, 'confidence': 0.0},
+            'detections': {}
+        }
+    
+    def map_detections(self, detected_troubles, yolo_probs):
+        """
+        Agréger les troubles YOLO par type de problème suivi en base
+        
+        Args:
+            detected_troubles: Labels YOLO détectés (ex: ['Acne', 'Wrinkles'])
+            yolo_probs: Dictionnaire label -> probabilité YOLO
+        
+        Returns:
+            Dictionnaire {acne, wrinkles, dark_spots, redness} -> détection agrégée
+        """
+        # Mapper les troubles détectés
+        trouble_map = {
+            'Acne': 'acne',
+            'Wrinkles': 'wrinkles',
+            'Dark-Spots': 'dark_spots',
+            'Skin-Redness': 'redness',
+            'Blackheads': 'acne',
+            'Whiteheads': 'acne',
+            'Dry-Skin': None,  # Pas de mapping direct
+            'Oily-Skin': None,  # Pas de mapping direct
+            'Englarged-Pores': None,  # Pas de mapping direct
+            'Eyebags': None  # Pas de mapping direct
+        }
+        
+        # Préparer les détections
+        detections = {
+            'acne': {'detected': False, 'severity': 'NONE', 'confidence': 0.0},
+            'wrinkles': {'detected': False, 'severity': 'NONE', 'confidence': 0.0},
+            'dark_spots': {'detected': False, 'severity': 'NONE', 'confidence': 0.0},
+            'redness': {'detected': False, 'severity': 'NONE', 'confidence': 0.0}
+        }
+        
+        # Traiter les troubles détectés
+        for trouble in detected_troubles:
+            mapped_trouble = trouble_map.get(trouble)
+            if mapped_trouble and mapped_trouble in detections:
+                confidence = yolo_probs.get(trouble, 0.0)
+                detections[mapped_trouble]['detected'] = True
+                detections[mapped_trouble]['confidence'] = confidence
+                
+                # Déterminer la sévérité
+                if confidence > 0.8:
+                    detections[mapped_trouble]['severity'] = 'HIGH'
+                elif confidence > 0.6:
+                    detections[mapped_trouble]['severity'] = 'MODERATE'
+                else:
+                    detections[mapped_trouble]['severity'] = 'LOW'
+        
+        return detections
+    
+    def _model_outputs(self, result):
+        """Sorties des étapes image et de la fusion, à stocker sur SkinAnalysis.model_outputs"""
+        model_outputs = self.diagnostic.extract_model_outputs(result)
+        model_outputs['model_version'] = self.model_version
+        model_outputs['fusion'] = {
+            'xgb_label_id': result.get('xgb_label_id'),
+            'xgb_confidence': result.get('xgb_confidence'),
+        }
+        return model_outputs
+    
+    def _format_result(self, result):
+        """Convertir un résultat brut de SkinDiagnostic au format attendu par Django"""
+        detections = self.map_detections(
+            result.get('detected_troubles', []),
+            result.get('yolo_probs', {})
+        )
+        
+        # Résultats finaux
+        skin_type = self.SKIN_TYPE_MAP.get(result.get('skin_type', 'Normal'), 'NORMAL')
+        skin_confidence = result.get('skin_probs', {}).get(result.get('skin_type', 'Normal'), 0.0)
+        
+        return {
+            'skin_type': {
+                'prediction': skin_type,
+                'confidence': skin_confidence
+            },
+            'detections': detections,
+            'annotated_image': result.get('annotated_image'),  # Image annotée avec les zones détectées
+            'raw_results': result,  # Résultats bruts pour référence
+            'timings_ms': result.get('timings_ms', {}),  # Durée de chaque étape (decode, yolo, efficientnet, fusion, total)
+            'cached': result.get('cached', False),  # Résultat servi par le cache (aucune inférence)
+            'model_outputs': self._model_outputs(result),  # Sorties compactes pour la réévaluation (refit)
+            'processing_time': result.get('timings_ms', {}).get('total', 0.0) / 1000.0
+        }
+
 
+# Instance globale du service (modèles chargés au premier usage, voir skin_ai.lazy_services)
+skin_analysis_service = LazyService(SkinAnalysisService, 'skin_analysis_service')
 
-# Instance globale du service
-skin_analysis_service = SkinAnalysisService()
+# Broker de micro-batching partagé par les vues d'upload
+_broker_config = get_broker_config()
+inference_broker = InferenceBroker(
+    skin_analysis_service,
+    max_batch_size=_broker_config['MAX_BATCH_SIZE'],
+    max_wait_ms=_broker_config['MAX_WAIT_MS']
+)
@@ -10,13 +10,24 @@ Usage:
     # Initialiser le système
     diagnostic = SkinDiagnostic(models_dir="models")
     
-    # Analyser une image
+    # Analyser une image (chemin, octets bruts ou tableau RGB déjà décodé)
     result = diagnostic.analyze_image("path/to/image.jpg", user_info={...})
+    
+    # Analyser plusieurs images en un seul passage par modèle
+    results = diagnostic.analyze_batch(["a.jpg", "b.jpg"], user_infos=[{...}, None])
+    
+    # Limiter les threads de chaque étape (YOLO et EfficientNet tournent en parallèle)
+    diagnostic = SkinDiagnostic(models_dir="models", stage_threads={"yolo": 2, "efficientnet": 2})
+    
+    # Servir les artefacts exportés (mlops/scripts/export_models.py) au lieu des modèles eager
+    diagnostic = SkinDiagnostic(models_dir="models", runtime="onnx", quantized=True)
 """
 
+import hashlib
 import os
+import threading
+import time
 import numpy as np
-import pandas as pd
 import joblib
 import torch
 import torch.nn.functional as F
@@ -25,7 +36,127 @@ from PIL import Image
 from ultralytics import YOLO
 import torchvision.transforms as transforms
 from torchvision.models import efficientnet_b0
-from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+# ONNX Runtime (optionnel) pour servir les modèles exportés
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+
+# Une image peut être fournie sous forme de chemin, d'octets encodés (JPEG/PNG)
+# ou de tableau RGB uint8 déjà décodé.
+ImageInput = Union[str, bytes, bytearray, memoryview, np.ndarray]
+
+# Décodage OpenCV sans rotation EXIF : mêmes pixels que Image.open().convert("RGB"),
+# avec lequel les modèles ont été entraînés et évalués
+IMREAD_FLAGS = cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION
+
+
+class FusionFeatureEncoder:
+    """
+    Encodeur des features de la fusion XGBoost, compilé une seule fois au chargement.
+    
+    Reproduit exactement l'encodage pd.get_dummies + reindex sur les colonnes
+    du booster, sans DataFrame : chaque champ numérique de user_info est écrit
+    à sa position, chaque valeur catégorielle active la colonne "<champ>_<valeur>",
+    les probabilités YOLO (tr_p*) et EfficientNet (sk_p*) et le one-hot
+    predicted_skin_label_* sont copiés par indices précalculés. Les colonnes
+    absentes restent à 0.
+    """
+    
+    def __init__(self, feature_names: List[str], user_fields: List[str],
+                 n_troubles: int, skin_labels: List[str]):
+        """
+        Args:
+            feature_names: Colonnes attendues par le booster, dans l'ordre
+            user_fields: Champs de user_info connus (les autres sont résolus à la volée)
+            n_troubles: Nombre de probabilités YOLO (tr_p0..tr_pN)
+            skin_labels: Labels EfficientNet dans l'ordre des probabilités (sk_p0..sk_pN)
+        """
+        self.feature_names = [c.replace('"', '').strip() for c in feature_names]
+        self.n_features = len(self.feature_names)
+        self.index = {name: i for i, name in enumerate(self.feature_names)}
+        
+        # Champ -> (position numérique ou -1, {catégorie: position})
+        self.field_tables = {}
+        for field in user_fields:
+            prefix = f"{field}_"
+            categories = {
+                name[len(prefix):]: i for name, i in self.index.items() if name.startswith(prefix)
+            }
+            self.field_tables[field] = (self.index.get(field, -1), categories)
+        
+        # Positions des probabilités (colonnes présentes uniquement)
+        self.tr_src, self.tr_dst = self._positions([f"tr_p{i}" for i in range(n_troubles)])
+        self.sk_src, self.sk_dst = self._positions([f"sk_p{i}" for i in range(len(skin_labels))])
+        self.skin_label_index = {
+            label: self.index[f"predicted_skin_label_{label}"]
+            for label in skin_labels if f"predicted_skin_label_{label}" in self.index
+        }
+    
+    def _positions(self, names: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Indices source/destination des colonnes présentes dans le booster."""
+        pairs = [(i, self.index[name]) for i, name in enumerate(names) if name in self.index]
+        src = np.array([i for i, _ in pairs], dtype=np.intp)
+        dst = np.array([j for _, j in pairs], dtype=np.intp)
+        return src, dst
+    
+    @classmethod
+    def from_models(cls, xgb_model, preproc, default_fields: List[str],
+                    n_troubles: int, skin_labels: List[str]) -> "FusionFeatureEncoder":
+        """
+        Construit l'encodeur à partir du booster XGBoost et du preprocessing.
+        
+        Les champs utilisateur sont lus sur le preprocessing (feature_names_in_
+        pour un transformer scikit-learn) quand il les expose, sinon on utilise
+        les champs par défaut.
+        """
+        feature_names = xgb_model.get_booster().feature_names
+        user_fields = list(default_fields)
+        input_fields = getattr(preproc, "feature_names_in_", None)
+        if input_fields is not None:
+            user_fields += [str(f) for f in input_fields if str(f) not in user_fields]
+        return cls(feature_names, user_fields, n_troubles, skin_labels)
+    
+    def _encode_user_info(self, row: np.ndarray, user_info: Dict):
+        """Écrit les champs de user_info dans une ligne de la matrice."""
+        for field, value in user_info.items():
+            table = self.field_tables.get(field)
+            if isinstance(value, str):
+                # Catégorie : colonne "<champ>_<valeur>" (comme pd.get_dummies)
+                idx = table[1].get(value, -1) if table else self.index.get(f"{field}_{value}", -1)
+                value = 1.0
+            elif value is None:
+                # Colonne object entièrement vide : pd.get_dummies la supprime, elle reste à 0
+                continue
+            else:
+                idx = table[0] if table else self.index.get(field, -1)
+            if idx >= 0:
+                row[idx] = value
+    
+    def transform(self, user_infos: List[Dict], yolo_probs: List[np.ndarray],
+                  sk_probs: List[np.ndarray], skin_labels: List[str]) -> np.ndarray:
+        """
+        Encode N analyses en une matrice float32 (N, n_features).
+        """
+        X = np.zeros((len(user_infos), self.n_features), dtype=np.float32)
+        
+        for row, user_info in zip(X, user_infos):
+            self._encode_user_info(row, user_info)
+        
+        if len(self.tr_dst):
+            X[:, self.tr_dst] = np.asarray(yolo_probs, dtype=np.float32)[:, self.tr_src]
+        if len(self.sk_dst):
+            X[:, self.sk_dst] = np.asarray(sk_probs, dtype=np.float32)[:, self.sk_src]
+        for i, label in enumerate(skin_labels):
+            idx = self.skin_label_index.get(label)
+            if idx is not None:
+                X[i, idx] = 1.0
+        
+        return X
 
 
 class SkinDiagnostic:
@@ -43,17 +174,62 @@ class SkinDiagnostic:
     # Labels des types de peau
     SKIN_LABELS = {0: "Dry", 1: "Normal", 2: "Oily"}
     
-    def __init__(self, models_dir: str = "models", device: Optional[str] = None):
+    # Infos utilisateur par défaut si aucune n'est fournie
+    DEFAULT_USER_INFO = {
+        "age": 25,
+        "gender": "Female",
+        "sleep_hours": 7,
+        "stress_level": 5,
+        "diet_quality": "Average",
+        "smoker": "No",
+        "alcohol_consumption": "No"
+    }
+    
+    # Étapes indépendantes exécutées en parallèle avant la fusion
+    PARALLEL_STAGES = ("yolo", "efficientnet")
+    
+    # Runtimes d'inférence et artefacts exportés correspondants (dans <models_dir>/exported)
+    RUNTIMES = ("eager", "onnx", "torchscript")
+    EXPORTED_MODEL_FILES = {
+        "efficientnet": {"onnx": "efficientnet.onnx", "torchscript": "efficientnet.torchscript.pt"},
+        "yolo": {"onnx": "yolo.onnx", "torchscript": "yolo.torchscript"},
+    }
+    
+    def __init__(self, models_dir: str = "models", device: Optional[str] = None,
+                 parallel_stages: bool = True, stage_threads: Optional[Dict[str, int]] = None,
+                 runtime: str = "eager", quantized: bool = False, exported_dir: Optional[str] = None,
+                 mmap_weights: bool = False):
         """
         Initialise le système de diagnostic.
         
         Args:
             models_dir: Chemin vers le dossier contenant les modèles
             device: Device PyTorch ('cuda' ou 'cpu'). Si None, détecte automatiquement.
+            parallel_stages: Exécuter YOLO et EfficientNet en parallèle (sinon séquentiellement)
+            stage_threads: Nombre de threads torch par étape, ex: {"yolo": 2, "efficientnet": 2}.
+                Permet de ne pas sursouscrire les cœurs CPU quand les deux étapes tournent ensemble.
+            runtime: 'eager' (PyTorch/Ultralytics), 'onnx' (ONNX Runtime) ou 'torchscript'.
+                Les runtimes exportés retombent sur eager si l'artefact est absent.
+            quantized: Utiliser les artefacts quantifiés int8 (*.int8.*, runtime 'onnx'
+                uniquement : l'export ne quantifie pas TorchScript, les artefacts
+                float32 sont alors servis)
+            exported_dir: Dossier des artefacts exportés (<models_dir>/exported par défaut)
+            mmap_weights: Mapper en mémoire les poids EfficientNet au lieu de les copier
+                (pages partagées entre processus, nécessite torch >= 2.1 et un checkpoint
+                au format zip)
         """
+        if runtime not in self.RUNTIMES:
+            raise ValueError(f"Runtime non supporté: {runtime} (attendu: {', '.join(self.RUNTIMES)})")
+
         self.models_dir = models_dir
         self.device = device if device else ("cuda" if torch.cuda.is_available() else "cpu")
         
+        # Exécution parallèle des étapes (pools créés au premier usage)
+        self.parallel_stages = parallel_stages
+        self.stage_threads = dict(stage_threads or {})
+        self._stage_executors = {}
+        self._stage_executors_lock = threading.Lock()
+        
         # Chemins des modèles
         self.yolo_path = os.path.join(models_dir, "modéle skinTwin2 .pt")
         self.effnet_path = os.path.join(models_dir, "modele_peau.pth")
@@ -61,6 +237,12 @@ class SkinDiagnostic:
         self.xgb_path = os.path.join(models_dir, "context_correction_xgb.joblib")
         self.label_enc_path = os.path.join(models_dir, "context_correction_label_encoder.joblib")
         
+        # Artefacts exportés
+        self.runtime = runtime
+        self.quantized = quantized
+        self.exported_dir = exported_dir if exported_dir else os.path.join(models_dir, "exported")
+        self.mmap_weights = mmap_weights
+        
         # Transform pour EfficientNet
         self.transform_eff = transforms.Compose([
             transforms.Resize((224, 224)),
@@ -71,9 +253,12 @@ class SkinDiagnostic:
         # Modèles (seront chargés lors de l'appel à load_models)
         self.yolo_model = None
         self.eff_model = None
+        self.eff_session = None  # Session ONNX Runtime (runtime='onnx')
         self.preproc = None
         self.xgb_model = None
         self.label_enc = None
+        self.fusion_encoder = None
+        self.model_files = []  # Fichiers effectivement chargés (voir model_version)
         
         # Charger les modèles
         self.load_models()
@@ -82,23 +267,45 @@ class SkinDiagnostic:
         """Charge tous les modèles en mémoire."""
         print("⏳ Chargement des modèles...")
         
-        # 1. YOLO
+        # 1. YOLO (Ultralytics recharge directement les exports ONNX / TorchScript)
         try:
-            self.yolo_model = YOLO(self.yolo_path)
-            print("✅ YOLO chargé")
+            yolo_exported = self.exported_model_path("yolo")
+            if yolo_exported:
+                self.yolo_model = YOLO(yolo_exported, task="detect")
+                print(f"✅ YOLO chargé ({self.runtime}: {os.path.basename(yolo_exported)})")
+            else:
+                self.yolo_model = YOLO(self.yolo_path)
+                print("✅ YOLO chargé")
         except Exception as e:
             raise Exception(f"Erreur chargement YOLO: {e}")
         
         # 2. EfficientNet
         try:
-            self.eff_model = efficientnet_b0(pretrained=False)
-            num_features = self.eff_model.classifier[1].in_features
-            self.eff_model.classifier[1] = torch.nn.Linear(num_features, 3)
-            state = torch.load(self.effnet_path, map_location=self.device)
-            self.eff_model.load_state_dict(state)
-            self.eff_model.eval()
-            self.eff_model.to(self.device)
-            print("✅ EfficientNet chargé")
+            eff_exported = self.exported_model_path("efficientnet")
+            if eff_exported and self.runtime == "onnx":
+                options = ort.SessionOptions()
+                if self.stage_threads.get("efficientnet"):
+                    options.intra_op_num_threads = int(self.stage_threads["efficientnet"])
+                self.eff_session = ort.InferenceSession(eff_exported, options, providers=["CPUExecutionProvider"])
+                print(f"✅ EfficientNet chargé (onnx: {os.path.basename(eff_exported)})")
+            elif eff_exported and self.runtime == "torchscript":
+                self.eff_model = torch.jit.load(eff_exported, map_location=self.device)
+                self.eff_model.eval()
+                print(f"✅ EfficientNet chargé (torchscript: {os.path.basename(eff_exported)})")
+            else:
+                self.eff_model = efficientnet_b0(pretrained=False)
+                num_features = self.eff_model.classifier[1].in_features
+                self.eff_model.classifier[1] = torch.nn.Linear(num_features, 3)
+                if self.mmap_weights and self.device == "cpu":
+                    # Les paramètres pointent directement sur le fichier mappé (assign=True)
+                    state = torch.load(self.effnet_path, map_location="cpu", mmap=True, weights_only=True)
+                    self.eff_model.load_state_dict(state, assign=True)
+                else:
+                    state = torch.load(self.effnet_path, map_location=self.device)
+                    self.eff_model.load_state_dict(state)
+                self.eff_model.eval()
+                self.eff_model.to(self.device)
+                print("✅ EfficientNet chargé")
         except Exception as e:
             raise Exception(f"Erreur chargement EfficientNet: {e}")
         
@@ -116,6 +323,16 @@ class SkinDiagnostic:
         except Exception as e:
             raise Exception(f"Erreur chargement XGBoost: {e}")
         
+        # Encodeur des features de fusion (compilé une fois pour toutes les prédictions)
+        try:
+            self.fusion_encoder = FusionFeatureEncoder.from_models(
+                self.xgb_model, self.preproc, list(self.DEFAULT_USER_INFO),
+                len(self.TROUBLE_LABELS), [self.SKIN_LABELS[i] for i in sorted(self.SKIN_LABELS)]
+            )
+            print(f"✅ Encodeur de fusion prêt ({self.fusion_encoder.n_features} features)")
+        except Exception as e:
+            raise Exception(f"Erreur construction encodeur de fusion: {e}")
+        
         # 5. Label Encoder (optionnel)
         try:
             if os.path.exists(self.label_enc_path):
@@ -128,29 +345,133 @@ class SkinDiagnostic:
             self.label_enc = None
             print(f"⚠️  Erreur chargement Label Encoder: {e}")
         
+        self.model_files = [
+            yolo_exported or self.yolo_path,
+            eff_exported or self.effnet_path,
+            self.preproc_path,
+            self.xgb_path,
+        ] + ([self.label_enc_path] if self.label_enc is not None else [])
+        
         print("✅ Tous les modèles sont prêts!\n")
     
-    def detect_troubles(self, image_path: str, conf_thres: float = 0.1) -> Tuple[np.ndarray, List[Dict], np.ndarray]:
+    def model_version(self) -> str:
+        """
+        Empreinte de l'ensemble des modèles chargés.
+        
+        Calculée à partir du nom, de la taille et de la date de modification de
+        chaque fichier chargé ainsi que du runtime : elle change dès qu'un
+        modèle est remplacé, ce qui invalide les résultats mis en cache.
+        """
+        parts = [self.runtime, str(self.quantized)]
+        for path in self.model_files:
+            try:
+                stat = os.stat(path)
+                parts.append(f"{os.path.basename(path)}:{stat.st_size}:{int(stat.st_mtime)}")
+            except OSError:
+                parts.append(f"{os.path.basename(path)}:missing")
+        return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:16]
+    
+    def exported_model_path(self, stage: str) -> Optional[str]:
+        """
+        Chemin de l'artefact exporté d'une étape pour le runtime courant.
+        
+        Returns:
+            Chemin de l'artefact, ou None pour le runtime eager ou si l'artefact
+            est absent (avec avertissement, le modèle eager est alors utilisé)
+        """
+        if self.runtime == "eager":
+            return None
+        if self.runtime == "onnx" and ort is None:
+            print(f"⚠️  onnxruntime non installé, {stage} servi en eager")
+            return None
+        
+        filename = self.EXPORTED_MODEL_FILES[stage][self.runtime]
+        if self.quantized and self.runtime != "onnx":
+            print(f"⚠️  Pas d'artefact int8 en {self.runtime} (quantification ONNX uniquement), {stage} servi en float32")
+        elif self.quantized:
+            stem, _, ext = filename.partition(".")
+            filename = f"{stem}.int8.{ext}"
+        path = os.path.join(self.exported_dir, filename)
+        if not os.path.exists(path):
+            print(f"⚠️  Artefact {self.runtime} introuvable ({path}), {stage} servi en eager")
+            return None
+        return path
+    
+    @staticmethod
+    def load_image(image: ImageInput) -> np.ndarray:
+        """
+        Décode l'image une seule fois en tableau RGB uint8 (H, W, 3).
+        
+        Le tableau retourné est partagé par YOLO, EfficientNet et l'annotation,
+        ce qui évite de relire et décoder le fichier à chaque étape. L'orientation
+        EXIF est ignorée, comme avec PIL (voir IMREAD_FLAGS).
+        
+        Args:
+            image: Chemin, octets encodés, objet fichier ou tableau RGB déjà décodé
+        """
+        if isinstance(image, np.ndarray):
+            return image
+        
+        if hasattr(image, 'read'):
+            image = image.read()
+        
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            img = cv2.imdecode(np.frombuffer(image, dtype=np.uint8), IMREAD_FLAGS)
+        else:
+            img = cv2.imread(str(image), IMREAD_FLAGS)
+        
+        if img is None:
+            raise ValueError("Impossible de décoder l'image")
+        
+        return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    
+    def detect_troubles(self, image: ImageInput, conf_thres: float = 0.1) -> Tuple[np.ndarray, List[Dict], np.ndarray]:
         """
         Détecte les troubles de peau avec YOLO.
         
+        Args:
+            image: Image à analyser (voir load_image)
+        
         Returns:
             probs: Probabilités normalisées pour chaque trouble
             detections: Liste des détections avec coordonnées
             annotated_img: Image annotée avec les détections
         """
-        results = self.yolo_model(image_path, conf=conf_thres, verbose=False)
-        r = results[0]
+        return self.detect_troubles_batch([image], conf_thres=conf_thres)[0]
+    
+    def detect_troubles_batch(self, images: List[ImageInput],
+                              conf_thres: float = 0.1) -> List[Tuple[np.ndarray, List[Dict], np.ndarray]]:
+        """
+        Détecte les troubles de peau sur plusieurs images avec YOLO.
+        
+        Les images de mêmes dimensions sont envoyées à YOLO en un seul appel.
+        Le regroupement par dimensions garantit le même letterbox (et donc les
+        mêmes détections) qu'un appel image par image.
+        
+        Returns:
+            Liste de tuples (probs, detections, annotated_img), dans l'ordre des images
+        """
+        imgs_rgb = [self.load_image(image) for image in images]
+        
+        groups = {}
+        for i, img in enumerate(imgs_rgb):
+            groups.setdefault(img.shape, []).append(i)
+        
+        yolo_results = [None] * len(imgs_rgb)
+        for indices in groups.values():
+            # Ultralytics attend des tableaux BGR (convention OpenCV)
+            batch = [cv2.cvtColor(imgs_rgb[i], cv2.COLOR_RGB2BGR) for i in indices]
+            results = self.yolo_model(batch, conf=conf_thres, verbose=False)
+            for i, r in zip(indices, results):
+                yolo_results[i] = r
+        
+        return [self._parse_yolo_result(r, img) for r, img in zip(yolo_results, imgs_rgb)]
+    
+    def _parse_yolo_result(self, r, img_rgb: np.ndarray) -> Tuple[np.ndarray, List[Dict], np.ndarray]:
+        """Convertit un résultat YOLO en probabilités, détections et image annotée."""
         probs = np.zeros(len(self.TROUBLE_LABELS))
         detections = []
         
-        # Charger et annoter l'image
-        img = cv2.imread(image_path)
-        if img is not None:
-            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        else:
-            img = None
-        
         if hasattr(r, "boxes") and len(r.boxes) > 0:
             for cls_id, conf, box in zip(r.boxes.cls.cpu().numpy().astype(int),
                                          r.boxes.conf.cpu().numpy(),
@@ -162,34 +483,66 @@ class SkinDiagnostic:
                         "conf": float(conf),
                         "box": box.tolist()
                     })
-                    # Annoter l'image
-                    if img is not None:
-                        x1, y1, x2, y2 = map(int, box)
-                        cv2.rectangle(img, (x1, y1), (x2, y2), (255, 165, 0), 2)
-                        cv2.putText(img, f"{self.TROUBLE_LABELS[cls_id]} {conf*100:.0f}%",
-                                   (x1, y1-5), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 165, 0), 2)
         
         if probs.sum() > 0:
             probs /= probs.sum()
         
-        return probs, detections, img if img is not None else np.array([])
+        return probs, detections, self.annotate_detections(img_rgb, detections)
+    
+    @staticmethod
+    def annotate_detections(img_rgb: np.ndarray, detections: List[Dict]) -> np.ndarray:
+        """
+        Dessine les détections sur une copie de l'image.
+        
+        Permet aussi de régénérer l'image annotée à partir de détections
+        stockées (cache de résultats) sans relancer YOLO.
+        """
+        # Annoter une copie pour ne pas modifier le tableau partagé
+        img = img_rgb.copy()
+        for det in detections:
+            x1, y1, x2, y2 = map(int, det["box"])
+            cv2.rectangle(img, (x1, y1), (x2, y2), (255, 165, 0), 2)
+            cv2.putText(img, f"{det['label']} {det['conf']*100:.0f}%",
+                        (x1, y1-5), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 165, 0), 2)
+        return img
     
-    def classify_skin_type(self, image_path: str) -> Tuple[str, Dict[str, float], np.ndarray]:
+    def classify_skin_type(self, image: ImageInput) -> Tuple[str, Dict[str, float], np.ndarray]:
         """
         Classe le type de peau avec EfficientNet.
         
+        Args:
+            image: Image à analyser (voir load_image)
+        
         Returns:
             skin_label: Label du type de peau (Dry/Normal/Oily)
             skin_probs_dict: Dictionnaire des probabilités
             sk_probs_arr: Array des probabilités
         """
-        img = Image.open(image_path).convert("RGB")
-        x = self.transform_eff(img).unsqueeze(0).to(self.device)
-        with torch.no_grad():
-            logits = self.eff_model(x)
-            probs = F.softmax(logits, dim=1).cpu().numpy().ravel()
-        idx = int(np.argmax(probs))
-        return self.SKIN_LABELS[idx], {self.SKIN_LABELS[i]: float(probs[i]) for i in range(3)}, probs
+        return self.classify_skin_type_batch([image])[0]
+    
+    def classify_skin_type_batch(self, images: List[ImageInput]) -> List[Tuple[str, Dict[str, float], np.ndarray]]:
+        """
+        Classe le type de peau de plusieurs images en une seule passe EfficientNet.
+        
+        Returns:
+            Liste de tuples (skin_label, skin_probs_dict, sk_probs_arr), dans l'ordre des images
+        """
+        x = torch.stack([
+            self.transform_eff(Image.fromarray(self.load_image(image))) for image in images
+        ])
+        if self.eff_session is not None:
+            logits = self.eff_session.run(None, {self.eff_session.get_inputs()[0].name: x.numpy()})[0]
+            probs = F.softmax(torch.from_numpy(logits), dim=1).numpy()
+        else:
+            with torch.no_grad():
+                logits = self.eff_model(x.to(self.device))
+                probs = F.softmax(logits, dim=1).cpu().numpy()
+        
+        outputs = []
+        for row in probs:
+            idx = int(np.argmax(row))
+            outputs.append((self.SKIN_LABELS[idx], {self.SKIN_LABELS[i]: float(row[i]) for i in range(3)}, row))
+        return outputs
     
     def predict_fusion(self, user_info: Dict, yolo_probs: np.ndarray, 
                       sk_probs_arr: np.ndarray, skin_label: str) -> Tuple[int, float, np.ndarray]:
@@ -201,38 +554,151 @@ class SkinDiagnostic:
             proba: Probabilité maximale
             all_probas: Toutes les probabilités
         """
-        df = pd.DataFrame([user_info])
-        for i, v in enumerate(yolo_probs):
-            df[f"tr_p{i}"] = float(v)
-        for i, v in enumerate(sk_probs_arr):
-            df[f"sk_p{i}"] = float(v)
-        
-        df["predicted_skin_label_Dry"] = 1.0 if skin_label == "Dry" else 0.0
-        df["predicted_skin_label_Normal"] = 1.0 if skin_label == "Normal" else 0.0
-        df["predicted_skin_label_Oily"] = 1.0 if skin_label == "Oily" else 0.0
-        
-        df_encoded = pd.get_dummies(df, drop_first=False)
-        expected = self.xgb_model.get_booster().feature_names
-        expected = [c.replace('"', '').strip() for c in expected]
-        for c in expected:
-            if c not in df_encoded.columns:
-                df_encoded[c] = 0.0
-        df_encoded = df_encoded[[c for c in expected]]
-        
-        X = df_encoded.values
+        label_ids, probas, all_probas = self.predict_fusion_batch(
+            [user_info], [yolo_probs], [sk_probs_arr], [skin_label]
+        )
+        return int(label_ids[0]), float(probas[0]), all_probas[0]
+    
+    def predict_fusion_batch(self, user_infos: List[Dict], yolo_probs: List[np.ndarray],
+                             sk_probs: List[np.ndarray], skin_labels: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Prédiction fusion XGBoost pour N analyses en un seul appel predict_proba.
+        
+        Les features sont assemblées par l'encodeur précompilé (matrice float32),
+        sans DataFrame intermédiaire.
+        
+        Returns:
+            label_ids: IDs des labels prédits (N,)
+            probas: Probabilités maximales (N,)
+            all_probas: Toutes les probabilités (N, n_classes)
+        """
+        X = self.fusion_encoder.transform(user_infos, yolo_probs, sk_probs, skin_labels)
         y_pred = self.xgb_model.predict(X)
-        y_proba = self.xgb_model.predict_proba(X)[0]
+        y_proba = self.xgb_model.predict_proba(X)
+        
+        return np.asarray(y_pred).astype(int), np.max(y_proba, axis=1), y_proba
+    
+    @staticmethod
+    def _compact_float(value: float) -> float:
+        """Arrondi à 9 chiffres significatifs : restitue exactement la valeur float32."""
+        return float(f"{np.float32(value):.9g}")
+    
+    def extract_model_outputs(self, result: Dict) -> Dict:
+        """
+        Sorties brutes des étapes image (YOLO, EfficientNet) sous forme compacte.
         
-        label_id = int(y_pred[0])
-        proba = float(np.max(y_proba))
-        return label_id, proba, y_proba
+        Ces sorties ne dépendent que de l'image : elles suffisent pour relancer
+        la fusion XGBoost avec d'autres infos utilisateur (predict_fusion_from_outputs).
+        
+        Returns:
+            {"yolo_probs": [10 floats], "skin_probs": [3 floats], "skin_type": label}
+        """
+        return {
+            "yolo_probs": [self._compact_float(result["yolo_probs"].get(label, 0.0)) for label in self.TROUBLE_LABELS],
+            "skin_probs": [self._compact_float(result["skin_probs"].get(self.SKIN_LABELS[i], 0.0))
+                           for i in sorted(self.SKIN_LABELS)],
+            "skin_type": result["skin_type"],
+        }
     
-    def analyze_image(self, image_path: str, user_info: Optional[Dict] = None) -> Dict:
+    def predict_fusion_from_outputs(self, model_outputs: Dict, user_info: Optional[Dict] = None) -> Dict:
+        """
+        Relance uniquement la fusion XGBoost à partir de sorties stockées.
+        
+        Args:
+            model_outputs: Dictionnaire retourné par extract_model_outputs
+            user_info: Nouvelles infos utilisateur (None = valeurs par défaut)
+        
+        Returns:
+            Dictionnaire {xgb_label_id, xgb_confidence, fusion_probs, user_info}
+        """
+        if user_info is None:
+            user_info = dict(self.DEFAULT_USER_INFO)
+        label_id, proba, all_probas = self.predict_fusion(
+            user_info,
+            np.asarray(model_outputs["yolo_probs"], dtype=np.float32),
+            np.asarray(model_outputs["skin_probs"], dtype=np.float32),
+            model_outputs["skin_type"]
+        )
+        return {
+            "xgb_label_id": int(label_id),
+            "xgb_confidence": float(proba),
+            "fusion_probs": [float(p) for p in np.asarray(all_probas).ravel()],
+            "user_info": user_info,
+        }
+    
+    def _get_stage_executor(self, stage: str) -> ThreadPoolExecutor:
+        """
+        Pool dédié à une étape, créé au premier usage.
+        
+        Chaque étape a son propre thread, initialisé avec le nombre de threads
+        torch configuré pour cette étape (les opérations torch relâchent le GIL).
+        """
+        with self._stage_executors_lock:
+            executor = self._stage_executors.get(stage)
+            if executor is None:
+                num_threads = self.stage_threads.get(stage)
+                executor = ThreadPoolExecutor(
+                    max_workers=1,
+                    thread_name_prefix=f"skin-{stage}",
+                    initializer=torch.set_num_threads if num_threads else None,
+                    initargs=(int(num_threads),) if num_threads else ()
+                )
+                self._stage_executors[stage] = executor
+            return executor
+    
+    def _run_model_stages(self, stages: Dict[str, Callable[[], object]],
+                          on_done: Optional[Callable[[str, object], None]] = None) -> Tuple[Dict[str, object], Dict[str, float]]:
+        """
+        Exécute les étapes YOLO et EfficientNet, en parallèle si activé.
+        
+        Args:
+            stages: Dictionnaire nom d'étape -> fonction sans argument
+            on_done: Callback (stage, output) appelé dans le thread appelant,
+                dans l'ordre de fin des étapes
+        
+        Returns:
+            outputs: Sorties de chaque étape
+            timings: Durée de chaque étape en millisecondes
+        """
+        outputs, timings = {}, {}
+        
+        def timed(fn):
+            start = time.perf_counter()
+            output = fn()
+            return output, (time.perf_counter() - start) * 1000.0
+        
+        if not self.parallel_stages:
+            for stage, fn in stages.items():
+                outputs[stage], timings[stage] = timed(fn)
+                if on_done:
+                    on_done(stage, outputs[stage])
+            return outputs, timings
+        
+        pending = {
+            self._get_stage_executor(stage).submit(timed, fn): stage
+            for stage, fn in stages.items()
+        }
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = pending.pop(future)
+                outputs[stage], timings[stage] = future.result()
+                if on_done:
+                    on_done(stage, outputs[stage])
+        return outputs, timings
+    
+    def analyze_image(self, image: ImageInput, user_info: Optional[Dict] = None,
+                      on_stage: Optional[Callable[[str, Dict], None]] = None) -> Dict:
         """
         Analyse complète d'une image.
         
+        L'image est décodée une seule fois puis partagée entre toutes les étapes.
+        YOLO et EfficientNet sont indépendants jusqu'à la fusion : ils tournent
+        en parallèle sur leurs pools dédiés (voir parallel_stages). La durée de
+        chaque étape est renvoyée dans result["timings_ms"].
+        
         Args:
-            image_path: Chemin vers l'image
+            image: Chemin vers l'image, octets encodés ou tableau RGB décodé
             user_info: Dictionnaire avec les infos utilisateur (optionnel)
                 Exemple: {
                     "age": 25,
@@ -243,30 +709,127 @@ class SkinDiagnostic:
                     "smoker": "No",
                     "alcohol_consumption": "No"
                 }
+            on_stage: Callback optionnel appelé à la fin de chaque étape avec
+                le nom de l'étape ('yolo', 'efficientnet', 'fusion') et ses
+                résultats partiels, pour suivre la progression. Il est toujours
+                appelé depuis le thread appelant, dans l'ordre de fin des étapes.
         
         Returns:
             Dictionnaire avec tous les résultats
         """
         if user_info is None:
-            user_info = {
-                "age": 25,
-                "gender": "Female",
-                "sleep_hours": 7,
-                "stress_level": 5,
-                "diet_quality": "Average",
-                "smoker": "No",
-                "alcohol_consumption": "No"
-            }
+            user_info = dict(self.DEFAULT_USER_INFO)
         
-        # 1. Détection YOLO
-        yolo_probs, detections, annotated_img = self.detect_troubles(image_path)
+        start = time.perf_counter()
         
-        # 2. Classification type de peau
-        skin_label, skin_probs_dict, sk_probs_arr = self.classify_skin_type(image_path)
+        # Décodage unique de l'image
+        img_rgb = self.load_image(image)
+        decode_ms = (time.perf_counter() - start) * 1000.0
+        
+        def on_done(stage, output):
+            if not on_stage:
+                return
+            if stage == "yolo":
+                yolo_probs, detections, _ = output
+                on_stage('yolo', {
+                    "yolo_probs": {self.TROUBLE_LABELS[i]: float(p) for i, p in enumerate(yolo_probs)},
+                    "detections": detections,
+                    "detected_troubles": [self.TROUBLE_LABELS[i] for i, p in enumerate(yolo_probs) if p >= 0.1]
+                })
+            else:
+                skin_label, skin_probs_dict, _ = output
+                on_stage('efficientnet', {"skin_type": skin_label, "skin_probs": skin_probs_dict})
+        
+        # 1. Détection YOLO et 2. Classification type de peau (indépendantes)
+        outputs, timings = self._run_model_stages({
+            "yolo": lambda: self.detect_troubles(img_rgb),
+            "efficientnet": lambda: self.classify_skin_type(img_rgb)
+        }, on_done=on_done)
+        yolo_probs, detections, annotated_img = outputs["yolo"]
+        skin_label, skin_probs_dict, sk_probs_arr = outputs["efficientnet"]
         
         # 3. Prédiction fusion
+        fusion_start = time.perf_counter()
         label_id, proba, all_probas = self.predict_fusion(user_info, yolo_probs, sk_probs_arr, skin_label)
+        timings["fusion"] = (time.perf_counter() - fusion_start) * 1000.0
+        if on_stage:
+            on_stage('fusion', {"xgb_label_id": int(label_id), "xgb_confidence": float(proba)})
+        
+        timings["decode"] = decode_ms
+        timings["total"] = (time.perf_counter() - start) * 1000.0
+        
+        result = self._build_result(image, user_info, yolo_probs, detections, annotated_img,
+                                    skin_label, skin_probs_dict, label_id, proba)
+        result["timings_ms"] = timings
+        return result
+    
+    def analyze_batch(self, images: List[ImageInput],
+                      user_infos: Optional[List[Optional[Dict]]] = None) -> List[Dict]:
+        """
+        Analyse complète de plusieurs images en mode batch.
+        
+        Chaque modèle n'est appelé qu'une fois pour tout le lot : un tenseur
+        EfficientNet empilé, une liste d'images pour YOLO et une matrice de N
+        lignes pour XGBoost. Les résultats sont identiques à N appels à
+        analyze_image.
         
+        Args:
+            images: Liste d'images (chemins, octets encodés ou tableaux RGB)
+            user_infos: Liste d'infos utilisateur, une par image (None = valeurs par défaut)
+        
+        Returns:
+            Liste de dictionnaires de résultats, dans l'ordre des images
+        """
+        if user_infos is None:
+            user_infos = [None] * len(images)
+        if len(user_infos) != len(images):
+            raise ValueError("images et user_infos doivent avoir la même longueur")
+        if not images:
+            return []
+        
+        user_infos = [info if info is not None else dict(self.DEFAULT_USER_INFO) for info in user_infos]
+        
+        start = time.perf_counter()
+        
+        # Décodage unique de chaque image
+        imgs_rgb = [self.load_image(image) for image in images]
+        decode_ms = (time.perf_counter() - start) * 1000.0
+        
+        # 1. Détection YOLO et 2. Classification type de peau (indépendantes)
+        outputs, timings = self._run_model_stages({
+            "yolo": lambda: self.detect_troubles_batch(imgs_rgb),
+            "efficientnet": lambda: self.classify_skin_type_batch(imgs_rgb)
+        })
+        yolo_outputs = outputs["yolo"]
+        skin_outputs = outputs["efficientnet"]
+        
+        # 3. Prédiction fusion
+        fusion_start = time.perf_counter()
+        label_ids, probas, _ = self.predict_fusion_batch(
+            user_infos,
+            [yolo_probs for yolo_probs, _, _ in yolo_outputs],
+            [sk_probs_arr for _, _, sk_probs_arr in skin_outputs],
+            [skin_label for skin_label, _, _ in skin_outputs]
+        )
+        timings["fusion"] = (time.perf_counter() - fusion_start) * 1000.0
+        timings["decode"] = decode_ms
+        timings["total"] = (time.perf_counter() - start) * 1000.0
+        
+        results = []
+        for i, image in enumerate(images):
+            yolo_probs, detections, annotated_img = yolo_outputs[i]
+            skin_label, skin_probs_dict, _ = skin_outputs[i]
+            result = self._build_result(image, user_infos[i], yolo_probs, detections, annotated_img,
+                                        skin_label, skin_probs_dict, label_ids[i], probas[i])
+            # Durées du lot complet (partagées par toutes les images du lot)
+            result["timings_ms"] = dict(timings)
+            results.append(result)
+        return results
+    
+    def _build_result(self, image: ImageInput, user_info: Dict, yolo_probs: np.ndarray,
+                      detections: List[Dict], annotated_img: np.ndarray, skin_label: str,
+                      skin_probs_dict: Dict[str, float], label_id: int, proba: float) -> Dict:
+        """Assemble le dictionnaire de résultats d'une analyse."""
         # Trouver le diagnostic principal (basé sur YOLO)
         yolo_max_idx = int(np.argmax(yolo_probs))
         yolo_diagnostic = self.TROUBLE_LABELS[yolo_max_idx]
@@ -276,7 +839,7 @@ class SkinDiagnostic:
         detected_troubles = [self.TROUBLE_LABELS[i] for i, p in enumerate(yolo_probs) if p >= 0.1]
         
         return {
-            "image_path": image_path,
+            "image_path": str(image) if isinstance(image, (str, os.PathLike)) else None,
             "yolo_diagnostic": yolo_diagnostic,
             "yolo_confidence": float(yolo_confidence),
             "yolo_probs": {self.TROUBLE_LABELS[i]: float(p) for i, p in enumerate(yolo_probs)},
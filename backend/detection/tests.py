@@ -0,0 +1,516 @@
+"""
+Tests du pipeline d'analyse sans poids de modèles
+=================================================
+
+StubDiagnostic remplace les modèles chargés par SkinDiagnostic.load_models
+par des modèles déterministes et légers (YOLO, EfficientNet, booster de
+fusion) : le code de mise en lot, de décodage et d'encodage des features
+est celui de production.
+"""
+import io
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+import cv2
+import numpy as np
+import pandas as pd
+import torch
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from .inference_broker import InferenceBroker
+from .jobs import interrupted_analyses, resume_analysis_jobs, run_analysis_job
+from .models import SkinAnalysis
+from .skin_diagnostic import FusionFeatureEncoder, SkinDiagnostic
+
+USER_FIELDS = {
+    'gender': ['Female', 'Male', 'Other'],
+    'diet_quality': ['Poor', 'Average', 'Good', 'Excellent'],
+    'smoker': ['No', 'Yes'],
+    'alcohol_consumption': ['No', 'Occasional', 'Moderate', 'High'],
+}
+
+FEATURE_NAMES = (
+    ['age', 'sleep_hours', 'stress_level']
+    + [f'{field}_{value}' for field, values in USER_FIELDS.items() for value in values]
+    + [f'tr_p{i}' for i in range(len(SkinDiagnostic.TROUBLE_LABELS))]
+    + [f'sk_p{i}' for i in range(len(SkinDiagnostic.SKIN_LABELS))]
+    + [f'predicted_skin_label_{label}' for label in ('Dry', 'Normal', 'Oily')]
+)
+
+
+class StubBoxes:
+    """Boîtes YOLO (tenseurs cls, conf, xyxy) d'une image"""
+
+    def __init__(self, cls, conf, xyxy):
+        self.cls = torch.tensor(cls, dtype=torch.float32)
+        self.conf = torch.tensor(conf, dtype=torch.float32)
+        self.xyxy = torch.tensor(xyxy, dtype=torch.float32).reshape(-1, 4)
+
+    def __len__(self):
+        return len(self.cls)
+
+
+class StubYolo:
+    """Détections dérivées du contenu de l'image ; un appel n'accepte qu'une seule taille d'image"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, batch, conf=0.1, verbose=False):
+        shapes = {img.shape for img in batch}
+        assert len(shapes) == 1, f"Lot YOLO de tailles différentes: {shapes}"
+        self.calls.append(len(batch))
+        results = []
+        for img in batch:
+            means = img.reshape(-1, 3).mean(axis=0) / 255.0
+            h, w = img.shape[:2]
+            cls = [int(means[0] * 9.99), int(means[2] * 9.99)]
+            results.append(SimpleNamespace(boxes=StubBoxes(
+                cls, [0.2 + means[1] * 0.7, 0.15 + means[0] * 0.5],
+                [[0, 0, w // 2, h // 2], [w // 4, h // 4, w - 1, h - 1]]
+            )))
+        return results
+
+
+class StubEfficientNet(torch.nn.Module):
+    """Logits = moyenne des canaux normalisés x matrice fixe"""
+
+    def __init__(self):
+        super().__init__()
+        self.weight = torch.nn.Parameter(torch.tensor([[2.0, -1.0, 0.5], [-0.5, 1.5, -1.0], [0.3, 0.2, 1.8]]))
+        self.calls = []
+
+    def forward(self, x):
+        self.calls.append(x.shape[0])
+        return x.mean(dim=(2, 3)) @ self.weight
+
+
+class StubBooster:
+    """Booster de fusion : softmax d'une projection linéaire fixe des features"""
+
+    def __init__(self, feature_names, n_classes=4):
+        self.feature_names = feature_names
+        self.weight = np.random.default_rng(0).normal(size=(len(feature_names), n_classes))
+        self.calls = []
+
+    def get_booster(self):
+        return self
+
+    def predict_proba(self, X):
+        self.calls.append(len(X))
+        logits = np.nan_to_num(np.asarray(X, dtype=np.float64)) @ self.weight
+        exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def predict(self, X):
+        return np.argmax(self.predict_proba(X), axis=1)
+
+
+class StubDiagnostic(SkinDiagnostic):
+    """SkinDiagnostic dont load_models installe les modèles de test"""
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('device', 'cpu')
+        super().__init__(*args, **kwargs)
+
+    def load_models(self):
+        self.yolo_model = StubYolo()
+        self.eff_model = StubEfficientNet().eval()
+        self.xgb_model = StubBooster(FEATURE_NAMES)
+        self.preproc = None
+        self.label_enc = None
+        self.fusion_encoder = FusionFeatureEncoder.from_models(
+            self.xgb_model, self.preproc, list(self.DEFAULT_USER_INFO),
+            len(self.TROUBLE_LABELS), [self.SKIN_LABELS[i] for i in sorted(self.SKIN_LABELS)]
+        )
+        self.model_files = []
+
+
+def make_image(seed, shape=(64, 48)):
+    """Image RGB uint8 déterministe"""
+    return np.random.default_rng(seed).integers(0, 256, size=(*shape, 3), dtype=np.uint8)
+
+
+def encode_png(img_rgb):
+    return cv2.imencode('.png', cv2.cvtColor(img_rgb, cv2.COLOR_RGB2BGR))[1].tobytes()
+
+
+def stub_service():
+    """SkinAnalysisService servi par StubDiagnostic"""
+    from .services import SkinAnalysisService
+
+    with mock.patch('detection.skin_diagnostic.SkinDiagnostic', StubDiagnostic):
+        service = SkinAnalysisService()
+    assert isinstance(service.diagnostic, StubDiagnostic)
+    return service
+
+
+def reference_features(feature_names, user_info, yolo_probs, sk_probs, skin_label):
+    """Ancien encodage de predict_fusion : DataFrame d'une ligne, pd.get_dummies puis reindex"""
+    df = pd.DataFrame([user_info])
+    for i, v in enumerate(yolo_probs):
+        df[f"tr_p{i}"] = float(v)
+    for i, v in enumerate(sk_probs):
+        df[f"sk_p{i}"] = float(v)
+    for label in ('Dry', 'Normal', 'Oily'):
+        df[f"predicted_skin_label_{label}"] = 1.0 if skin_label == label else 0.0
+
+    df_encoded = pd.get_dummies(df, drop_first=False)
+    expected = [c.replace('"', '').strip() for c in feature_names]
+    for c in expected:
+        if c not in df_encoded.columns:
+            df_encoded[c] = 0.0
+    return df_encoded[expected].values.astype(np.float32)[0]
+
+
+class FusionFeatureEncoderTest(SimpleTestCase):
+    """FusionFeatureEncoder produit la même matrice que l'ancien chemin pd.get_dummies + reindex"""
+
+    def user_infos(self):
+        base = dict(SkinDiagnostic.DEFAULT_USER_INFO)
+        infos = [base]
+        for field, values in USER_FIELDS.items():
+            for value in values + ['Inconnue', '']:  # Toutes les catégories, plus des valeurs jamais vues
+                infos.append(dict(base, **{field: value}))
+            infos.append(dict(base, **{field: None}))
+            infos.append({key: value for key, value in base.items() if key != field})
+        for field in ('age', 'sleep_hours', 'stress_level'):
+            infos.append(dict(base, **{field: None}))
+            infos.append(dict(base, **{field: float('nan')}))
+            infos.append(dict(base, **{field: '30'}))
+            infos.append({key: value for key, value in base.items() if key != field})
+        infos.append(dict(base, age=41.5, stress_level=True, skin_concern='acne'))  # Champ inconnu du booster
+        infos.append({})
+        return infos
+
+    def assert_parity(self, feature_names):
+        encoder = FusionFeatureEncoder.from_models(
+            StubBooster(feature_names), None, list(SkinDiagnostic.DEFAULT_USER_INFO),
+            len(SkinDiagnostic.TROUBLE_LABELS), ['Dry', 'Normal', 'Oily']
+        )
+        infos = self.user_infos()
+        rng = np.random.default_rng(7)
+        yolo_probs = rng.random((len(infos), len(SkinDiagnostic.TROUBLE_LABELS)))
+        sk_probs = rng.dirichlet(np.ones(3), size=len(infos))
+        labels = [('Dry', 'Normal', 'Oily', 'Autre')[i % 4] for i in range(len(infos))]
+
+        X = encoder.transform(infos, list(yolo_probs), list(sk_probs), labels)
+        expected = np.stack([
+            reference_features(feature_names, *row) for row in zip(infos, yolo_probs, sk_probs, labels)
+        ])
+        for info, row, expected_row in zip(infos, X, expected):
+            np.testing.assert_array_equal(row, expected_row, err_msg=str(info))
+
+    def test_parity_with_get_dummies(self):
+        self.assert_parity(FEATURE_NAMES)
+
+    def test_parity_with_partial_booster_columns(self):
+        # Booster entraîné sans certaines catégories ni probabilités, noms entre guillemets
+        dropped = {'gender_Other', 'alcohol_consumption_High', 'tr_p9', 'sk_p1', 'predicted_skin_label_Normal'}
+        self.assert_parity([f'"{name}"' for name in FEATURE_NAMES if name not in dropped])
+
+
+class SkinDiagnosticBatchTest(SimpleTestCase):
+    """Les méthodes *_batch donnent les mêmes résultats que N appels image par image"""
+
+    SHAPES = [(64, 48), (40, 40), (64, 48), (32, 80), (40, 40), (64, 48)]
+
+    def setUp(self):
+        self.diagnostic = StubDiagnostic()
+        # Tableaux décodés et images encodées mélangés, de tailles et teintes différentes
+        self.images = []
+        for seed, shape in enumerate(self.SHAPES):
+            img = make_image(seed, shape)
+            img[..., seed % 3] = 255 - img[..., seed % 3] // 4
+            self.images.append(img if seed % 2 else encode_png(img))
+
+    def test_detect_troubles_batch_matches_single_calls(self):
+        batch = self.diagnostic.detect_troubles_batch(self.images)
+        # Un appel YOLO par taille d'image distincte
+        self.assertEqual(sorted(self.diagnostic.yolo_model.calls), [1, 2, 3])
+
+        singles = [self.diagnostic.detect_troubles(image) for image in self.images]
+        self.assertEqual(len(batch), len(singles))
+        for (probs, detections, annotated), (s_probs, s_detections, s_annotated) in zip(batch, singles):
+            np.testing.assert_array_equal(probs, s_probs)
+            self.assertEqual(detections, s_detections)
+            np.testing.assert_array_equal(annotated, s_annotated)
+
+    def test_load_image_ignores_exif_orientation_like_pil(self):
+        from PIL import Image
+
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientation : rotation de 90°
+        buffer = io.BytesIO()
+        Image.fromarray(make_image(7, (40, 64))).save(buffer, 'JPEG', quality=95, exif=exif)
+        content = buffer.getvalue()
+
+        path = os.path.join(tempfile.mkdtemp(), 'exif.jpg')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path), True)
+        with open(path, 'wb') as f:
+            f.write(content)
+
+        reference = np.asarray(Image.open(io.BytesIO(content)).convert('RGB'))
+        for image in (content, path):
+            img = self.diagnostic.load_image(image)
+            self.assertEqual(img.shape, reference.shape)
+            self.assertLessEqual(np.abs(img.astype(int) - reference).max(), 8)  # Décodeurs JPEG différents
+
+    def test_classify_skin_type_batch_matches_single_calls(self):
+        batch = self.diagnostic.classify_skin_type_batch(self.images)
+        self.assertEqual(self.diagnostic.eff_model.calls, [len(self.images)])
+
+        singles = [self.diagnostic.classify_skin_type(image) for image in self.images]
+        for (label, probs_dict, probs), (s_label, s_probs_dict, s_probs) in zip(batch, singles):
+            self.assertEqual(label, s_label)
+            self.assertEqual(probs_dict.keys(), s_probs_dict.keys())
+            np.testing.assert_allclose(probs, s_probs, rtol=1e-6)
+        self.assertGreater(len({label for label, _, _ in batch}), 1)
+
+    def test_analyze_batch_matches_analyze_image(self):
+        user_infos = [None, dict(SkinDiagnostic.DEFAULT_USER_INFO, age=52, smoker='Yes')] * 3
+        batch = self.diagnostic.analyze_batch(self.images, user_infos)
+        self.assertEqual(self.diagnostic.xgb_model.calls, [len(self.images)] * 2)  # predict + predict_proba
+
+        for image, user_info, result in zip(self.images, user_infos, batch):
+            single = self.diagnostic.analyze_image(image, user_info)
+            for key in ('yolo_diagnostic', 'yolo_probs', 'detections', 'skin_type', 'xgb_label_id',
+                        'detected_troubles', 'user_info'):
+                self.assertEqual(result[key], single[key], key)
+            self.assertAlmostEqual(result['xgb_confidence'], single['xgb_confidence'], places=6)
+
+
+class ExportedModelTest(SimpleTestCase):
+    """Artefacts exportés : choix du fichier selon le runtime et inférence YOLO TorchScript par lots"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.exported_dir = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, cls.exported_dir, True)
+
+    def test_quantized_torchscript_serves_float32_artifacts(self):
+        for filename in ('yolo.torchscript', 'yolo.onnx', 'yolo.int8.onnx'):
+            open(os.path.join(self.exported_dir, filename), 'wb').close()
+
+        diagnostic = StubDiagnostic(runtime='torchscript', quantized=True, exported_dir=self.exported_dir)
+        self.assertEqual(diagnostic.exported_model_path('yolo'), os.path.join(self.exported_dir, 'yolo.torchscript'))
+        with mock.patch('detection.skin_diagnostic.ort', object()):
+            diagnostic = StubDiagnostic(runtime='onnx', quantized=True, exported_dir=self.exported_dir)
+            self.assertEqual(diagnostic.exported_model_path('yolo'), os.path.join(self.exported_dir, 'yolo.int8.onnx'))
+
+    def test_torchscript_yolo_batch_matches_single_calls(self):
+        from ultralytics import YOLO
+
+        # YOLOv8n non entraîné, biais de classification relevé pour obtenir des détections
+        model = YOLO('yolov8n.yaml')
+        with torch.no_grad():
+            for head in model.model.model[-1].cv3:
+                head[-1].bias.fill_(-10.0)
+                head[-1].bias[2] = 1.0
+        cwd = os.getcwd()
+        os.chdir(self.exported_dir)  # L'exporteur écrit l'artefact dans le dossier courant
+        try:
+            # Mêmes options que ModelLoader.export_yolo (TorchScript tracé sur une image)
+            exported = model.export(format='torchscript', imgsz=160, dynamic=False, device='cpu', verbose=False)
+            exported = os.path.abspath(exported)
+        finally:
+            os.chdir(cwd)
+
+        diagnostic = StubDiagnostic()
+        diagnostic.yolo_model = YOLO(exported, task='detect')
+        images = [make_image(seed, (120, 90)) for seed in range(3)] + [make_image(3, (80, 100))]
+        batch = diagnostic.detect_troubles_batch(images)
+        singles = [diagnostic.detect_troubles(image) for image in images]
+        self.assertTrue(any(detections for _, detections, _ in singles))
+        for (probs, detections, _), (s_probs, s_detections, _) in zip(batch, singles):
+            np.testing.assert_allclose(probs, s_probs, rtol=1e-5)
+            self.assertEqual(len(detections), len(s_detections))
+            for detection, s_detection in zip(detections, s_detections):
+                self.assertEqual(detection['label'], s_detection['label'])
+                np.testing.assert_allclose(detection['box'], s_detection['box'], atol=1e-3)
+
+
+class InferenceBrokerTest(SimpleTestCase):
+    """Une image illisible ne fait échouer que sa propre requête"""
+
+    def broker(self, service):
+        # Attente longue : les requêtes soumises ensemble forment un seul micro-batch
+        return InferenceBroker(service, max_batch_size=8, max_wait_ms=300)
+
+    def test_corrupt_image_does_not_fail_the_batch(self):
+        broker = self.broker(stub_service())
+        futures = [
+            broker.submit(encode_png(make_image(1))),
+            broker.submit(b'pas une image'),
+            broker.submit(encode_png(make_image(2, shape=(40, 40)))),
+        ]
+        results = [future.result(timeout=30) for future in futures]
+
+        self.assertEqual(broker.get_metrics()['batch_size_histogram'], {3: 1})
+        self.assertNotIn('error', results[0])
+        self.assertNotIn('error', results[2])
+        self.assertIn('décoder', results[1]['error'])
+        self.assertIn(results[0]['skin_type']['prediction'], ('DRY', 'NORMAL', 'OILY'))
+
+    def test_batch_failure_resolves_only_the_failing_future(self):
+        service = stub_service()
+        analyze = service.analyze_skin_batch
+        failing = b'fait tomber le lot'
+
+        def analyze_skin_batch(images, users=None):
+            if any(image is failing for image in images):
+                raise RuntimeError('lot en échec')
+            return analyze(images, users=users)
+
+        service.analyze_skin_batch = analyze_skin_batch
+        broker = self.broker(service)
+        futures = [broker.submit(encode_png(make_image(3))), broker.submit(failing), broker.submit(make_image(4))]
+
+        self.assertNotIn('error', futures[0].result(timeout=30))
+        self.assertNotIn('error', futures[2].result(timeout=30))
+        with self.assertRaisesMessage(RuntimeError, 'lot en échec'):
+            futures[1].result(timeout=30)
+
+
+class AnalysisRecoveryTest(TestCase):
+    """Analyses interrompues par un arrêt du serveur : reprise unique depuis l'image enregistrée"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = get_user_model().objects.create(username='reprise', email='reprise@example.com')
+
+    def analysis(self, status='RUNNING', minutes=60, image=True):
+        analysis = SkinAnalysis(
+            user=self.user, status=status, heartbeat_at=timezone.now() - timedelta(minutes=minutes)
+        )
+        if image:
+            analysis.image.save('visage.png', ContentFile(encode_png(make_image(5))), save=False)
+        else:
+            analysis.image.name = 'uploads/skin_analyses/absente.png'
+        analysis.save()
+        return analysis
+
+    def test_interrupted_analysis_requeued_once(self):
+        stale = self.analysis()
+        pending = self.analysis(status='PENDING')
+        self.analysis(minutes=0)  # Worker actif
+        self.analysis(status='COMPLETED')
+        self.assertEqual(set(interrupted_analyses()), {stale, pending})
+
+        with mock.patch('detection.jobs.get_executor') as executor:
+            self.assertEqual(resume_analysis_jobs(), 2)
+            self.assertEqual(resume_analysis_jobs(), 0)  # Déjà reprises (heartbeat renouvelé)
+        submitted = sorted(call.args[1] for call in executor.return_value.submit.call_args_list)
+        self.assertEqual(submitted, [stale.id, pending.id])
+        stale.refresh_from_db()
+        self.assertEqual((stale.status, stale.progress['completed_stages']), ('PENDING', []))
+
+    def test_resumed_analysis_reads_saved_image(self):
+        stale = self.analysis()
+        missing = self.analysis(image=False)
+        with mock.patch('detection.jobs.skin_analysis_service', stub_service()):
+            run_analysis_job(stale.id)
+            with self.assertLogs('detection.jobs', 'ERROR'):
+                run_analysis_job(missing.id)
+        stale.refresh_from_db()
+        missing.refresh_from_db()
+        self.assertEqual(stale.status, 'COMPLETED')
+        self.assertEqual(sorted(stale.progress['completed_stages']), ['efficientnet', 'fusion', 'yolo'])  # YOLO et EfficientNet en parallèle
+        self.assertIn(stale.skin_type_prediction, ('DRY', 'NORMAL', 'OILY'))
+        self.assertEqual(missing.status, 'FAILED')
+
+    def test_released_analysis_stops_writing(self):
+        analysis = self.analysis(status='PENDING', minutes=0)
+        service = stub_service()
+        analyze_skin = service.analyze_skin
+
+        def resumed_meanwhile(*args, **kwargs):
+            # Worker jugé bloqué : l'analyse est relancée pendant qu'il tourne encore
+            SkinAnalysis.objects.filter(id=analysis.id).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+            with mock.patch('detection.jobs.get_executor'):
+                self.assertEqual(resume_analysis_jobs(), 1)
+            return analyze_skin(*args, **kwargs)
+
+        with mock.patch('detection.jobs.skin_analysis_service', service):
+            with mock.patch.object(service, 'analyze_skin', side_effect=resumed_meanwhile), \
+                    self.assertLogs('detection.jobs', 'INFO') as logs:
+                run_analysis_job(analysis.id)
+            analysis.refresh_from_db()
+            self.assertEqual((analysis.status, analysis.skin_type_prediction), ('PENDING', None))
+            self.assertIn('relancée ailleurs', logs.output[-1])
+
+            run_analysis_job(analysis.id)  # Tâche relancée
+            analysis.refresh_from_db()
+            self.assertEqual(analysis.status, 'COMPLETED')
+            completed = (analysis.claim_token, analysis.raw_yolo_results)
+            run_analysis_job(analysis.id)  # Doublon resté dans la file : rien à faire
+            analysis.refresh_from_db()
+            self.assertEqual((analysis.claim_token, analysis.raw_yolo_results), completed)
+
+
+class RefitAnalysisTest(TestCase):
+    """Réévaluation d'une analyse avec le profil actuel : fusion seule, sans modèle d'image"""
+
+    def setUp(self):
+        self.service = stub_service()
+        service_patch = mock.patch('detection.views.skin_analysis_service', self.service)
+        service_patch.start()
+        self.addCleanup(service_patch.stop)
+
+        self.user = get_user_model().objects.create(
+            username='profil', email='profil@example.com', age=22, gender='F', sleep_hours=8, stress_level=2,
+            diet_quality='EXCELLENT', smoking=False, alcohol_consumption='NONE'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.analysis = SkinAnalysis.objects.create(user=self.user, status='COMPLETED', model_outputs={
+            'yolo_probs': [0.4, 0.0, 0.1, 0.0, 0.2, 0.0, 0.3, 0.0, 0.0, 0.0],
+            'skin_probs': [0.2, 0.3, 0.5],
+            'skin_type': 'Oily',
+            'model_version': self.service.model_version,
+            'fusion': {'xgb_label_id': 0, 'xgb_confidence': 0.5},
+        })
+
+    def refit(self):
+        response = self.client.post(f'/api/detection/analysis/{self.analysis.id}/refit/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_refit_follows_profile_without_image_models(self):
+        before = self.refit()
+        profile = dict(age=63, gender='M', sleep_hours=4, stress_level=10, diet_quality='POOR', smoking=True,
+                       alcohol_consumption='HIGH')
+        for field, value in profile.items():
+            setattr(self.user, field, value)
+        self.user.save(update_fields=list(profile))
+        after = self.refit()
+
+        self.assertEqual(before['user_info']['age'], 22)
+        self.assertEqual((after['user_info']['age'], after['user_info']['smoker']), (63, 'Yes'))
+        self.assertFalse(np.allclose(before['fusion_probs'], after['fusion_probs']))
+        self.assertFalse(after['model_version_changed'])
+
+        # Aucun modèle d'image exécuté, une seule passe de fusion par réévaluation
+        self.assertEqual(self.service.diagnostic.yolo_model.calls, [])
+        self.assertEqual(self.service.diagnostic.eff_model.calls, [])
+        self.assertEqual(self.service.diagnostic.xgb_model.calls, [1, 1] * 2)  # predict + predict_proba
+
+        self.analysis.refresh_from_db()
+        self.assertEqual(self.analysis.model_outputs['fusion']['user_info'], after['user_info'])
+        self.assertEqual(self.analysis.model_outputs['yolo_probs'][0], 0.4)
+
+    def test_refit_without_model_outputs_conflicts(self):
+        SkinAnalysis.objects.filter(id=self.analysis.id).update(model_outputs=None)
+        response = self.client.post(f'/api/detection/analysis/{self.analysis.id}/refit/')
+        self.assertEqual(response.status_code, 409)
@@ -6,6 +6,9 @@ from . import transformation_views
 urlpatterns = [
     path('upload/', views.SkinAnalysisUploadView.as_view(), name='skin_analysis_upload'),
     path('analysis/<int:analysis_id>/', views.get_analysis, name='get_analysis'),
+    path('analysis/<int:analysis_id>/status/', views.get_analysis_status, name='get_analysis_status'),
+    path('analysis/<int:analysis_id>/events/', views.get_analysis_events, name='get_analysis_events'),
+    path('analysis/<int:analysis_id>/refit/', views.refit_analysis, name='refit_analysis'),
     path('analyses/', views.get_user_analyses, name='get_user_analyses'),
     path('analyses-simple/', views.get_user_analyses_simple, name='get_user_analyses_simple'),
     path('analysis/<int:analysis_id>/delete/', views.delete_analysis, name='delete_analysis'),
@@ -16,6 +19,8 @@ urlpatterns = [
     # MLOps endpoints
     path('mlops/health/', mlops_views.mlops_health_check, name='mlops_health'),
     path('mlops/stats/', mlops_views.mlops_model_stats, name='mlops_stats'),
+    path('mlops/broker/', mlops_views.inference_broker_stats, name='mlops_broker_stats'),
+    path('mlops/startup/', mlops_views.startup_report, name='mlops_startup_report'),
 ]
 
 
@@ -1,27 +1,23 @@
 from rest_framework import status, permissions
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.renderers import JSONRenderer
 from rest_framework.views import APIView
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from .models import SkinAnalysis, SegmentationResult
-from .services import skin_analysis_service
+from .services import skin_analysis_service, inference_broker
+from .inference_broker import get_broker_config
+from .jobs import apply_analysis_results, submit_analysis_job, analysis_status_payload, get_jobs_config
 from .serializers import SkinAnalysisSerializer, SegmentationResultSerializer
+from skin_ai.renderers import EventStreamRenderer
+import json
 import time
 import logging
 
-# Import MLOps (optionnel)
-try:
-    import sys
-    from pathlib import Path
-    BASE_DIR = Path(__file__).parent.parent.parent.parent
-    sys.path.insert(0, str(BASE_DIR))
-    from mlops.integration.django_integration import mlops_integration
-    MLOPS_ENABLED = True
-except ImportError:
-    MLOPS_ENABLED = False
-    mlops_integration = None
-
 logger = logging.getLogger(__name__)
 
 
@@ -49,69 +45,46 @@ class SkinAnalysisUploadView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
+            # Lire les octets de l'upload une seule fois : l'analyse décode
+            # directement ce buffer sans relire le fichier sauvegardé sur disque
+            image_bytes = image_file.read()
+            
             # Créer l'analyse
             skin_analysis = SkinAnalysis.objects.create(
                 user=request.user,
                 image=image_file
             )
             
-            # Analyser l'image
+            # Mode asynchrone : retourner immédiatement l'identifiant de l'analyse
+            async_mode = str(request.data.get('async', request.query_params.get('async', ''))).lower()
+            if async_mode in ('1', 'true', 'yes'):
+                submit_analysis_job(skin_analysis, image_bytes)
+                return Response({
+                    'id': skin_analysis.id,
+                    'status': skin_analysis.status,
+                    'progress': skin_analysis.progress,
+                    'status_url': reverse('get_analysis_status', args=[skin_analysis.id]),
+                    'events_url': reverse('get_analysis_events', args=[skin_analysis.id]),
+                }, status=status.HTTP_202_ACCEPTED)
+            
+            # Analyser l'image (via le broker de micro-batching si activé)
             start_time = time.time()
-            results = skin_analysis_service.analyze_skin(
-                skin_analysis.image.path, 
-                user=request.user
-            )
+            broker_config = get_broker_config()
+            if broker_config['ENABLED']:
+                results = inference_broker.analyze(
+                    image_bytes,
+                    user=request.user,
+                    timeout=broker_config['TIMEOUT']
+                )
+            else:
+                results = skin_analysis_service.analyze_skin(
+                    image_bytes, 
+                    user=request.user
+                )
             processing_time = time.time() - start_time
             
-            # MLOps: Logger la prédiction et tracker les performances
-            if MLOPS_ENABLED and mlops_integration:
-                try:
-                    mlops_integration.track_inference_performance('ensemble', processing_time)
-                    mlops_integration.log_prediction_for_monitoring(
-                        prediction={
-                            'skin_type': results['skin_type']['prediction'],
-                            'confidence': results['skin_type']['confidence'],
-                            'detections': results['detections'],
-                            'analysis_id': skin_analysis.id
-                        },
-                        model_name='ensemble'
-                    )
-                except Exception as e:
-                    logger.warning(f"MLOps logging failed: {e}")
-            
             # Mettre à jour l'analyse avec les résultats
-            skin_analysis.skin_type_prediction = results['skin_type']['prediction']
-            skin_analysis.skin_type_confidence = results['skin_type']['confidence']
-            skin_analysis.processing_time = processing_time
-            
-            # Mettre à jour les détections
-            detections = results['detections']
-            skin_analysis.acne_detected = detections['acne']['detected']
-            skin_analysis.acne_severity = detections['acne']['severity']
-            skin_analysis.acne_confidence = detections['acne']['confidence']
-            
-            skin_analysis.wrinkles_detected = detections['wrinkles']['detected']
-            skin_analysis.wrinkles_severity = detections['wrinkles']['severity']
-            skin_analysis.wrinkles_confidence = detections['wrinkles']['confidence']
-            
-            skin_analysis.dark_spots_detected = detections['dark_spots']['detected']
-            skin_analysis.dark_spots_severity = detections['dark_spots']['severity']
-            skin_analysis.dark_spots_confidence = detections['dark_spots']['confidence']
-            
-            skin_analysis.redness_detected = detections['redness']['detected']
-            skin_analysis.redness_severity = detections['redness']['severity']
-            skin_analysis.redness_confidence = detections['redness']['confidence']
-            
-            # Sauvegarder les résultats bruts
-            skin_analysis.raw_cnn_results = results['skin_type']
-            # Stocker les détections agrégées ET les détections individuelles avec coordonnées
-            raw_yolo_data = {
-                'aggregated': detections,  # Détections agrégées par type de problème
-                'detections': results.get('raw_results', {}).get('detections', [])  # Détections individuelles avec coordonnées
-            }
-            skin_analysis.raw_yolo_results = raw_yolo_data
-            
-            skin_analysis.save()
+            apply_analysis_results(skin_analysis, results, processing_time)
             
             # Sérialiser et retourner les résultats
             serializer = SkinAnalysisSerializer(skin_analysis)
@@ -133,6 +106,99 @@ def get_analysis(request, analysis_id):
     return Response(serializer.data)
 
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def get_analysis_status(request, analysis_id):
+    """Récupérer l'état d'avancement d'une analyse (polling)"""
+    analysis = get_object_or_404(SkinAnalysis, id=analysis_id, user=request.user)
+    return Response(analysis_status_payload(analysis))
+
+
+def _analysis_events(analysis_id, poll_interval, timeout):
+    """Générateur SSE : publie chaque changement d'état jusqu'à la fin de l'analyse"""
+    last_payload = None
+    deadline = time.time() + timeout
+    
+    while True:
+        analysis = SkinAnalysis.objects.filter(id=analysis_id).first()
+        if analysis is None:
+            yield 'event: error\ndata: {"error": "Analyse non trouvée"}\n\n'
+            return
+        
+        payload = analysis_status_payload(analysis)
+        if payload != last_payload:
+            yield f"event: progress\ndata: {json.dumps(payload, cls=DjangoJSONEncoder)}\n\n"
+            last_payload = payload
+        
+        if analysis.status in ('COMPLETED', 'FAILED'):
+            data = SkinAnalysisSerializer(analysis).data
+            yield f"event: {analysis.status.lower()}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+            return
+        
+        if time.time() >= deadline:
+            yield 'event: timeout\ndata: {}\n\n'
+            return
+        
+        time.sleep(poll_interval)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+@renderer_classes([EventStreamRenderer, JSONRenderer])
+def get_analysis_events(request, analysis_id):
+    """
+    Suivre la progression d'une analyse étape par étape (server-sent events)
+    
+    Le flux occupe un worker jusqu'à la fin de l'analyse (EVENTS_TIMEOUT au
+    plus) : avec des workers synchrones, préférer le polling (get_analysis_status).
+    """
+    analysis = get_object_or_404(SkinAnalysis, id=analysis_id, user=request.user)
+    config = get_jobs_config()
+    
+    response = StreamingHttpResponse(
+        _analysis_events(analysis.id, config['EVENTS_POLL_INTERVAL'], config['EVENTS_TIMEOUT']),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def refit_analysis(request, analysis_id):
+    """
+    Réévaluer une analyse avec le profil actuel de l'utilisateur
+    
+    Seule la fusion XGBoost est relancée, à partir des probabilités YOLO et
+    EfficientNet stockées : aucun modèle d'image n'est exécuté.
+    """
+    analysis = get_object_or_404(SkinAnalysis, id=analysis_id, user=request.user)
+    
+    if not analysis.model_outputs:
+        return Response(
+            {'error': 'Sorties des modèles non disponibles pour cette analyse, relancer une analyse complète'},
+            status=status.HTTP_409_CONFLICT
+        )
+    
+    fusion = skin_analysis_service.refit(analysis.model_outputs, user=request.user)
+    if 'error' in fusion:
+        return Response(
+            {'error': f'Erreur lors de la réévaluation: {fusion["error"]}'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+    
+    # Conserver la dernière fusion avec les infos utilisateur utilisées
+    analysis.model_outputs = dict(analysis.model_outputs, fusion={
+        'xgb_label_id': fusion['xgb_label_id'],
+        'xgb_confidence': fusion['xgb_confidence'],
+        'user_info': fusion['user_info'],
+    })
+    analysis.save(update_fields=['model_outputs'])
+    
+    return Response({'id': analysis.id, **fusion})
+
+
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])  # Temporaire : permettre l'accès sans authentification
 def get_user_analyses(request):
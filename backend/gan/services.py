@@ -2,23 +2,35 @@
 Services pour la simulation GAN
 """
 import os
+import importlib.util
 import cv2
 import numpy as np
 from PIL import Image
 from django.conf import settings
+from skin_ai.lazy_services import LazyService
 import logging
 
-# Import optionnel de torch pour permettre le démarrage sans dépendances ML
-try:
-    import torch
-    TORCH_AVAILABLE = True
-except ImportError:
-    TORCH_AVAILABLE = False
-    torch = None
-    logger = logging.getLogger(__name__)
+logger = logging.getLogger(__name__)
+
+# Import optionnel de torch pour permettre le démarrage sans dépendances ML.
+# L'import réel est différé à la création du service (voir _import_torch)
+torch = None
+TORCH_AVAILABLE = importlib.util.find_spec('torch') is not None
+if not TORCH_AVAILABLE:
     logger.warning("PyTorch non disponible. Les fonctionnalités GAN seront désactivées.")
 
-logger = logging.getLogger(__name__)
+
+def _import_torch():
+    """Importer torch au premier usage du service GAN"""
+    global torch, TORCH_AVAILABLE
+    if torch is not None or not TORCH_AVAILABLE:
+        return
+    try:
+        import torch as _torch
+        torch = _torch
+    except ImportError as e:
+        TORCH_AVAILABLE = False
+        logger.warning(f"PyTorch non disponible ({e}). Les fonctionnalités GAN seront désactivées.")
 
 
 class GANSimulationService:
@@ -26,6 +38,7 @@ class GANSimulationService:
     
     def __init__(self):
         self.models_path = settings.ML_MODELS_PATH
+        _import_torch()
         if TORCH_AVAILABLE:
             self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
         else:
@@ -271,8 +284,8 @@ class GANSimulationService:
             raise
 
 
-# Instance globale du service
-gan_simulation_service = GANSimulationService()
+# Instance globale du service (créée au premier usage)
+gan_simulation_service = LazyService(GANSimulationService, 'gan_simulation_service')
 
 
 
@@ -0,0 +1,32 @@
+"""
+Configuration Gunicorn de Skin Twin AI
+======================================
+
+Lue automatiquement par gunicorn lancé depuis backend/ (fichier
+./gunicorn.conf.py par défaut), ou avec --config gunicorn.conf.py.
+
+Reprise des explorations et analyses interrompues par l'arrêt du serveur
+(settings.SCRAPING_JOBS / ANALYSIS_JOBS['RESUME_ON_STARTUP']) : une seule
+fois par démarrage du maître, dans le premier worker (worker.age == 1) une
+fois l'application chargée. Les workers suivants, et ceux relancés après un
+crash ou un timeout, ne reprennent rien. Les threads des pools de jobs
+démarrent dans ce worker, après le fork : la reprise fonctionne aussi avec
+gunicorn --preload.
+
+Hors gunicorn (runserver, autre serveur WSGI), utiliser les commandes
+python manage.py resume_scraping_jobs / resume_analysis_jobs.
+"""
+
+
+def post_worker_init(worker):
+    """Reprendre les jobs interrompus dans le premier worker uniquement"""
+    if worker.age != 1:
+        return
+
+    from scraped_products.jobs import get_jobs_config as get_scraping_jobs_config, resume_scraping_jobs
+    from detection.jobs import get_jobs_config as get_analysis_jobs_config, resume_analysis_jobs
+
+    if get_scraping_jobs_config()['RESUME_ON_STARTUP']:
+        worker.log.info("%d exploration(s) interrompue(s) reprise(s)", resume_scraping_jobs())
+    if get_analysis_jobs_config()['RESUME_ON_STARTUP']:
+        worker.log.info("%d analyse(s) interrompue(s) reprise(s)", resume_analysis_jobs())
@@ -0,0 +1,118 @@
+import json
+from datetime import timedelta
+from decimal import Decimal
+from django.test import TestCase
+from django.utils import timezone
+from recommendations.models import Product
+from scraped_products.models import ScrapedProduct
+from products.views import SCRAPED_ID_OFFSET, decode_cursor, encode_cursor
+
+
+class CatalogueTest(TestCase):
+    """Catalogue unifié : fusion ordonnée des deux sources, pagination par curseur et export en flux"""
+
+    url = '/api/products/catalogue/'
+
+    def setUp(self):
+        self.now = timezone.now().replace(microsecond=0)
+
+    def database_product(self, i, minutes, price='10.00', **fields):
+        product = Product.objects.create(
+            name=f'Crème {i}', brand='Avene', category='MOISTURIZER', description='', ingredients='',
+            price=Decimal(price), **fields
+        )
+        Product.objects.filter(id=product.id).update(created_at=self.now - timedelta(minutes=minutes))
+        return product.id
+
+    def scraped_product(self, i, minutes, price='10.00', **fields):
+        product = ScrapedProduct.objects.create(
+            name=f'Sérum {i}', brand='La Roche', category='SERUM', price=Decimal(price),
+            source_site='pharma-shop.tn', url=f'https://pharma-shop.tn/p/{i}', **fields
+        )
+        ScrapedProduct.objects.filter(id=product.id).update(created_at=self.now - timedelta(minutes=minutes))
+        return product.id + SCRAPED_ID_OFFSET
+
+    def pages(self, **params):
+        """Identifiants de toutes les pages, en suivant next_cursor"""
+        ids, cursor = [], None
+        while True:
+            query = dict(params, **({'cursor': cursor} if cursor else {}))
+            response = self.client.get(self.url, query)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            ids.extend(item['id'] for item in data['results'])
+            cursor = data['next_cursor']
+            if cursor is None:
+                return ids
+
+    def test_cursor_round_trip(self):
+        created_at = self.now - timedelta(days=3, microseconds=12)
+        self.assertEqual(decode_cursor(encode_cursor(created_at, SCRAPED_ID_OFFSET + 7)), (created_at, SCRAPED_ID_OFFSET + 7))
+        for cursor in ('', 'pas-un-curseur', encode_cursor(created_at, 1)[:-4]):
+            with self.assertRaises(ValueError):
+                decode_cursor(cursor)
+        self.assertEqual(self.client.get(self.url, {'cursor': 'pas-un-curseur'}).status_code, 400)
+
+    def test_sources_merged_by_creation_date(self):
+        expected = [
+            self.scraped_product(1, minutes=1),
+            self.database_product(1, minutes=2),
+            self.database_product(2, minutes=3),
+            self.scraped_product(2, minutes=4),
+            self.scraped_product(3, minutes=5),
+            self.database_product(3, minutes=6),
+        ]
+        Product.objects.create(name='Inactif', brand='X', category='SERUM', description='', ingredients='', is_active=False)
+        for page_size in (1, 2, 4, 50):
+            self.assertEqual(self.pages(page_size=page_size), expected)
+        self.assertEqual(self.pages(source='database'), [expected[1], expected[2], expected[5]])
+
+    def test_equal_creation_dates_break_ties_on_unified_id(self):
+        ids = [self.database_product(i, minutes=10) for i in range(3)]
+        ids += [self.scraped_product(i, minutes=10) for i in range(3)]
+        expected = sorted(ids, reverse=True)  # Produits scrapés (offset) en premier
+        for page_size in (1, 2, 5):
+            self.assertEqual(self.pages(page_size=page_size), expected)
+
+    def test_stream_exports_whole_catalogue(self):
+        expected = []
+        for i in range(3):
+            expected += [self.database_product(i, minutes=i * 2), self.scraped_product(i, minutes=i * 2 + 1)]
+        response = self.client.get(self.url, {'stream': 'true', 'page_size': 1})
+        self.assertTrue(response.streaming)
+        products = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([product['id'] for product in products], expected)
+        self.assertEqual(self.pages(page_size=2), expected)
+        self.assertEqual(products[1]['source_site'], 'pharma-shop.tn')
+
+    def test_price_filters(self):
+        cheap = self.database_product(1, minutes=1, price='5.00')
+        self.scraped_product(1, minutes=2, price='25.00')
+        mid = self.scraped_product(2, minutes=3, price='12.50')
+        self.assertEqual(self.pages(max_price='15'), [cheap, mid])
+        self.assertEqual(self.pages(min_price='10', max_price='12.5'), [mid])
+        for value in ('abc', 'NaN', '1,5'):
+            response = self.client.get(self.url, {'min_price': value})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('min_price', response.json()['error'])
+        self.assertEqual(self.client.get(self.url, {'max_price': 'x', 'stream': 'true'}).status_code, 400)
+
+    def test_stats_on_first_page_only(self):
+        self.database_product(1, minutes=1)
+        self.scraped_product(1, minutes=2)
+        self.scraped_product(2, minutes=3, is_active=False)
+        first = self.client.get(self.url, {'page_size': 1}).json()
+        self.assertEqual(first['stats'], {
+            'total': 2, 'from_database': 1, 'scraped_active': 1, 'scraped_total': 2, 'scraped_inactive': 1,
+        })
+        second = self.client.get(self.url, {'page_size': 1, 'cursor': first['next_cursor']}).json()
+        self.assertNotIn('stats', second)
+
+    def test_search_category_and_skin_type_filters(self):
+        oily = self.database_product(1, minutes=1, target_skin_types=['OILY', 'COMBINATION'])
+        self.database_product(2, minutes=2, target_skin_types=['DRY'])
+        serum = self.scraped_product(1, minutes=3, target_skin_types=['OILY'])
+        self.assertEqual(self.pages(skin_type='OILY'), [oily, serum])
+        self.assertEqual(self.pages(skin_type='OILY', category='SERUM'), [serum])
+        self.assertEqual(self.pages(q='roche', page_size=1), [serum])
+        self.assertEqual(self.pages(skin_type='COMBINATION'), [oily])
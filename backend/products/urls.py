@@ -3,6 +3,7 @@ from . import views
 
 urlpatterns = [
     path('', views.get_products, name='get_products'),
+    path('catalogue/', views.get_catalogue, name='get_catalogue'),
     path('<int:product_id>/', views.get_product, name='get_product'),
 ]
 
@@ -1,3 +1,12 @@
+import base64
+import heapq
+import json
+import logging
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from django.db.models import Count, Q
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_datetime
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
@@ -7,11 +16,26 @@ from recommendations.serializers import ProductSerializer
 from scraped_products.models import ScrapedProduct
 from scraped_products.serializers import ScrapedProductSerializer
 
+logger = logging.getLogger(__name__)
 
-def convert_scraped_to_product(scraped_product):
-    """Convertit un ScrapedProduct en format Product pour le frontend"""
+# Offset des identifiants de produits scrapés dans le catalogue unifié
+SCRAPED_ID_OFFSET = 1000000
+
+# Pagination du catalogue
+CATALOGUE_PAGE_SIZE = 50
+CATALOGUE_MAX_PAGE_SIZE = 200
+CATALOGUE_STREAM_CHUNK_SIZE = 500
+
+
+def convert_scraped_to_product(scraped_product, product_id=None):
+    """
+    Convertit un ScrapedProduct en format Product pour le frontend
+
+    Accepte aussi un produit de l'index de recommandation (FakeProduct), dont
+    product_id est l'identifiant unifié déjà décalé.
+    """
     return {
-        'id': scraped_product.id + 1000000,  # Ajouter un offset pour éviter les conflits d'ID
+        'id': product_id if product_id is not None else scraped_product.id + SCRAPED_ID_OFFSET,  # Offset : pas de conflit d'ID
         'name': scraped_product.name,
         'brand': scraped_product.brand,
         'description': scraped_product.description or scraped_product.name,
@@ -33,7 +57,12 @@ def convert_scraped_to_product(scraped_product):
 @api_view(['GET'])
 @permission_classes([AllowAny])  # Public pour permettre l'accès sans authentification
 def get_products(request):
-    """Obtenir tous les produits (de la base de données + produits scrapés)"""
+    """
+    Obtenir tous les produits (de la base de données + produits scrapés)
+    
+    Renvoie tout le catalogue en une réponse : préférer get_catalogue
+    (pagination par curseur, filtres, export en flux).
+    """
     try:
         all_products = []
         
@@ -47,30 +76,25 @@ def get_products(request):
             products = Product.objects.filter(is_active=True)
         product_serializer = ProductSerializer(products, many=True)
         all_products.extend(product_serializer.data)
-        print(f"📦 Produits de la base de données (recommendations): {len(all_products)}")
         
         # Charger les produits scrapés
         if include_inactive:
             scraped_products = ScrapedProduct.objects.all()
         else:
             scraped_products = ScrapedProduct.objects.filter(is_active=True)
-        scraped_count = scraped_products.count()
-        print(f"🕷️ Produits scrapés dans la base: {scraped_count}")
         
-        # Compter aussi les produits inactifs pour le debug
-        total_scraped = ScrapedProduct.objects.all().count()
-        inactive_scraped = ScrapedProduct.objects.filter(is_active=False).count()
-        active_scraped = ScrapedProduct.objects.filter(is_active=True).count()
-        print(f"   Total produits scrapés (tous): {total_scraped}")
-        print(f"   Produits scrapés actifs: {active_scraped}")
-        print(f"   Produits scrapés inactifs: {inactive_scraped}")
+        # Compteurs actifs/inactifs en une seule requête
+        counts = ScrapedProduct.objects.aggregate(
+            total=Count('id'), active=Count('id', filter=Q(is_active=True))
+        )
+        total_scraped = counts['total']
+        active_scraped = counts['active']
+        inactive_scraped = total_scraped - active_scraped
         
         for scraped_product in scraped_products:
             converted_product = convert_scraped_to_product(scraped_product)
             all_products.append(converted_product)
         
-        print(f"✅ Total produits retournés: {len(all_products)}")
-        
         # Trier par date de création (plus récents en premier)
         all_products.sort(key=lambda x: x.get('created_at', ''), reverse=True)
         
@@ -85,9 +109,7 @@ def get_products(request):
             }
         })
     except Exception as e:
-        import traceback
-        print(f"❌ Erreur lors du chargement des produits: {str(e)}")
-        print(traceback.format_exc())
+        logger.error(f"Erreur lors du chargement des produits: {e}", exc_info=True)
         return Response(
             {'error': f'Erreur lors du chargement des produits: {str(e)}'}, 
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -114,13 +136,192 @@ def get_product(request, product_id):
         )
 
 
+def encode_cursor(created_at, product_id):
+    """Curseur opaque de pagination : position (created_at, id unifié) du dernier produit renvoyé"""
+    payload = json.dumps({'c': created_at.isoformat(), 'id': product_id})
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Position (created_at, id unifié) d'un curseur, ValueError s'il est invalide"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        created_at = parse_datetime(payload['c'])
+        product_id = int(payload['id'])
+    except (TypeError, KeyError, ValueError, UnicodeError) as e:
+        raise ValueError(f'Curseur invalide: {e}')
+    if created_at is None:
+        raise ValueError('Curseur invalide: date illisible')
+    return created_at, product_id
+
+
+def _price_param(params, name):
+    """Borne de prix d'un filtre (Decimal ou None), ValueError si elle est illisible"""
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        price = Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f'{name} doit être un nombre')
+    if not price.is_finite():
+        raise ValueError(f'{name} doit être un nombre')
+    return price
 
 
+def catalogue_querysets(params):
+    """
+    Requêtes filtrées des deux sources du catalogue, triées par (created_at, id) décroissants
+    
+    Filtres (paramètres GET): source (database|scraped), category, brand,
+    source_site, min_price, max_price, q (nom ou marque), skin_type (type de
+    peau ciblé, ex. OILY), include_inactive
+    
+    Raises:
+        ValueError si un filtre est invalide (prix non numérique)
+    """
+    min_price, max_price = _price_param(params, 'min_price'), _price_param(params, 'max_price')
+    products = Product.objects.all()
+    scraped_products = ScrapedProduct.objects.all()
+    
+    if params.get('include_inactive', 'false').lower() != 'true':
+        products = products.filter(is_active=True)
+        scraped_products = scraped_products.filter(is_active=True)
+    
+    filters = Q()
+    if params.get('category'):
+        filters &= Q(category=params['category'])
+    if params.get('brand'):
+        filters &= Q(brand__icontains=params['brand'])
+    if min_price is not None:
+        filters &= Q(price__gte=min_price)
+    if max_price is not None:
+        filters &= Q(price__lte=max_price)
+    if params.get('q'):
+        filters &= Q(name__icontains=params['q']) | Q(brand__icontains=params['q'])
+    if params.get('skin_type'):
+        # target_skin_types est une liste JSON : recherche de l'élément entre guillemets
+        filters &= Q(target_skin_types__icontains=json.dumps(params['skin_type']))
+    products = products.filter(filters)
+    scraped_products = scraped_products.filter(filters)
+    
+    if params.get('source_site'):
+        # Seuls les produits scrapés ont un site source
+        products = products.none()
+        scraped_products = scraped_products.filter(source_site=params['source_site'])
+    
+    source = params.get('source')
+    if source == 'database':
+        scraped_products = scraped_products.none()
+    elif source == 'scraped':
+        products = products.none()
+    
+    return products.order_by('-created_at', '-id'), scraped_products.order_by('-created_at', '-id')
 
 
+def _after_cursor(queryset, created_at, product_id, id_offset):
+    """Produits strictement après la position du curseur dans l'ordre (created_at, id) décroissant"""
+    return queryset.filter(
+        Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=product_id - id_offset)
+    )
 
 
+def _catalogue_entries(products, scraped_products, chunk_size=None):
+    """
+    Fusion ordonnée des deux sources : tuples (created_at, id unifié, données produit)
+    
+    Chaque source est déjà triée par la base ; la fusion ne garde en mémoire
+    qu'un bloc de chaque requête.
+    """
+    def database_entries():
+        rows = products.iterator(chunk_size=chunk_size) if chunk_size else products
+        for product in rows:
+            yield product.created_at, product.id, product
+    
+    def scraped_entries():
+        rows = scraped_products.iterator(chunk_size=chunk_size) if chunk_size else scraped_products
+        for scraped_product in rows:
+            yield scraped_product.created_at, scraped_product.id + SCRAPED_ID_OFFSET, scraped_product
+    
+    return heapq.merge(database_entries(), scraped_entries(), key=lambda entry: entry[:2], reverse=True)
 
 
+def _catalogue_item(product):
+    if isinstance(product, ScrapedProduct):
+        return convert_scraped_to_product(product)
+    return ProductSerializer(product).data
 
 
+def catalogue_stats():
+    """Compteurs du catalogue (première page) : produits de la base, produits scrapés actifs et inactifs"""
+    from_database = Product.objects.filter(is_active=True).count()
+    counts = ScrapedProduct.objects.aggregate(total=Count('id'), active=Count('id', filter=Q(is_active=True)))
+    return {
+        'total': from_database + counts['active'],
+        'from_database': from_database,
+        'scraped_active': counts['active'],
+        'scraped_total': counts['total'],
+        'scraped_inactive': counts['total'] - counts['active'],
+    }
+
+
+def _stream_catalogue(products, scraped_products):
+    """Export JSON du catalogue complet, produit par produit (mémoire bornée)"""
+    yield '['
+    separator = ''
+    for _, _, product in _catalogue_entries(products, scraped_products, chunk_size=CATALOGUE_STREAM_CHUNK_SIZE):
+        yield separator + json.dumps(_catalogue_item(product), default=str)
+        separator = ','
+    yield ']'
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])  # Public pour permettre l'accès sans authentification
+def get_catalogue(request):
+    """
+    Catalogue unifié (base de données + produits scrapés), paginé par curseur
+    
+    Tri par date de création décroissante puis identifiant. Paramètres :
+        cursor: Curseur renvoyé par la page précédente (next_cursor)
+        page_size: Produits par page (max CATALOGUE_MAX_PAGE_SIZE)
+        stream=true: Export complet en flux JSON (sans pagination)
+        + filtres de catalogue_querysets
+    
+    La première page (sans curseur) contient aussi les compteurs du catalogue (stats).
+    """
+    params = request.query_params
+    try:
+        products, scraped_products = catalogue_querysets(params)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if params.get('stream', 'false').lower() == 'true':
+        response = StreamingHttpResponse(_stream_catalogue(products, scraped_products), content_type='application/json')
+        response['Content-Disposition'] = 'attachment; filename="catalogue.json"'
+        return response
+    
+    try:
+        page_size = min(max(int(params.get('page_size', CATALOGUE_PAGE_SIZE)), 1), CATALOGUE_MAX_PAGE_SIZE)
+    except ValueError:
+        return Response({'error': 'page_size doit être un entier'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if params.get('cursor'):
+        try:
+            created_at, product_id = decode_cursor(params['cursor'])
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        products = _after_cursor(products, created_at, product_id, 0)
+        scraped_products = _after_cursor(scraped_products, created_at, product_id, SCRAPED_ID_OFFSET)
+    
+    # page_size + 1 produits de chaque source suffisent pour savoir s'il reste une page
+    entries = list(islice(_catalogue_entries(products[:page_size + 1], scraped_products[:page_size + 1]), page_size + 1))
+    page, has_more = entries[:page_size], len(entries) > page_size
+    
+    data = {
+        'results': [_catalogue_item(product) for _, _, product in page],
+        'next_cursor': encode_cursor(page[-1][0], page[-1][1]) if has_more else None,
+        'page_size': page_size,
+    }
+    if not params.get('cursor'):
+        data['stats'] = catalogue_stats()
+    return Response(data)
@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class RecommendationsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'recommendations'
+    verbose_name = 'Recommandations'
+
+    def ready(self):
+        # Maintenir l'index produits à jour à chaque écriture du catalogue
+        from . import signals  # noqa: F401
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-17 16:15
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def remove_duplicate_recommendations(apps, schema_editor):
+    """Garder la recommandation la plus récente de chaque couple analyse/produit"""
+    Recommendation = apps.get_model('recommendations', 'Recommendation')
+    latest = (
+        Recommendation.objects.values('skin_analysis', 'product')
+        .annotate(latest_id=Max('id'))
+        .values_list('latest_id', flat=True)
+    )
+    Recommendation.objects.exclude(id__in=list(latest)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('detection', '0004_skinanalysis_model_outputs'),
+        ('recommendations', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_recommendations, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='recommendation',
+            constraint=models.UniqueConstraint(fields=('skin_analysis', 'product'), name='unique_recommendation_per_analysis'),
+        ),
+    ]
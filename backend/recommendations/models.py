@@ -70,6 +70,10 @@ class Recommendation(models.Model):
     class Meta:
         db_table = 'recommendations'
         ordering = ['-relevance_score']
+        constraints = [
+            # Une seule recommandation par produit et par analyse (upsert de save_recommendations)
+            models.UniqueConstraint(fields=['skin_analysis', 'product'], name='unique_recommendation_per_analysis'),
+        ]
 
 
 class UserFeedback(models.Model):
@@ -0,0 +1,355 @@
+"""
+Index en mémoire des produits pour le moteur de recommandation
+==============================================================
+
+Chaque produit actif (Product et ScrapedProduct) occupe une ligne de tableaux
+NumPy encodant ce qui intervient dans le score : types de peau ciblés, problèmes
+ciblés et catégorie. Le score de tous les produits est calculé en une passe
+vectorisée, sans requête ni boucle Python par produit.
+
+L'index est construit au premier usage puis maintenu incrémentalement par les
+signaux post_save / post_delete (voir recommendations/signals.py) : une mise à
+jour réécrit la ligne du produit en place, un retrait déplace la dernière ligne
+à sa place, et seul l'ordre d'itération est retrié après un ajout ou un
+retrait. Chaque
+modification incrémente ProductIndex.version, la version du catalogue qui
+invalide le cache de recommandations par signature de profil.
+
+L'index et le cache sont propres à chaque processus (worker) : les signaux
+n'y reportent que les écritures du processus courant. Pour suivre les
+écritures des autres processus, l'index compare au plus toutes les
+SYNC_INTERVAL secondes l'empreinte partagée du catalogue (nombre de lignes et
+dernier updated_at de Product et ScrapedProduct, lus en base) à celle de sa
+construction, et se reconstruit si elle a changé. Les workers convergent
+donc en SYNC_INTERVAL secondes au plus. Seules les écritures SQL qui ne
+modifient ni le nombre de lignes ni updated_at (QuerySet.update sans
+updated_at) échappent à l'empreinte : elles sont reprises par la
+reconstruction périodique (REFRESH_INTERVAL).
+
+Configuration (settings.RECOMMENDATION_INDEX):
+    REFRESH_INTERVAL: Délai maximal avant reconstruction complète (secondes, None = jamais)
+    SYNC_INTERVAL: Délai entre deux lectures de l'empreinte partagée (secondes, None = jamais)
+"""
+import logging
+import threading
+import time
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_CONFIG = {
+    'REFRESH_INTERVAL': 300,
+    'SYNC_INTERVAL': 5,
+}
+
+# Types de peau dont l'appartenance est précalculée (valeurs de SkinAnalysis.skin_type_prediction)
+SKIN_TYPES = ['DRY', 'NORMAL', 'OILY', 'COMBINATION', 'SENSITIVE']
+
+# Problèmes pris en compte par le score, dans l'ordre des colonnes de la matrice
+ISSUES = ['acne', 'wrinkles', 'dark_spots', 'redness']
+
+CATEGORIES = ['CLEANSER', 'MOISTURIZER', 'SERUM', 'SUNSCREEN', 'TREATMENT', 'MASK', 'TONER', 'EXFOLIANT']
+
+def get_index_config():
+    """Configuration de l'index produits, complétée par les valeurs par défaut"""
+    config = dict(DEFAULT_INDEX_CONFIG)
+    config.update(getattr(settings, 'RECOMMENDATION_INDEX', {}))
+    return config
+
+
+def _category_mask(categories):
+    mask = np.zeros(len(CATEGORIES) + 1, dtype=bool)  # Dernière case : catégorie inconnue
+    for category in categories:
+        mask[CATEGORIES.index(category)] = True
+    return mask
+
+
+# Catégories favorisées par chaque problème (cf. ProductRecommender._calculate_category_score)
+ACNE_CATEGORIES = _category_mask(['CLEANSER', 'TREATMENT', 'EXFOLIANT'])
+ANTI_AGING_CATEGORIES = _category_mask(['SERUM', 'TREATMENT', 'MOISTURIZER'])
+PIGMENTATION_CATEGORIES = _category_mask(['SERUM', 'TREATMENT', 'SUNSCREEN'])
+ESSENTIAL_CATEGORIES = _category_mask(['CLEANSER', 'MOISTURIZER', 'SUNSCREEN'])
+
+ISSUE_POINTS = np.array([30, 25, 25, 20], dtype=np.int16)
+
+
+def catalogue_fingerprint():
+    """Empreinte partagée du catalogue : (nombre, dernier updated_at) de Product et de ScrapedProduct (2 requêtes)"""
+    from django.db.models import Count, Max
+    from .models import Product
+    from scraped_products.models import ScrapedProduct
+
+    return tuple(
+        tuple(model.objects.order_by().aggregate(n=Count('id'), last=Max('updated_at')).values())
+        for model in (Product, ScrapedProduct)
+    )
+
+
+class ProductIndex:
+    """Tableaux colonnes des produits actifs et scoring vectorisé"""
+
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self, refresh_interval=300, sync_interval=5):
+        self.refresh_interval = refresh_interval
+        self.sync_interval = sync_interval
+        self._lock = threading.RLock()
+        self._built_at = None
+        self._fingerprint = None  # Empreinte partagée lue à la construction
+        self._synced_at = None
+        self.version = 0  # Incrémentée à chaque modification (invalide le cache de recommandations)
+        self._reset()
+
+    def _reset(self):
+        self._slots = {}  # ('product' | 'scraped', id) -> ligne
+        self._keys = []  # Clé de chaque ligne
+        self.products = []  # Objet produit (Product ou FakeProduct) de chaque ligne
+        self._product_codes = {}  # (nom, marque, catégorie) -> code de dédoublonnage
+        self._columns = self._allocate(self.INITIAL_CAPACITY)
+        self._order = None  # Lignes dans l'ordre d'itération d'origine (recalculé après modification)
+
+    @staticmethod
+    def _allocate(capacity):
+        return {
+            'skin': np.zeros((capacity, len(SKIN_TYPES)), dtype=bool),
+            'has_skin_types': np.zeros(capacity, dtype=bool),
+            'issues': np.zeros((capacity, len(ISSUES)), dtype=bool),
+            'category': np.zeros(capacity, dtype=np.int8),
+            'product_key': np.zeros(capacity, dtype=np.int64),
+            # Ordre d'itération de l'ancienne implémentation : produits de la base
+            # par id, puis produits scrapés du plus récent au plus ancien
+            'order_kind': np.zeros(capacity, dtype=np.int8),
+            'order_time': np.zeros(capacity, dtype=np.float64),
+            'order_id': np.zeros(capacity, dtype=np.int64),
+        }
+
+    # ------------------------------------------------------------------
+    # Construction et mise à jour
+    # ------------------------------------------------------------------
+
+    def ensure_fresh(self):
+        """
+        Construire l'index au premier usage ou après REFRESH_INTERVAL, le
+        reconstruire si l'empreinte partagée du catalogue a changé (lue au plus
+        toutes les SYNC_INTERVAL secondes)
+        """
+        with self._lock:
+            now = time.time()
+            expired = (
+                self.refresh_interval is not None and self._built_at is not None
+                and now - self._built_at > self.refresh_interval
+            )
+            if self._built_at is None or expired:
+                self.rebuild()
+            elif self.sync_interval is not None and now - self._synced_at >= self.sync_interval:
+                self._synced_at = now
+                if catalogue_fingerprint() != self._fingerprint:
+                    logger.info("Catalogue modifié par un autre processus, reconstruction de l'index produits")
+                    self.rebuild()
+
+    def rebuild(self):
+        """Reconstruction complète depuis la base (2 requêtes)"""
+        from .models import Product
+        from scraped_products.models import ScrapedProduct
+
+        started = time.perf_counter()
+        with self._lock:
+            # Empreinte lue avant les produits : une écriture concurrente déclenchera une nouvelle reconstruction
+            fingerprint = catalogue_fingerprint()
+            self._reset()
+            for product in Product.objects.filter(is_active=True):
+                self._add(('product', product.id), product)
+            for scraped in ScrapedProduct.objects.filter(is_active=True):
+                self._add(('scraped', scraped.id), scraped)
+            self._built_at = self._synced_at = time.time()
+            self._fingerprint = fingerprint
+        logger.info(f"Index produits reconstruit: {len(self._slots)} produits en {time.perf_counter() - started:.3f}s")
+
+    def invalidate(self):
+        """Forcer une reconstruction complète au prochain usage (écritures en masse)"""
+        with self._lock:
+            self._built_at = None
+
+    def upsert(self, kind, instance):
+        """Ajouter, mettre à jour (ligne réécrite en place) ou retirer (si inactif) un produit"""
+        with self._lock:
+            if self._built_at is None:
+                return  # Pas encore construit : la construction lira l'état courant
+            key = (kind, instance.id)
+            row = self._slots.get(key)
+            if not instance.is_active:
+                self._remove(key)
+            elif row is None:
+                self._add(key, instance)
+            else:
+                self._write(row, key, instance)
+                self.version += 1
+
+    def remove(self, kind, instance_id):
+        """Retirer un produit supprimé"""
+        with self._lock:
+            if self._built_at is not None:
+                self._remove((kind, instance_id))
+
+    def _write(self, row, key, instance):
+        """Écrire les attributs de scoring d'un produit dans la ligne row"""
+        from .recommender import convert_scraped_to_product
+
+        kind = key[0]
+        product = instance if kind == 'product' else convert_scraped_to_product(instance)
+        target_skin_types = product.target_skin_types
+        target_issues = product.target_issues
+        category = product.category
+        if kind == 'product':
+            order = (0, 0.0, instance.id)
+        else:
+            order = (1, -instance.created_at.timestamp() if instance.created_at else 0.0, -instance.id)
+
+        columns = self._columns
+        if self._order is not None and (
+            columns['order_kind'][row], columns['order_time'][row], columns['order_id'][row]
+        ) != order:
+            self._order = None
+        columns['skin'][row] = [skin_type in target_skin_types for skin_type in SKIN_TYPES]
+        columns['has_skin_types'][row] = bool(target_skin_types)
+        columns['issues'][row] = [issue in target_issues for issue in ISSUES]
+        columns['category'][row] = CATEGORIES.index(category) if category in CATEGORIES else len(CATEGORIES)
+        product_key = ((product.name or '').lower().strip(), (product.brand or '').lower().strip(), category or '')
+        columns['product_key'][row] = self._product_codes.setdefault(product_key, len(self._product_codes))
+        columns['order_kind'][row], columns['order_time'][row], columns['order_id'][row] = order
+        self.products[row] = product
+
+    def _add(self, key, instance):
+        row = len(self._keys)
+        capacity = len(self._columns['category'])
+        if row == capacity:
+            # Capacité doublée : copie amortie, les lignes existantes ne sont pas recalculées
+            grown = self._allocate(capacity * 2)
+            for name, column in self._columns.items():
+                grown[name][:row] = column[:row]
+            self._columns = grown
+        self._keys.append(key)
+        self.products.append(None)
+        self._slots[key] = row
+        self._write(row, key, instance)
+        self._order = None
+        self.version += 1
+
+    def _remove(self, key):
+        """Retirer une ligne : la dernière ligne prend sa place (pas de ligne morte)"""
+        row = self._slots.pop(key, None)
+        if row is None:
+            return
+        last = len(self._keys) - 1
+        if row != last:
+            for column in self._columns.values():
+                column[row] = column[last]
+            moved = self._keys[last]
+            self._keys[row] = moved
+            self.products[row] = self.products[last]
+            self._slots[moved] = row
+        self._keys.pop()
+        self.products.pop()
+        self._order = None
+        self.version += 1
+
+    def _ordered_rows(self):
+        """Lignes dans l'ordre d'itération d'origine (tri recalculé seulement après modification)"""
+        if self._order is None:
+            n = len(self._keys)
+            columns = self._columns
+            self._order = np.lexsort((columns['order_id'][:n], columns['order_time'][:n], columns['order_kind'][:n]))
+        return self._order
+
+    # ------------------------------------------------------------------
+    # Scoring
+    # ------------------------------------------------------------------
+
+    def score(self, skin_analysis):
+        """
+        Scores de pertinence et de confiance de tous les produits, en une passe
+
+        Returns:
+            rows: Lignes de l'index dans l'ordre d'itération d'origine
+            relevance: Score de pertinence (0-100) de chaque ligne
+            confidence: Score de confiance (0-1) de chaque ligne
+            product_keys: Code nom + marque + catégorie de chaque ligne (dédoublonnage)
+            products: Objets produit par ligne
+        """
+        with self._lock:
+            # Colonnes copiées sous verrou : les mises à jour réécrivent les tableaux en place
+            rows = self._ordered_rows()
+            columns = self._columns
+            category = columns['category'][rows]
+            issues = columns['issues'][rows]
+            has_skin_types = columns['has_skin_types'][rows]
+            product_keys = columns['product_key'][rows]
+            predicted = skin_analysis.skin_type_prediction
+            skin_column = columns['skin'][rows, SKIN_TYPES.index(predicted)] if predicted in SKIN_TYPES else None
+            products = list(self.products)
+
+        detected = np.array([
+            bool(skin_analysis.acne_detected), bool(skin_analysis.wrinkles_detected),
+            bool(skin_analysis.dark_spots_detected), bool(skin_analysis.redness_detected)
+        ])
+
+        # Type de peau : 40 si ciblé, 20 si le produit cible d'autres types
+        if skin_column is not None:
+            skin_match = skin_column
+        else:
+            skin_match = np.array([predicted in products[i].target_skin_types for i in rows], dtype=bool)
+        skin_score = np.where(skin_match, 40, np.where(bool(predicted) & has_skin_types, 20, 0))
+
+        # Problèmes détectés et ciblés
+        issue_matches = issues & detected
+        issues_score = issue_matches.astype(np.int16) @ ISSUE_POINTS
+
+        # Catégorie
+        category_score = (
+            15 * (detected[0] & ACNE_CATEGORIES[category])
+            + 15 * (detected[1] & ANTI_AGING_CATEGORIES[category])
+            + 15 * (detected[2] & PIGMENTATION_CATEGORIES[category])
+            + 10 * ESSENTIAL_CATEGORIES[category]
+        )
+
+        relevance = np.minimum(skin_score + issues_score + category_score, 100)
+
+        confidence = 0.5 + issue_matches.sum(axis=1) * 0.1
+        if skin_analysis.skin_type_confidence and skin_analysis.skin_type_confidence > 0.8:
+            confidence = confidence + 0.2
+        confidence = np.minimum(confidence, 1.0)
+
+        return rows, relevance, confidence, product_keys, products
+
+    def top_candidates(self, skin_analysis, min_score=30):
+        """
+        Produits au-dessus du seuil, dédoublonnés et triés par score décroissant
+
+        Le premier produit (dans l'ordre d'itération) de chaque clé
+        nom + marque + catégorie est conservé, comme dans l'ancienne boucle.
+
+        Returns:
+            candidates: Tuples (ligne, relevance, confidence), triés de façon stable
+            products: Objets produit par ligne
+        """
+        rows, relevance, confidence, product_keys, products = self.score(skin_analysis)
+
+        passing = np.flatnonzero(relevance > min_score)
+        if not len(passing):
+            return [], products
+
+        # Dédoublonnage : première occurrence de chaque clé produit
+        _, first = np.unique(product_keys[passing], return_index=True)
+        passing = passing[np.sort(first)]
+
+        # Tri stable par score décroissant
+        passing = passing[np.argsort(-relevance[passing], kind='stable')]
+        candidates = [(int(rows[i]), int(relevance[i]), float(confidence[i])) for i in passing]
+        return candidates, products
+
+
+_index_config = get_index_config()
+product_index = ProductIndex(
+    refresh_interval=_index_config['REFRESH_INTERVAL'], sync_interval=_index_config['SYNC_INTERVAL']
+)
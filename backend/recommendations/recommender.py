@@ -1,33 +1,97 @@
 """
 Moteur de recommandation de produits cosmétiques
+
+Le score d'un produit ne dépend que de la signature de profil de l'analyse
+(type de peau, 4 problèmes détectés, confiance > 0.8) : les recommandations
+sont mises en cache par signature et invalidées dès que la version du
+catalogue (product_index.version) change.
+
+Le cache est propre à chaque processus, comme l'index. La version change
+après une écriture du processus courant (signaux) et après une écriture d'un
+autre processus, détectée par l'empreinte partagée du catalogue au plus
+SYNC_INTERVAL secondes plus tard (voir product_index) : les caches des
+workers sont cohérents à SYNC_INTERVAL près.
+
+Configuration (settings.RECOMMENDATION_CACHE):
+    ENABLED: Activer le cache par signature de profil
+    MAX_ENTRIES: Nombre maximal de signatures en cache
 """
 import logging
+import threading
+from collections import OrderedDict
 from typing import List, Dict, Any
+from django.conf import settings
 from .models import Product, Recommendation
 from detection.models import SkinAnalysis
 from scraped_products.models import ScrapedProduct
+from skin_ai.bulk import bulk_save
+from skin_ai.lazy_services import LazyService
+from .product_index import product_index
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_RECOMMENDATION_CACHE_CONFIG = {
+    'ENABLED': True,
+    'MAX_ENTRIES': 256,
+}
+
+
+def get_recommendation_cache_config():
+    """Configuration du cache de recommandations, complétée par les valeurs par défaut"""
+    config = dict(DEFAULT_RECOMMENDATION_CACHE_CONFIG)
+    config.update(getattr(settings, 'RECOMMENDATION_CACHE', {}))
+    return config
+
+
+def profile_signature(skin_analysis):
+    """Champs de l'analyse dont dépendent les scores de pertinence et de confiance"""
+    return (
+        skin_analysis.skin_type_prediction,
+        bool(skin_analysis.acne_detected),
+        bool(skin_analysis.wrinkles_detected),
+        bool(skin_analysis.dark_spots_detected),
+        bool(skin_analysis.redness_detected),
+        bool(skin_analysis.skin_type_confidence and skin_analysis.skin_type_confidence > 0.8),
+    )
+
+
+class FakeProduct:
+    """
+    Produit scrapé au format Product pour le système de recommandation
+
+    Copie des champs utilisés par le scoring et par les vues de
+    recommandation (données frontend, groupe d'équivalence) : l'index ne
+    garde pas l'instance ScrapedProduct.
+    """
+
+    __slots__ = (
+        'id', 'name', 'brand', 'description', 'ingredients', 'price', 'size', 'category',
+        'target_skin_types', 'target_issues', 'image', 'url', 'source_site', 'match_group',
+        'is_active', 'created_at', 'updated_at',
+    )
+
+    def __init__(self, scraped):
+        self.id = scraped.id + 1000000  # Offset pour éviter les conflits
+        self.name = scraped.name
+        self.brand = scraped.brand
+        self.description = scraped.description or scraped.name
+        self.ingredients = scraped.ingredients or ''
+        self.price = scraped.price
+        self.size = scraped.size
+        self.category = scraped.category
+        self.target_skin_types = scraped.target_skin_types or ['NORMAL']
+        self.target_issues = scraped.target_issues or []
+        self.image = scraped.image
+        self.url = scraped.url
+        self.source_site = scraped.source_site
+        self.match_group = scraped.match_group
+        self.is_active = scraped.is_active
+        self.created_at = scraped.created_at
+        self.updated_at = scraped.updated_at
+
 
 def convert_scraped_to_product(scraped_product):
     """Convertit un ScrapedProduct en format Product pour le système de recommandation"""
-    # Créer un objet Product factice avec les mêmes attributs
-    class FakeProduct:
-        def __init__(self, scraped):
-            self.id = scraped.id + 1000000  # Offset pour éviter les conflits
-            self.name = scraped.name
-            self.brand = scraped.brand
-            self.description = scraped.description or scraped.name
-            self.ingredients = scraped.ingredients or ''
-            self.price = scraped.price
-            self.size = scraped.size
-            self.category = scraped.category
-            self.target_skin_types = scraped.target_skin_types or ['NORMAL']
-            self.target_issues = scraped.target_issues or []
-            self.image = scraped.image
-            self.is_active = scraped.is_active
-    
     return FakeProduct(scraped_product)
 
 
@@ -35,112 +99,141 @@ class ProductRecommender:
     """Moteur de recommandation de produits"""
     
     def __init__(self):
-        self._load_products()
-    
-    def _load_products(self):
-        """Recharger les produits depuis la base de données et les produits scrapés"""
-        # Charger les produits de la base de données
-        self.db_products = Product.objects.filter(is_active=True)
-        # Charger les produits scrapés
-        self.scraped_products = ScrapedProduct.objects.filter(is_active=True)
-        
-        # Convertir les produits scrapés en format Product
-        self.products = list(self.db_products) + [
-            convert_scraped_to_product(sp) for sp in self.scraped_products
-        ]
+        # Les produits sont lus depuis l'index en mémoire (product_index),
+        # construit au premier appel de get_recommendations
+        self.index = product_index
+        
+        # Cache (signature de profil, limite) -> recommandations
+        config = get_recommendation_cache_config()
+        self.cache_enabled = config['ENABLED']
+        self.cache_max_entries = max(1, int(config['MAX_ENTRIES']))
+        self._cache = OrderedDict()
+        self._cache_version = None
+        self._cache_lock = threading.Lock()
+        self._cache_hits = 0
+        self._cache_misses = 0
     
     def get_recommendations(self, skin_analysis: SkinAnalysis, limit: int = 10) -> List[Dict[str, Any]]:
         """Obtenir des recommandations basées sur l'analyse de peau"""
         try:
-            # Recharger les produits pour avoir les plus récents
-            self._load_products()
-            
-            recommendations = []
-            seen_products = set()  # Pour éviter les doublons basés sur nom+marque
+            self.index.ensure_fresh()
+            if not self.cache_enabled:
+                return self._compute_recommendations(skin_analysis, limit)
             
-            for product in self.products:
-                # Créer une clé unique pour éviter les doublons exacts
-                product_key = (
-                    (product.name or '').lower().strip(),
-                    (product.brand or '').lower().strip(),
-                    product.category or ''
-                )
-                
-                # Si on a déjà vu ce produit exact, passer au suivant
-                if product_key in seen_products:
-                    continue
-                
-                score, reasons = self._calculate_relevance_score(skin_analysis, product)
-                
-                if score > 30:  # Seuil minimum de pertinence
-                    recommendations.append({
-                        'product': product,
-                        'relevance_score': score,
-                        'confidence_score': self._calculate_confidence_score(skin_analysis, product),
-                        'reasons': reasons
-                    })
-                    seen_products.add(product_key)
-            
-            # Trier par score de pertinence
-            recommendations.sort(key=lambda x: x['relevance_score'], reverse=True)
-            
-            # Diversifier les sources : essayer d'avoir des produits de différents sites
-            # Grouper par nom+marque pour diversifier
-            diversified_recommendations = []
-            product_groups = {}
-            
-            for rec in recommendations:
-                product = rec['product']
-                # Créer une clé de groupe basée sur nom+marque (sans tenir compte du site)
-                group_key = (
-                    (product.name or '').lower().strip()[:50],  # Limiter la longueur
-                    (product.brand or '').lower().strip()
-                )
-                
-                if group_key not in product_groups:
-                    product_groups[group_key] = []
-                product_groups[group_key].append(rec)
+            key = (profile_signature(skin_analysis), limit)
+            version = self.index.version
+            with self._cache_lock:
+                # Catalogue modifié : toutes les entrées sont périmées
+                if self._cache_version != version:
+                    self._cache.clear()
+                    self._cache_version = version
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    self._cache_hits += 1
+                else:
+                    self._cache_misses += 1
             
-            # Prendre le meilleur produit de chaque groupe, mais aussi diversifier les sources
-            source_count = {}
-            for group_key, group_recs in product_groups.items():
-                # Trier les produits du groupe par score
-                group_recs.sort(key=lambda x: x['relevance_score'], reverse=True)
-                
-                # Prendre le meilleur produit du groupe
-                best_rec = group_recs[0]
-                diversified_recommendations.append(best_rec)
-                
-                # Si on a encore de la place, ajouter d'autres produits du même groupe mais de sites différents
-                if len(diversified_recommendations) < limit * 2:  # Prendre 2x plus pour avoir du choix
-                    for rec in group_recs[1:]:
-                        product = rec['product']
-                        # Vérifier si c'est un produit scrapé pour obtenir son source_site
-                        source = 'unknown'
-                        if hasattr(product, 'id') and product.id >= 1000000:
-                            try:
-                                from scraped_products.models import ScrapedProduct
-                                scraped_id = product.id - 1000000
-                                scraped_product = ScrapedProduct.objects.get(id=scraped_id)
-                                source = scraped_product.source_site or 'unknown'
-                            except:
-                                pass
-                        
-                        # Ajouter si c'est d'un site différent ou si on n'a pas encore assez de produits
-                        if source not in source_count or source_count[source] < 3:
-                            diversified_recommendations.append(rec)
-                            source_count[source] = source_count.get(source, 0) + 1
-                            if len(diversified_recommendations) >= limit * 2:
-                                break
+            if cached is None:
+                cached = self._compute_recommendations(skin_analysis, limit)
+                with self._cache_lock:
+                    # Ne pas stocker un résultat calculé sur une version déjà remplacée
+                    if self._cache_version == version == self.index.version:
+                        self._cache[key] = cached
+                        while len(self._cache) > self.cache_max_entries:
+                            self._cache.popitem(last=False)
             
-            # Trier à nouveau et limiter
-            diversified_recommendations.sort(key=lambda x: x['relevance_score'], reverse=True)
-            return diversified_recommendations[:limit]
+            # Copies : l'appelant peut modifier ses recommandations sans toucher au cache
+            return [dict(rec, reasons=list(rec['reasons'])) for rec in cached]
             
         except Exception as e:
             logger.error(f"Erreur lors de la génération des recommandations: {e}")
             return []
     
+    def clear_cache(self):
+        """Vider le cache de recommandations"""
+        with self._cache_lock:
+            self._cache.clear()
+    
+    def get_cache_stats(self):
+        """Compteurs du cache de recommandations"""
+        with self._cache_lock:
+            lookups = self._cache_hits + self._cache_misses
+            return {
+                'enabled': self.cache_enabled,
+                'entries': len(self._cache),
+                'max_entries': self.cache_max_entries,
+                'catalogue_version': self._cache_version,
+                'hits': self._cache_hits,
+                'misses': self._cache_misses,
+                'hit_rate': self._cache_hits / lookups if lookups else 0.0,
+            }
+    
+    def _compute_recommendations(self, skin_analysis: SkinAnalysis, limit: int) -> List[Dict[str, Any]]:
+        """Calculer les recommandations d'une signature de profil depuis l'index"""
+        # Index en mémoire maintenu par les signaux : aucune requête ni
+        # boucle Python par produit pour le scoring
+        candidates, products = self.index.top_candidates(skin_analysis, min_score=30)
+        
+        # Candidats déjà dédoublonnés (nom+marque+catégorie) et triés par score
+        recommendations = [
+            {
+                'product': products[row],
+                'relevance_score': relevance,
+                'confidence_score': confidence,
+                'reasons': None  # Calculées uniquement pour les produits retenus
+            }
+            for row, relevance, confidence in candidates
+        ]
+        
+        # Diversifier les sources : essayer d'avoir des produits de différents sites
+        # Grouper par nom+marque pour diversifier
+        diversified_recommendations = []
+        product_groups = {}
+        
+        for rec in recommendations:
+            product = rec['product']
+            # Créer une clé de groupe basée sur nom+marque (sans tenir compte du site)
+            group_key = (
+                (product.name or '').lower().strip()[:50],  # Limiter la longueur
+                (product.brand or '').lower().strip()
+            )
+            
+            if group_key not in product_groups:
+                product_groups[group_key] = []
+            product_groups[group_key].append(rec)
+        
+        # Prendre le meilleur produit de chaque groupe, mais aussi diversifier les sources
+        source_count = {}
+        for group_key, group_recs in product_groups.items():
+            # Trier les produits du groupe par score
+            group_recs.sort(key=lambda x: x['relevance_score'], reverse=True)
+            
+            # Prendre le meilleur produit du groupe
+            best_rec = group_recs[0]
+            diversified_recommendations.append(best_rec)
+            
+            # Si on a encore de la place, ajouter d'autres produits du même groupe mais de sites différents
+            if len(diversified_recommendations) < limit * 2:  # Prendre 2x plus pour avoir du choix
+                for rec in group_recs[1:]:
+                    product = rec['product']
+                    # Site source porté par le produit (chargé avec l'index)
+                    source = getattr(product, 'source_site', None) or 'unknown'
+                    
+                    # Ajouter si c'est d'un site différent ou si on n'a pas encore assez de produits
+                    if source not in source_count or source_count[source] < 3:
+                        diversified_recommendations.append(rec)
+                        source_count[source] = source_count.get(source, 0) + 1
+                        if len(diversified_recommendations) >= limit * 2:
+                            break
+        
+        # Trier à nouveau et limiter
+        diversified_recommendations.sort(key=lambda x: x['relevance_score'], reverse=True)
+        selected = diversified_recommendations[:limit]
+        for rec in selected:
+            rec['reasons'] = self._calculate_relevance_score(skin_analysis, rec['product'])[1]
+        return selected
+    
     def _calculate_relevance_score(self, skin_analysis: SkinAnalysis, product: Product) -> tuple:
         """Calculer le score de pertinence d'un produit"""
         score = 0
@@ -269,10 +362,17 @@ class ProductRecommender:
         return min(confidence, 1.0)
     
     def save_recommendations(self, skin_analysis: SkinAnalysis, recommendations: List[Dict[str, Any]]):
-        """Sauvegarder les recommandations en base"""
+        """
+        Sauvegarder les recommandations en base (une transaction, upsert idempotent)
+        
+        Une recommandation existante pour le même couple analyse/produit est
+        mise à jour : sauvegarder deux fois les mêmes recommandations ne crée
+        pas de doublons. Les produits scrapés, qui n'ont pas de ligne Product,
+        ne sont pas persistés.
+        """
         try:
-            for rec in recommendations:
-                Recommendation.objects.create(
+            rows = [
+                Recommendation(
                     user=skin_analysis.user,
                     skin_analysis=skin_analysis,
                     product=rec['product'],
@@ -280,16 +380,24 @@ class ProductRecommender:
                     confidence_score=rec['confidence_score'],
                     reasons=rec['reasons']
                 )
+                for rec in recommendations
+                if isinstance(rec['product'], Product)
+            ]
+            bulk_save(
+                Recommendation, rows,
+                unique_fields=['skin_analysis', 'product'],
+                update_fields=['relevance_score', 'confidence_score', 'reasons']
+            )
             
-            logger.info(f"Recommandations sauvegardées pour l'analyse {skin_analysis.id}")
+            logger.info(f"{len(rows)} recommandations sauvegardées pour l'analyse {skin_analysis.id}")
             
         except Exception as e:
             logger.error(f"Erreur lors de la sauvegarde des recommandations: {e}")
             raise
 
 
-# Instance globale du recommandateur
-product_recommender = ProductRecommender()
+# Instance globale du recommandateur (créée au premier usage)
+product_recommender = LazyService(ProductRecommender, 'product_recommender')
 
 
 
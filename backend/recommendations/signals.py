@@ -0,0 +1,30 @@
+"""
+Mise à jour incrémentale de l'index produits
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from scraped_products.models import ScrapedProduct
+from .models import Product
+from .product_index import product_index
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    """Ajouter/mettre à jour un produit (retiré s'il est désactivé)"""
+    product_index.upsert('product', instance)
+
+
+@receiver(post_save, sender=ScrapedProduct)
+def index_scraped_product(sender, instance, **kwargs):
+    """Ajouter/mettre à jour un produit scrapé (retiré s'il est désactivé)"""
+    product_index.upsert('scraped', instance)
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    product_index.remove('product', instance.id)
+
+
+@receiver(post_delete, sender=ScrapedProduct)
+def unindex_scraped_product(sender, instance, **kwargs):
+    product_index.remove('scraped', instance.id)
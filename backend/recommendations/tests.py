@@ -0,0 +1,213 @@
+from decimal import Decimal
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+from detection.models import SkinAnalysis
+from scraped_products.ingest import ingest_products
+from scraped_products.matching import product_matcher
+from scraped_products.models import ScrapedProduct
+from .models import Product, Recommendation
+from .product_index import product_index
+from .recommender import FakeProduct, ProductRecommender
+from .views import get_recommendations, RECOMMENDATIONS_QUERY_BUDGET
+
+
+class RecommendationQueryBudgetTest(TestCase):
+    """Le nombre de requêtes SQL ne dépend pas du nombre de produits recommandés"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(username='budget', email='budget@example.com')
+        Product.objects.create(
+            name='Gel nettoyant purifiant', brand='Avene', category='CLEANSER', description='', ingredients='',
+            target_skin_types=['OILY'], target_issues=['acne']
+        )
+        for i in range(40):
+            ScrapedProduct.objects.create(
+                name=f'Gel nettoyant purifiant {i % 8}', brand='Avene', category='CLEANSER', price=Decimal('12.50'),
+                target_skin_types=['OILY'], target_issues=['acne'],
+                source_site=f'site{i % 4}', url=f'https://example.com/p/{i}'
+            )
+        self.analysis = SkinAnalysis.objects.create(
+            user=self.user, image='uploads/skin_analyses/test.jpg',
+            skin_type_prediction='OILY', skin_type_confidence=0.9, acne_detected=True
+        )
+        call_command('build_product_groups', stdout=StringIO())
+        product_matcher.load()
+        product_index.rebuild()
+
+    def test_recommender_runs_no_query(self):
+        with self.assertNumQueries(0):
+            recommendations = ProductRecommender().get_recommendations(self.analysis, limit=50)
+        self.assertTrue(recommendations)
+
+    def test_view_stays_within_budget(self):
+        request = APIRequestFactory().get(f'/api/recommendations/analysis/{self.analysis.id}/')
+        force_authenticate(request, user=self.user)
+        with self.assertNumQueries(RECOMMENDATIONS_QUERY_BUDGET):
+            response = get_recommendations(request, self.analysis.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(any(len(rec['product'].get('sources', [])) > 1 for rec in response.data))
+
+    def test_index_follows_catalogue_writes(self):
+        for scraped in ScrapedProduct.objects.all():
+            scraped.is_active = False
+            scraped.save()
+        recommendations = ProductRecommender().get_recommendations(self.analysis, limit=50)
+        self.assertEqual([rec['product'].name for rec in recommendations], ['Gel nettoyant purifiant'])
+
+    def test_index_follows_bulk_ingest(self):
+        recommender = ProductRecommender()
+        recommender.get_recommendations(self.analysis, limit=50)  # Index construit, cache rempli
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest_products([{
+                'name': 'Mousse exfoliante anti-imperfections', 'brand': 'Uriage', 'price': '21.00',
+                'category': 'EXFOLIANT', 'target_skin_types': ['OILY'], 'target_issues': ['acne'],
+                'url': 'https://example.com/p/ingest', 'source_site': 'site0',
+            }])
+        names = [rec['product'].name for rec in recommender.get_recommendations(self.analysis, limit=50)]
+        self.assertIn('Mousse exfoliante anti-imperfections', names)
+
+    def test_profile_signature_cache(self):
+        recommender = ProductRecommender()
+        first = recommender.get_recommendations(self.analysis, limit=5)
+        same_profile = SkinAnalysis(
+            user=self.user, skin_type_prediction='OILY', skin_type_confidence=0.95, acne_detected=True
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(recommender.get_recommendations(same_profile, limit=5), first)
+        self.assertEqual(recommender.get_cache_stats()['hits'], 1)
+
+        # Toute modification du catalogue invalide le cache
+        Product.objects.create(
+            name='Gel nettoyant purifiant intense', brand='Bioderma', category='CLEANSER', description='', ingredients='',
+            target_skin_types=['OILY'], target_issues=['acne']
+        )
+        names = [rec['product'].name for rec in recommender.get_recommendations(same_profile, limit=5)]
+        self.assertIn('Gel nettoyant purifiant intense', names)
+
+    def test_cache_follows_writes_from_other_processes(self):
+        recommender = ProductRecommender()
+        before = recommender.get_recommendations(self.analysis, limit=50)
+        version = product_index.version
+
+        # Écriture d'un autre worker : aucun signal n'atteint l'index de ce processus
+        ScrapedProduct.objects.bulk_create([ScrapedProduct(
+            name='Mousse exfoliante anti-imperfections', brand='Uriage', category='EXFOLIANT',
+            price=Decimal('21.00'), target_skin_types=['OILY'], target_issues=['acne'],
+            source_site='site0', url='https://example.com/p/autre-worker'
+        )])
+        with self.assertNumQueries(0):  # Empreinte relue au plus toutes les SYNC_INTERVAL secondes
+            self.assertEqual(recommender.get_recommendations(self.analysis, limit=50), before)
+
+        product_index._synced_at -= product_index.sync_interval
+        names = [rec['product'].name for rec in recommender.get_recommendations(self.analysis, limit=50)]
+        self.assertIn('Mousse exfoliante anti-imperfections', names)
+        self.assertNotEqual(product_index.version, version)
+
+        # Empreinte inchangée : pas de reconstruction
+        version = product_index.version
+        product_index._synced_at -= product_index.sync_interval
+        with self.assertNumQueries(2):
+            recommender.get_recommendations(self.analysis, limit=50)
+        self.assertEqual(product_index.version, version)
+
+    def test_save_recommendations_is_idempotent(self):
+        recommender = ProductRecommender()
+        recommendations = recommender.get_recommendations(self.analysis, limit=50)
+        with self.assertNumQueries(3):  # SAVEPOINT + INSERT ... ON CONFLICT + RELEASE
+            recommender.save_recommendations(self.analysis, recommendations)
+        next(rec for rec in recommendations if isinstance(rec['product'], Product))['relevance_score'] = 12.0
+        recommender.save_recommendations(self.analysis, recommendations)
+        saved = Recommendation.objects.filter(skin_analysis=self.analysis)
+        self.assertEqual(saved.count(), 1)  # Seul le produit de la base est persisté
+        self.assertEqual(saved.get().relevance_score, 12.0)
+
+
+class ProductIndexTest(TestCase):
+    """Scoring vectorisé de l'index produits et mises à jour incrémentales"""
+
+    def setUp(self):
+        categories = ['CLEANSER', 'SERUM', 'SUNSCREEN', 'MASK', 'TONER', 'OTHER']
+        issue_sets = [[], ['acne'], ['wrinkles', 'dark_spots'], ['acne', 'redness', 'wrinkles', 'dark_spots']]
+        skin_sets = [[], ['OILY'], ['DRY', 'SENSITIVE'], ['COMBINATION', 'NORMAL', 'OILY']]
+        for i in range(24):
+            kwargs = dict(
+                brand=f'Marque {i % 3}', category=categories[i % len(categories)],
+                target_skin_types=skin_sets[i % len(skin_sets)], target_issues=issue_sets[(i // 2) % len(issue_sets)]
+            )
+            if i % 2:
+                ScrapedProduct.objects.create(
+                    name=f'Soin {i}', price=Decimal('10.00'), url=f'https://example.com/p/{i}', source_site='site', **kwargs
+                )
+            else:
+                Product.objects.create(name=f'Soin {i}', description='', ingredients='', **kwargs)
+        product_index.rebuild()
+
+    def profiles(self):
+        for skin_type in ('OILY', 'DRY', 'COMBINATION', 'UNKNOWN', None):
+            for flags in range(16):
+                for confidence in (0.5, 0.9):
+                    yield SkinAnalysis(
+                        skin_type_prediction=skin_type, skin_type_confidence=confidence,
+                        acne_detected=bool(flags & 1), wrinkles_detected=bool(flags & 2),
+                        dark_spots_detected=bool(flags & 4), redness_detected=bool(flags & 8)
+                    )
+
+    def scores(self, analysis):
+        rows, relevance, confidence, _, products = product_index.score(analysis)
+        return {products[row].id: (int(r), round(float(c), 6)) for row, r, c in zip(rows, relevance, confidence)}
+
+    def test_vectorized_score_matches_reference(self):
+        recommender = ProductRecommender()
+        for analysis in self.profiles():
+            rows, relevance, confidence, _, products = product_index.score(analysis)
+            self.assertEqual(len(rows), 24)
+            for row, score, conf in zip(rows, relevance, confidence):
+                product = products[row]
+                self.assertEqual(int(score), recommender._calculate_relevance_score(analysis, product)[0])
+                self.assertAlmostEqual(float(conf), recommender._calculate_confidence_score(analysis, product))
+
+    def test_incremental_updates_match_rebuild(self):
+        product_index.INITIAL_CAPACITY = 4  # Plusieurs agrandissements pendant les écritures
+        self.addCleanup(delattr, product_index, 'INITIAL_CAPACITY')
+        product_index.rebuild()
+        scraped = list(ScrapedProduct.objects.order_by('id'))
+        scraped[0].target_issues = ['acne']
+        scraped[0].save()  # Mise à jour en place
+        scraped[1].is_active = False
+        scraped[1].save()  # Retrait
+        scraped[2].delete()
+        Product.objects.filter(name='Soin 0').get().delete()
+        for i in range(30, 40):
+            ScrapedProduct.objects.create(
+                name=f'Nouveau {i}', brand='Marque', category='SERUM', price=Decimal('10.00'), target_skin_types=['DRY'],
+                target_issues=['wrinkles'], url=f'https://example.com/p/{i}', source_site='site'
+            )
+
+        self.assertEqual(len(product_index.products), 31)  # Aucune ligne morte
+        self.assertNotIn(None, product_index.products)
+        analyses = list(self.profiles())[::7]
+        incremental = [self.scores(analysis) for analysis in analyses]
+        order = [product.id for product in (product_index.products[row] for row in product_index.score(analyses[0])[0])]
+        product_index.rebuild()
+        self.assertEqual([self.scores(analysis) for analysis in analyses], incremental)
+        self.assertEqual([product_index.products[row].id for row in product_index.score(analyses[0])[0]], order)
+
+    def test_scraped_entries_do_not_hold_orm_instances(self):
+        product = next(p for p in product_index.products if isinstance(p, FakeProduct))
+        self.assertFalse(hasattr(product, '__dict__'))
+        self.assertFalse(any(isinstance(getattr(product, field), ScrapedProduct) for field in FakeProduct.__slots__))
+
+
+class ProductMatchingTest(TestCase):
+    """Index d'équivalence des produits entre sites"""
+
+    def test_same_product_across_sites_shares_a_group(self):
+        product_matcher.load()
+        group = product_matcher.match('Effaclar Gel Moussant Purifiant 400ml', 'La Roche-Posay')
+        self.assertEqual(product_matcher.match('EFFACLAR gel moussant purifiant - 400 ml', 'La Roche Posay'), group)
+        self.assertEqual(product_matcher.lookup('Effaclar Gel Moussant Purifiant 400 ml', 'la roche-posay'), group)
+        self.assertNotEqual(product_matcher.match('Effaclar Duo+ Soin Anti-Imperfections', 'La Roche-Posay'), group)
+        self.assertNotEqual(product_matcher.match('Effaclar Gel Moussant Purifiant 400ml', 'Avene'), group)
@@ -6,8 +6,6 @@ class ScrapedProductsConfig(AppConfig):
     name = 'scraped_products'
     verbose_name = 'Produits Scrapés'
 
-
-
-
-
-
+    def ready(self):
+        # Tenir l'index plein texte à jour à chaque écriture
+        from . import signals  # noqa: F401
@@ -0,0 +1,141 @@
+"""
+Classification des produits scrapés (catégorie et problèmes ciblés)
+===================================================================
+
+Règles par mots-clés partagées par tous les scrapers, compilées une fois en
+une seule expression régulière : un passage sur le texte d'un produit suffit,
+au lieu d'une chaîne de any(word in name_lower for word in [...]).
+
+Sémantique : un mot-clé correspond s'il apparaît comme sous-chaîne du texte
+en minuscules (comme les anciennes règles). La catégorie est la première
+règle de CATEGORY_RULES trouvée dans le nom, à défaut dans la description,
+sinon DEFAULT_CATEGORY ; les problèmes ciblés sont ceux trouvés dans le nom
+ou la description, dans l'ordre de ISSUE_RULES.
+
+Les correspondances se chevauchant (« anti rides » contient « rides ») sont
+toutes prises en compte : l'expression est une assertion avant
+(?=(mot1|mot2|...)) testée à chaque position, le mot le plus long y est
+retenu et porte aussi les étiquettes des mots-clés qui en sont des préfixes.
+
+Usage:
+    category, issues = product_classifier.classify(name, description)
+    product_classifier.classify_products(products)  # Lot de dictionnaires
+"""
+import re
+from collections import namedtuple
+
+DEFAULT_CATEGORY = 'MOISTURIZER'
+
+# Catégories par ordre de priorité
+CATEGORY_RULES = [
+    ('CLEANSER', ['nettoyant', 'cleanser', 'démaquillant', 'gel moussant', 'mousse nettoyante', 'eau micellaire', 'mousse']),
+    ('SERUM', ['sérum', 'serum', 'ampoule']),
+    ('SUNSCREEN', ['solaire', 'sun', 'spf', 'anthelios']),
+    ('MASK', ['masque', 'mask', 'gommage']),
+    ('TONER', ['tonique', 'toner', 'lotion']),
+    ('EXFOLIANT', ['exfoliant', 'scrub']),
+    ('TREATMENT', ['anti-âge', 'anti-age', 'anti rides', 'liftant']),
+]
+
+ISSUE_RULES = [
+    ('acne', ['acné', 'acne', 'imperfection', 'sebiaclear']),
+    ('wrinkles', ['rides', 'anti-âge', 'anti-age']),
+    ('dark_spots', ['tache', 'éclaircissant', 'depigmentant', 'eclaircissant']),
+    ('redness', ['rougeur', 'sensible', 'apaisant']),
+]
+
+Classification = namedtuple('Classification', ['category', 'target_issues'])
+
+
+class ProductClassifier:
+    """Règles de catégorie et de problèmes ciblés compilées en un automate unique"""
+
+    def __init__(self, category_rules=CATEGORY_RULES, issue_rules=ISSUE_RULES, default_category=DEFAULT_CATEGORY):
+        self.default_category = default_category
+        self.categories = [category for category, _ in category_rules]
+        self.issues = [issue for issue, _ in issue_rules]
+
+        # Étiquettes de chaque mot-clé : ('c', rang de catégorie) ou ('i', rang de problème)
+        labels = {}
+        for rank, (_, keywords) in enumerate(category_rules):
+            for keyword in keywords:
+                labels.setdefault(keyword.lower(), set()).add(('c', rank))
+        for rank, (_, keywords) in enumerate(issue_rules):
+            for keyword in keywords:
+                labels.setdefault(keyword.lower(), set()).add(('i', rank))
+
+        # Le mot le plus long trouvé à une position implique ses préfixes
+        self._labels = {
+            keyword: frozenset().union(*(labels[other] for other in labels if keyword.startswith(other)))
+            for keyword in labels
+        }
+        alternation = '|'.join(re.escape(keyword) for keyword in sorted(labels, key=len, reverse=True))
+        self._pattern = re.compile(f'(?=({alternation}))')
+
+    def _scan(self, text):
+        """Étiquettes trouvées dans un texte déjà en minuscules, avec leur position"""
+        for match in self._pattern.finditer(text):
+            yield match.start(), self._labels[match.group(1)]
+
+    def classify(self, name, description=''):
+        """
+        Catégorie et problèmes ciblés d'un produit
+
+        Args:
+            name: Nom du produit
+            description: Description (utilisée si le nom ne suffit pas à déterminer la catégorie)
+
+        Returns:
+            Classification(category, target_issues)
+        """
+        name = (name or '').lower()
+        description = (description or '').lower()
+        text = f'{name}\n{description}' if description and description != name else name
+
+        name_rank = description_rank = None
+        issues = set()
+        for position, labels in self._scan(text):
+            for kind, rank in labels:
+                if kind == 'i':
+                    issues.add(rank)
+                elif position < len(name):
+                    name_rank = rank if name_rank is None else min(name_rank, rank)
+                else:
+                    description_rank = rank if description_rank is None else min(description_rank, rank)
+
+        rank = name_rank if name_rank is not None else description_rank
+        category = self.categories[rank] if rank is not None else self.default_category
+        return Classification(category, [self.issues[rank] for rank in sorted(issues)])
+
+    def classify_many(self, products):
+        """
+        Classer un lot de produits
+
+        Args:
+            products: Dictionnaires avec name et description
+
+        Returns:
+            Liste de Classification, dans l'ordre des produits
+        """
+        return [self.classify(product.get('name'), product.get('description')) for product in products]
+
+    def classify_products(self, products, overwrite=False):
+        """
+        Renseigner category et target_issues d'un lot de dictionnaires produits
+
+        Args:
+            products: Dictionnaires produits (modifiés sur place)
+            overwrite: Remplacer les valeurs déjà renseignées
+
+        Returns:
+            products
+        """
+        for product, result in zip(products, self.classify_many(products)):
+            if overwrite or not product.get('category'):
+                product['category'] = result.category
+            if overwrite or not product.get('target_issues'):
+                product['target_issues'] = result.target_issues
+        return products
+
+
+product_classifier = ProductClassifier()
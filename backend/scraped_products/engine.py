@@ -0,0 +1,410 @@
+"""
+Moteur de scraping concurrent
+=============================
+
+Remplace les boucles requests.get + time.sleep(1.5) par un moteur asyncio :
+    - connexions keep-alive partagées (requests.Session + pool urllib3),
+    - concurrence limitée par hôte (PER_HOST_CONCURRENCY),
+    - limitation de débit par hôte (seau à jetons RATE / BURST),
+    - nouvelles tentatives avec backoff exponentiel sur les erreurs réseau,
+      429 et 5xx (en-tête Retry-After respecté),
+    - pipeline : la page N est analysée pendant que les pages suivantes sont
+      téléchargées (PREFETCH pages d'avance),
+    - requêtes conditionnelles via le cache HTTP sur disque (http_cache.py) :
+      les pages inchangées peuvent être ignorées (skip_unchanged).
+
+Les requêtes HTTP sont exécutées par un pool de threads piloté par la boucle
+asyncio (aucun client HTTP asynchrone n'est requis). Les vues Django restant
+synchrones, iter_pages() expose le pipeline comme un itérateur ordinaire :
+l'appelant peut sauvegarder la page N pendant que le moteur avance.
+
+Usage:
+    for page in scraper_engine.iter_pages(urls, parse):
+        if page.error is None:
+            save(page.data)
+
+Configuration (settings.SCRAPER_ENGINE):
+    MAX_CONNECTIONS: Taille du pool de connexions (et du pool de threads HTTP)
+    PER_HOST_CONCURRENCY: Requêtes simultanées maximales vers un même hôte
+    RATE: Requêtes par seconde autorisées par hôte (None = illimité)
+    BURST: Taille du seau à jetons (requêtes autorisées d'affilée)
+    MAX_RETRIES: Nouvelles tentatives après une erreur temporaire
+    BACKOFF_BASE: Délai de la première nouvelle tentative (secondes, doublé à chaque essai)
+    BACKOFF_MAX: Délai maximal entre deux tentatives (secondes)
+    TIMEOUT: Timeout d'une requête (secondes)
+    PREFETCH: Pages téléchargées d'avance pendant l'analyse
+    HTTP_CACHE_DIR: Dossier du cache HTTP (None = pas de requêtes conditionnelles)
+"""
+import asyncio
+import logging
+import queue
+import random
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from .http_cache import HttpCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCRAPER_CONFIG = {
+    'MAX_CONNECTIONS': 10,
+    'PER_HOST_CONCURRENCY': 4,
+    'RATE': 4.0,
+    'BURST': 4,
+    'MAX_RETRIES': 3,
+    'BACKOFF_BASE': 0.5,
+    'BACKOFF_MAX': 10.0,
+    'TIMEOUT': 30,
+    'PREFETCH': 4,
+    'HTTP_CACHE_DIR': None,
+}
+
+# Headers pour éviter les blocages
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'fr-FR,fr;q=0.9,en-US;q=0.8,en;q=0.7',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+}
+
+# Statuts HTTP temporaires : nouvelle tentative après backoff
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Résultat d'une page : index dans la liste d'URLs, réponse, données analysées ou
+# exception, et unchanged si la page n'a pas changé depuis le dernier passage
+PageResult = namedtuple('PageResult', ['index', 'url', 'response', 'data', 'error', 'unchanged'], defaults=(False,))
+
+_DONE = object()
+
+
+def get_scraper_config():
+    """Configuration du moteur de scraping, complétée par les valeurs par défaut"""
+    config = dict(DEFAULT_SCRAPER_CONFIG)
+    config.update(getattr(settings, 'SCRAPER_ENGINE', {}))
+    return config
+
+
+class TokenBucket:
+    """
+    Seau à jetons partagé entre threads et boucles asyncio
+
+    reserve() retire un jeton (le solde peut devenir négatif) et retourne le
+    délai à attendre avant d'envoyer la requête : les appelants sont servis
+    dans l'ordre, au débit RATE, avec des rafales de BURST requêtes au plus.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+class ScraperEngine:
+    """Téléchargements concurrents et limités par hôte, avec pipeline d'analyse"""
+
+    def __init__(self, max_connections=10, per_host_concurrency=4, rate=4.0, burst=4, max_retries=3,
+                 backoff_base=0.5, backoff_max=10.0, timeout=30, prefetch=4, headers=None, cache=None):
+        self.max_connections = max_connections
+        self.per_host_concurrency = per_host_concurrency
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.prefetch = max(1, prefetch)
+        self.headers = dict(DEFAULT_HEADERS if headers is None else headers)
+        self.cache = cache  # HttpCache ou None
+
+        self._lock = threading.Lock()
+        self._session = None
+        self._http_executor = None
+        self._parse_executor = None
+        self._buckets = {}  # hôte -> TokenBucket (partagé entre explorations)
+
+    # ------------------------------------------------------------------
+    # Ressources partagées
+    # ------------------------------------------------------------------
+
+    def _resources(self):
+        """Session HTTP et pools de threads, créés au premier usage"""
+        with self._lock:
+            if self._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=self.max_connections, pool_maxsize=self.max_connections)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.headers.update(self.headers)
+                self._session = session
+                self._http_executor = ThreadPoolExecutor(max_workers=self.max_connections, thread_name_prefix='scraper-http')
+                self._parse_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='scraper-parse')
+            return self._session, self._http_executor, self._parse_executor
+
+    def _bucket(self, host):
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(self.rate, self.burst)
+            return self._buckets[host]
+
+    def close(self):
+        """Fermer les connexions et arrêter les pools de threads"""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._http_executor.shutdown(wait=False)
+                self._parse_executor.shutdown(wait=False)
+                self._session = self._http_executor = self._parse_executor = None
+
+    # ------------------------------------------------------------------
+    # Téléchargement
+    # ------------------------------------------------------------------
+
+    def _backoff(self, attempt, response=None):
+        """Délai avant la tentative suivante : Retry-After si fourni, sinon exponentiel avec gigue"""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                return min(float(retry_after), self.backoff_max)
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * (0.5 + random.random() / 2)
+
+    async def fetch(self, url, limits=None):
+        """
+        Télécharger une page (concurrence et débit limités par hôte, nouvelles tentatives)
+
+        Args:
+            url: URL de la page
+            limits: Sémaphores par hôte de l'exploration en cours (créés si absent)
+
+        Returns:
+            requests.Response (statut 2xx/3xx). Avec un cache HTTP, la requête
+            est conditionnelle : une réponse 304 reçoit le contenu en cache, et
+            response.unchanged indique si le contenu est identique au dernier passage.
+
+        Raises:
+            requests.RequestException après épuisement des tentatives, ou
+            requests.HTTPError immédiatement pour une erreur HTTP définitive
+        """
+        session, http_executor, _ = self._resources()
+        loop = asyncio.get_running_loop()
+        host = urlsplit(url).netloc
+        limits = {} if limits is None else limits
+        semaphore = limits.setdefault(host, asyncio.Semaphore(self.per_host_concurrency))
+        bucket = self._bucket(host)
+        headers = self.cache.conditional_headers(url) if self.cache else {}
+
+        attempt = 0
+        while True:
+            async with semaphore:
+                delay = bucket.reserve()
+                if delay:
+                    await asyncio.sleep(delay)
+                try:
+                    response = await loop.run_in_executor(
+                        http_executor, lambda: session.get(url, timeout=self.timeout, headers=headers)
+                    )
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    if attempt >= self.max_retries:
+                        raise
+                    wait = self._backoff(attempt)
+                    logger.warning(f"{url}: {e.__class__.__name__}, nouvelle tentative dans {wait:.1f}s")
+                else:
+                    if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                        response.raise_for_status()
+                        return self._revalidate(url, response)
+                    wait = self._backoff(attempt, response)
+                    logger.warning(f"{url}: HTTP {response.status_code}, nouvelle tentative dans {wait:.1f}s")
+            attempt += 1
+            await asyncio.sleep(wait)
+
+    def _revalidate(self, url, response):
+        """Compléter une réponse avec le cache HTTP (contenu des 304, indicateur unchanged)"""
+        response.unchanged = False
+        if self.cache is None:
+            return response
+        if response.status_code == 304:
+            body = self.cache.body(url)
+            if body is not None:
+                response._content = body
+                response.unchanged = True
+                self.cache.touch(url)
+        elif response.status_code == 200:
+            response.unchanged = not self.cache.store(url, response)
+        return response
+
+    def get(self, url):
+        """Version synchrone de fetch() pour une page isolée"""
+        return self._run(self.fetch(url))
+
+    # ------------------------------------------------------------------
+    # Pipeline
+    # ------------------------------------------------------------------
+
+    async def crawl(self, urls, parse, emit, cancelled=None, skip_unchanged=False):
+        """
+        Télécharger les URLs en parallèle et analyser les pages dans l'ordre
+
+        Args:
+            urls: URLs des pages, dans l'ordre de traitement
+            parse: Fonction response -> données (exécutée hors de la boucle)
+            emit: Coroutine appelée avec chaque PageResult, dans l'ordre des URLs
+            cancelled: threading.Event d'arrêt anticipé (optionnel)
+            skip_unchanged: Ne pas analyser les pages inchangées depuis le dernier passage
+        """
+        _, _, parse_executor = self._resources()
+        loop = asyncio.get_running_loop()
+        limits = {}
+        pending = asyncio.Queue(maxsize=self.prefetch)
+
+        async def produce():
+            for index, url in enumerate(urls):
+                if cancelled is not None and cancelled.is_set():
+                    break
+                await pending.put((index, url, asyncio.ensure_future(self.fetch(url, limits))))
+            await pending.put(None)
+
+        producer = asyncio.ensure_future(produce())
+        try:
+            while True:
+                item = await pending.get()
+                if item is None:
+                    break
+                index, url, task = item
+                response = data = error = None
+                unchanged = False
+                try:
+                    response = await task
+                    unchanged = response.unchanged
+                    if not (skip_unchanged and unchanged):
+                        # L'analyse de la page N se fait pendant le téléchargement des suivantes
+                        data = await loop.run_in_executor(parse_executor, parse, response)
+                except Exception as e:
+                    error = e
+                await emit(PageResult(index, url, response, data, error, unchanged))
+                if cancelled is not None and cancelled.is_set():
+                    break
+        finally:
+            producer.cancel()
+            while not pending.empty():
+                item = pending.get_nowait()
+                if item is not None:
+                    item[2].cancel()
+
+    def iter_pages(self, urls, parse, skip_unchanged=False):
+        """
+        Itérateur synchrone sur les pages analysées, dans l'ordre des URLs
+
+        La boucle asyncio tourne dans un thread dédié : l'appelant traite la
+        page N (sauvegarde en base...) pendant que les suivantes sont
+        téléchargées et analysées. Interrompre l'itération (break) annule les
+        téléchargements restants. Avec skip_unchanged, les pages inchangées
+        sont publiées avec unchanged=True et data=None, sans analyse.
+        """
+        results = queue.Queue(maxsize=self.prefetch)
+        cancelled = threading.Event()
+
+        async def emit(page):
+            await asyncio.get_running_loop().run_in_executor(None, results.put, page)
+
+        def run():
+            try:
+                asyncio.run(self.crawl(list(urls), parse, emit, cancelled, skip_unchanged))
+            except Exception as e:
+                logger.error(f"Erreur du moteur de scraping: {e}", exc_info=True)
+            finally:
+                results.put(_DONE)
+
+        thread = threading.Thread(target=run, name='scraper-crawl', daemon=True)
+        thread.start()
+        try:
+            while True:
+                page = results.get()
+                if page is _DONE:
+                    break
+                yield page
+        finally:
+            cancelled.set()
+            # Débloquer le thread s'il attend de publier une page
+            while thread.is_alive():
+                try:
+                    results.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            thread.join()
+
+    def changed_items(self, url, items, key='url'):
+        """Produits nouveaux ou modifiés d'une page (tous sans cache HTTP), voir HttpCache.changed_items"""
+        if self.cache is None:
+            return list(items)
+        return self.cache.changed_items(url, items, key)
+
+    def mark_ingested(self, url, items, key='url'):
+        """Noter l'ingestion réussie d'une page, voir HttpCache.mark_ingested"""
+        if self.cache is not None:
+            self.cache.mark_ingested(url, items, key)
+
+    def forget(self, url):
+        """Oublier une page : retéléchargée et retraitée au prochain passage"""
+        if self.cache is not None:
+            self.cache.forget(url)
+
+    def _run(self, coro):
+        """Exécuter une coroutine depuis du code synchrone (thread dédié si une boucle tourne déjà)"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coro)
+        result = {}
+
+        def run():
+            try:
+                result['value'] = asyncio.run(coro)
+            except BaseException as e:
+                result['error'] = e
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+        if 'error' in result:
+            raise result['error']
+        return result['value']
+
+
+def page_urls(url, pages):
+    """URLs des pages 1..pages d'une liste paginée par le paramètre p (PrestaShop)"""
+    separator = '&' if '?' in url else '?'
+    return [url if page == 1 else f"{url}{separator}p={page}" for page in range(1, pages + 1)]
+
+
+_scraper_config = get_scraper_config()
+scraper_engine = ScraperEngine(
+    max_connections=_scraper_config['MAX_CONNECTIONS'],
+    per_host_concurrency=_scraper_config['PER_HOST_CONCURRENCY'],
+    rate=_scraper_config['RATE'],
+    burst=_scraper_config['BURST'],
+    max_retries=_scraper_config['MAX_RETRIES'],
+    backoff_base=_scraper_config['BACKOFF_BASE'],
+    backoff_max=_scraper_config['BACKOFF_MAX'],
+    timeout=_scraper_config['TIMEOUT'],
+    prefetch=_scraper_config['PREFETCH'],
+    cache=HttpCache(_scraper_config['HTTP_CACHE_DIR']) if _scraper_config['HTTP_CACHE_DIR'] else None
+)
@@ -0,0 +1,329 @@
+"""
+Extraction HTML des scrapers
+============================
+
+Remplace BeautifulSoup(content, 'html.parser') + find_all(class_=re.compile(...))
+et les find() imbriqués élément par élément par :
+    - un parseur C (lxml.html) quand lxml est installé, BeautifulSoup
+      'html.parser' sinon (backend de repli, même résultat),
+    - des sélecteurs CSS compilés une seule fois par profil de site :
+      traduits en XPath (cssselect) pour lxml, compilés par soupsieve pour
+      BeautifulSoup.
+
+Un profil de site (SiteProfile) décrit le sélecteur des produits d'une page
+de liste et, pour chaque champ, des candidats essayés dans l'ordre : le
+premier qui donne une valeur non vide est retenu.
+
+Usage:
+    products = parse_pharma_shop_listing(response.content, base_url)
+
+Comparaison avec l'ancien chemin (pages HTML enregistrées dans fixtures/html):
+    python manage.py benchmark_extraction
+"""
+import logging
+import re
+from collections import namedtuple
+from urllib.parse import urljoin
+import soupsieve
+from bs4 import BeautifulSoup
+from .classifier import product_classifier
+
+# lxml (optionnel) : parseur C et sélecteurs XPath précompilés
+try:
+    from cssselect import HTMLTranslator
+    from lxml import etree, html as lxml_html
+except ImportError:
+    lxml_html = None
+
+logger = logging.getLogger(__name__)
+
+LXML = 'lxml'
+HTML_PARSER = 'html.parser'
+DEFAULT_BACKEND = LXML if lxml_html is not None else HTML_PARSER
+
+PRICE_RE = re.compile(r'(\d+[.,]\d+)')
+SIZE_RE = re.compile(r'(\d+)\s*(ml|g|gr|kg|l)')
+TOTAL_PRODUCTS_RE = re.compile(r'Affichage.*de\s+(\d+)\s+article', re.I)
+PAGE_PARAM_RE = re.compile(r'[?&]p=(\d+)')
+
+
+def _class_contains(tags, *fragments):
+    """Sélecteur des balises dont l'attribut class contient un des fragments (insensible à la casse)"""
+    return ', '.join(f'{tag}[class*="{fragment}" i]' for tag in tags for fragment in fragments)
+
+
+class Selector:
+    """Sélecteur CSS compilé une fois pour chaque backend (descendants de l'élément de départ)"""
+
+    def __init__(self, css):
+        self.css = css
+        self._soup = soupsieve.compile(css)
+        self._xpath = None
+        if lxml_html is not None:
+            self._xpath = etree.XPath(HTMLTranslator().css_to_xpath(css, prefix='descendant::'))
+
+    def all(self, node, backend):
+        if backend == LXML:
+            return self._xpath(node)
+        return self._soup.select(node)
+
+    def first(self, node, backend):
+        if backend == LXML:
+            nodes = self._xpath(node)
+            return nodes[0] if nodes else None
+        return self._soup.select_one(node)
+
+
+# Champ extrait : premier élément du sélecteur, texte (attr=None) ou attribut,
+# puis groupe 1 de pattern s'il est fourni
+Field = namedtuple('Field', ['selector', 'attr', 'pattern'], defaults=(None, None))
+
+_text_nodes = etree.XPath('descendant-or-self::text()') if lxml_html is not None else None
+
+
+class HtmlDocument:
+    """Page HTML analysée par un backend (lxml ou BeautifulSoup)"""
+
+    def __init__(self, content, backend=None):
+        self.backend = backend or DEFAULT_BACKEND
+        if self.backend == LXML:
+            if lxml_html is None:
+                raise ValueError("lxml n'est pas installé")
+            if isinstance(content, bytes):
+                # Les pages sans <meta charset> seraient lues en latin-1 par libxml2
+                try:
+                    content = content.decode('utf-8')
+                except UnicodeDecodeError:
+                    pass
+            self.root = lxml_html.document_fromstring(content) if content and content.strip() else lxml_html.Element('html')
+        else:
+            self.root = BeautifulSoup(content or '', 'html.parser')
+
+    def select(self, selector, node=None):
+        return selector.all(self.root if node is None else node, self.backend)
+
+    def first(self, selector, node=None):
+        return selector.first(self.root if node is None else node, self.backend)
+
+    def text(self, node):
+        """Texte d'un élément, chaînes nettoyées et concaténées (get_text(strip=True))"""
+        if self.backend == LXML:
+            return ''.join(s.strip() for s in _text_nodes(node))
+        return node.get_text(strip=True)
+
+    def attr(self, node, name):
+        value = node.get(name)
+        if isinstance(value, list):  # class, rel... (BeautifulSoup)
+            value = ' '.join(value)
+        return value
+
+    def strings(self):
+        """Chaînes de texte de la page, une par nœud texte"""
+        if self.backend == LXML:
+            return _text_nodes(self.root)
+        return self.root.find_all(string=True)
+
+    def value(self, node, candidates):
+        """Première valeur non vide parmi les Field candidats"""
+        for field in candidates:
+            element = self.first(field.selector, node)
+            if element is None:
+                continue
+            value = self.text(element) if field.attr is None else self.attr(element, field.attr)
+            if value and field.pattern is not None:
+                match = field.pattern.search(value)
+                value = match.group(1) if match else None
+            if value:
+                return value
+        return None
+
+
+class SiteProfile:
+    """Sélecteurs précompilés d'un site : éléments produits et champs de chaque produit"""
+
+    def __init__(self, name, items, fields, pagination=None, limit=None):
+        self.name = name
+        self.items = Selector(items)
+        self.fields = {
+            key: [Field(Selector(candidate[0]), *candidate[1:]) for candidate in candidates]
+            for key, candidates in fields.items()
+        }
+        self.pagination = Selector(pagination) if pagination else None
+        self.limit = limit
+
+    def extract(self, document):
+        """Champs bruts (chaînes ou None) de chaque produit de la page"""
+        items = document.select(self.items)
+        if self.limit is not None:
+            items = items[:self.limit]
+        return [
+            {key: document.value(item, candidates) for key, candidates in self.fields.items()}
+            for item in items
+        ]
+
+    def page_count(self, document):
+        """
+        Nombre de produits annoncé et numéro de page le plus élevé de la pagination
+
+        Returns:
+            (total_products ou 0, max_page ou 1)
+        """
+        total_products = 0
+        for string in document.strings():
+            match = TOTAL_PRODUCTS_RE.search(string)
+            if match:
+                total_products = int(match.group(1))
+                break
+
+        max_page = 1
+        if self.pagination is not None:
+            for link in document.select(self.pagination):
+                match = PAGE_PARAM_RE.search(document.attr(link, 'href') or '')
+                if match:
+                    max_page = max(max_page, int(match.group(1)))
+        return total_products, max_page
+
+
+PHARMA_SHOP_PROFILE = SiteProfile(
+    'pharma-shop.tn',
+    items=_class_contains(['div'], 'thumbnail-container'),
+    fields={
+        'name': [
+            (_class_contains(['h2'], 'product-title') + ' a',),
+            (_class_contains(['h2'], 'product-title'),),
+            ('h2[class*="title" i] a, h3[class*="title" i] a',),
+            (_class_contains(['h2', 'h3'], 'title'),),
+        ],
+        'price': [
+            ('span.price', None, PRICE_RE),
+            ('div.product-price-and-shipping', None, re.compile(r'(\d+[.,]\d+)\s*TND')),
+        ],
+        'image': [
+            ('div.product-image img', 'data-full-size-image-url'),
+            ('div.product-image img', 'src'),
+        ],
+        'url': [
+            (_class_contains(['h2'], 'product-title') + ' a[href]', 'href'),
+            ('a.product-thumbnail', 'href'),
+            ('div.product-image a[href]', 'href'),
+        ],
+        'brand': [
+            ('div.txt-marque a',),
+            ('div.txt-marque',),
+        ],
+    },
+    pagination='[class*="pagination" i] a[href]',
+)
+
+GENERIC_PROFILE = SiteProfile(
+    'generic',
+    items=_class_contains(['div', 'article', 'li'], 'product', 'item', 'card'),
+    fields={
+        'name': [(_class_contains(['h1', 'h2', 'h3', 'h4', 'span', 'a'], 'title', 'name', 'product'),)],
+        'price': [(_class_contains(['span', 'div', 'p'], 'price', 'prix', 'cost'), None, PRICE_RE)],
+        'image': [('img', 'src'), ('img', 'data-src')],
+        'url': [('a', 'href')],
+    },
+    limit=50,  # Limiter à 50 produits pour les autres sites
+)
+
+
+def parse_document(content, backend=None):
+    """Analyser une page (octets ou texte) avec le backend par défaut (lxml si disponible)"""
+    return HtmlDocument(content, backend)
+
+
+def _as_document(content, backend):
+    return content if isinstance(content, HtmlDocument) else HtmlDocument(content, backend)
+
+
+def _price(text):
+    return float(text.replace(',', '.')) if text else 0.0
+
+
+def _absolute(url, base_url):
+    if not url:
+        return None
+    if url.startswith('//'):
+        return 'https:' + url
+    return urljoin(base_url, url)
+
+
+def parse_pharma_shop_listing(content, base_url, backend=None):
+    """
+    Extraire les produits d'une page de liste pharma-shop.tn
+
+    Args:
+        content: HTML de la page (octets, texte ou HtmlDocument déjà analysé)
+        base_url: URL de la liste scrapée (source_url des produits, base des liens relatifs)
+        backend: LXML ou HTML_PARSER (défaut : lxml si disponible)
+
+    Returns:
+        Liste des produits de la page
+    """
+    document = _as_document(content, backend)
+    products = []
+    for fields in PHARMA_SHOP_PROFILE.extract(document):
+        name = ' '.join((fields['name'] or '').replace('...', '').split())
+        price = _price(fields['price'])
+        if len(name) < 3 or price <= 0:
+            continue
+
+        brand = fields['brand'] or name.split()[0]
+        category, target_issues = product_classifier.classify(name)
+        size_match = SIZE_RE.search(name.lower())
+        product_url = _absolute(fields['url'], base_url)
+
+        products.append({
+            'name': name,
+            'brand': brand,
+            'description': name,
+            'price': price,
+            'size': f"{size_match.group(1)}{size_match.group(2).upper()}" if size_match else None,
+            'category': category,
+            'target_skin_types': ['NORMAL'],
+            'target_issues': target_issues,
+            'image': _absolute(fields['image'], base_url),
+            'url': product_url or base_url,
+            'source_site': 'pharma-shop.tn',
+            'source_url': base_url,
+        })
+    return products
+
+
+def parse_generic_listing(content, url, source_site, backend=None):
+    """
+    Extraire les produits d'une page de liste d'un site sans profil dédié
+
+    Args:
+        content: HTML de la page (octets, texte ou HtmlDocument déjà analysé)
+        url: URL de la page (source_url des produits, base des liens relatifs)
+        source_site: Site source des produits
+        backend: LXML ou HTML_PARSER (défaut : lxml si disponible)
+
+    Returns:
+        Liste des produits ayant un nom et un prix
+    """
+    document = _as_document(content, backend)
+    products = []
+    for fields in GENERIC_PROFILE.extract(document):
+        name = fields['name']
+        price = _price(fields['price'])
+        if not name or price <= 0:
+            continue
+
+        category, target_issues = product_classifier.classify(name)
+        products.append({
+            'name': name,
+            'brand': name.split()[0],
+            'description': name,
+            'price': price,
+            'category': category,
+            'target_skin_types': ['NORMAL'],
+            'target_issues': target_issues,
+            'image': _absolute(fields['image'], url),
+            'url': _absolute(fields['url'], url) or url,
+            'source_site': source_site,
+            'source_url': url,
+        })
+    return products
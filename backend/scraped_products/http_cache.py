@@ -0,0 +1,207 @@
+"""
+Cache HTTP du scraper pour les re-scrapes incrémentaux
+======================================================
+
+Chaque page téléchargée est conservée sur disque, sous une clé dérivée de
+son URL, avec :
+    - les validateurs HTTP (ETag, Last-Modified),
+    - le hash SHA-256 du contenu,
+    - le contenu compressé (gzip), pour relire une page répondue en 304,
+    - l'empreinte de chaque produit ingéré depuis la page (mark_ingested).
+
+Au re-scrape, le moteur envoie des requêtes conditionnelles
+(If-None-Match / If-Modified-Since). Une page répondue en 304, ou en 200 avec
+le même hash, est marquée inchangée : elle n'est ni analysée ni ingérée. Pour
+une page modifiée, changed_items() ne retient que les produits nouveaux ou
+différents depuis le dernier passage. Le coût d'un rafraîchissement est ainsi
+proportionnel au nombre de produits modifiés, pas à la taille du catalogue.
+
+Le cache ne retient une page comme traitée qu'après son ingestion :
+mark_ingested(url, items) enregistre les empreintes des produits et marque
+l'entrée ingérée. Tant qu'elle ne l'est pas (ingestion échouée, processus
+arrêté entre le téléchargement et l'écriture en base), la page est
+retéléchargée sans requête conditionnelle et tous ses produits sont
+reproposés. forget(url) oublie complètement une page.
+
+Configuration (settings.SCRAPER_ENGINE):
+    HTTP_CACHE_DIR: Dossier du cache (None = désactivé)
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(content):
+    """Hash SHA-256 du contenu d'une réponse"""
+    return hashlib.sha256(content or b'').hexdigest()
+
+
+def item_fingerprint(item):
+    """Empreinte d'un produit extrait (dictionnaire JSON)"""
+    return hashlib.sha1(json.dumps(item, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class HttpCache:
+    """Validateurs, hash et contenu des pages scrapées, stockés sur disque par URL"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def _key(self, url):
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def _paths(self, url):
+        key = self._key(url)
+        base = os.path.join(self.directory, key[:2], key)
+        return f"{base}.json", f"{base}.html.gz"
+
+    def _write(self, path, data, binary=False):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb' if binary else 'w', **({} if binary else {'encoding': 'utf-8'})) as f:
+            if binary:
+                f.write(data)
+            else:
+                json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    # ------------------------------------------------------------------
+    # Pages
+    # ------------------------------------------------------------------
+
+    def get(self, url):
+        """Entrée de cache d'une URL (dictionnaire) ou None"""
+        meta_path, _ = self._paths(url)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Entrée de cache HTTP illisible pour {url}: {e}")
+            return None
+
+    def body(self, url):
+        """Contenu mis en cache d'une URL, ou None"""
+        _, body_path = self._paths(url)
+        try:
+            with open(body_path, 'rb') as f:
+                return gzip.decompress(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError) as e:
+            logger.warning(f"Contenu en cache illisible pour {url}: {e}")
+            return None
+
+    def conditional_headers(self, url):
+        """En-têtes de requête conditionnelle pour une URL déjà vue"""
+        entry = self.get(url)
+        headers = {}
+        # Page jamais ingérée : un 304 la ferait ignorer, il faut la retraiter
+        if entry and entry.get('ingested') and self.body(url) is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def store(self, url, response):
+        """
+        Enregistrer une réponse 200 et indiquer si la page doit être traitée
+
+        Returns:
+            True si la page est nouvelle, si son hash a changé ou si elle n'a
+            pas encore été ingérée
+        """
+        digest = content_hash(response.content)
+        with self._lock:
+            previous = self.get(url) or {}
+            unchanged = previous.get('content_hash') == digest and bool(previous.get('ingested'))
+            entry = {
+                'url': url,
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'content_hash': digest,
+                'fetched_at': time.time(),
+                'items': previous.get('items', {}),
+                'ingested': unchanged,
+            }
+            meta_path, body_path = self._paths(url)
+            try:
+                if previous.get('content_hash') != digest:
+                    self._write(body_path, gzip.compress(response.content), binary=True)
+                self._write(meta_path, entry)
+            except OSError as e:
+                logger.warning(f"Écriture du cache HTTP impossible pour {url}: {e}")
+        return not unchanged
+
+    def touch(self, url):
+        """Noter une réponse 304 (contenu inchangé)"""
+        with self._lock:
+            entry = self.get(url)
+            if entry is not None:
+                entry['fetched_at'] = time.time()
+                try:
+                    self._write(self._paths(url)[0], entry)
+                except OSError as e:
+                    logger.warning(f"Écriture du cache HTTP impossible pour {url}: {e}")
+
+    def forget(self, url):
+        """Oublier une page : elle sera retéléchargée et réingérée au prochain passage"""
+        for path in self._paths(url):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    # ------------------------------------------------------------------
+    # Produits
+    # ------------------------------------------------------------------
+
+    def changed_items(self, url, items, key='url'):
+        """
+        Produits d'une page nouveaux ou modifiés depuis la dernière ingestion
+
+        Lecture seule : les empreintes ne sont enregistrées que par mark_ingested.
+
+        Args:
+            url: URL de la page
+            items: Produits extraits (dictionnaires)
+            key: Champ identifiant un produit dans la page
+
+        Returns:
+            Sous-liste de items à ingérer
+        """
+        entry = self.get(url)
+        if entry is None:
+            return list(items)
+        previous = entry.get('items', {})
+        return [item for item in items if previous.get(str(item.get(key))) != item_fingerprint(item)]
+
+    def mark_ingested(self, url, items, key='url'):
+        """
+        Noter l'ingestion réussie d'une page : empreintes de items et requêtes
+        conditionnelles au prochain passage
+
+        Args:
+            url: URL de la page
+            items: Tous les produits extraits de la page (pas seulement les modifiés)
+            key: Champ identifiant un produit dans la page
+        """
+        with self._lock:
+            entry = self.get(url)
+            if entry is None:
+                return
+            entry['items'] = {str(item.get(key)): item_fingerprint(item) for item in items}
+            entry['ingested'] = True
+            try:
+                self._write(self._paths(url)[0], entry)
+            except OSError as e:
+                logger.warning(f"Écriture du cache HTTP impossible pour {url}: {e}")
@@ -0,0 +1,259 @@
+"""
+Ingestion en masse des produits scrapés
+=======================================
+
+Remplace la boucle produit par produit (jusqu'à trois filter().first() puis
+create() ou save() pour chaque produit) par une ingestion ensembliste :
+    1. les clés de dédoublonnage du lot sont chargées en une requête
+       (par tranches de LOOKUP_CHUNK clés),
+    2. chaque ligne est classée en mémoire : création, mise à jour ou
+       inchangée (aucune écriture),
+    3. bulk_create + bulk_update dans une seule transaction, avec les
+       compteurs (stats.py) et l'index plein texte (search.py) mis à jour
+       explicitement, les signaux post_save n'étant pas émis. L'index de
+       recommandation (recommendations/product_index.py) est mis à jour
+       après la validation de la transaction.
+
+Clés de dédoublonnage (match):
+    MATCH_URL: URL du produit. Une ligne sans URL crée toujours un produit,
+        comme l'ancienne boucle (même nom/marque mais URL différente = autre produit).
+    MATCH_NAME: Nom + marque + site source.
+
+Usage:
+    result = ingest_products(products_data)
+    print(result.saved, result.updated, result.skipped)
+"""
+import logging
+from collections import Counter, namedtuple
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from .classifier import product_classifier
+from .matching import product_matcher
+from .models import ScrapedProduct
+from .search import index_products
+from .stats import apply_deltas, product_deltas, stat_key
+
+logger = logging.getLogger(__name__)
+
+MATCH_URL = 'url'
+MATCH_NAME = 'name'
+
+LOOKUP_CHUNK = 500  # Clés par requête IN (limite de variables SQLite)
+DEFAULT_BATCH_SIZE = 500
+
+# Champs jamais repris tels quels des données scrapées lors d'une mise à jour
+PROTECTED_FIELDS = {'id', 'created_at', 'updated_at', 'scraped_by', 'match_group'}
+LIST_FIELDS = {'target_skin_types', 'target_issues'}
+
+# Résultat d'une ingestion : produits créés, mis à jour (y compris inchangés),
+# inchangés (non réécrits), ignorés, et messages d'erreur
+IngestResult = namedtuple('IngestResult', ['saved', 'updated', 'unchanged', 'skipped', 'errors'])
+
+
+def _updatable_fields():
+    return [
+        field for field in ScrapedProduct._meta.concrete_fields
+        if not field.primary_key and field.name not in PROTECTED_FIELDS
+    ]
+
+
+def _chunks(values, size=LOOKUP_CHUNK):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _key(match, product_data, name, brand, source_site):
+    """Clé de dédoublonnage d'une ligne (None = toujours créer)"""
+    if match == MATCH_URL:
+        return product_data.get('url') or None
+    return (name, brand, source_site)
+
+
+def _load_existing(match, keys):
+    """Produits existants du lot indexés par clé (le plus récent par clé, comme .first())"""
+    existing = {}
+    if not keys:
+        return existing
+    if match == MATCH_URL:
+        for chunk in _chunks(keys):
+            for product in ScrapedProduct.objects.filter(url__in=chunk).order_by('-created_at', '-id'):
+                existing.setdefault(product.url, product)
+    else:
+        for chunk in _chunks({name for name, _, _ in keys}):
+            for product in ScrapedProduct.objects.filter(name__in=chunk).order_by('-created_at', '-id'):
+                key = (product.name, product.brand, product.source_site)
+                if key in keys:
+                    existing.setdefault(key, product)
+    return existing
+
+
+def _new_product(product_data, name, brand, source_site, classification=None):
+    """
+    Produit à créer à partir d'une ligne scrapée
+
+    Une ligne sans catégorie prend celle de classification (classifier.py),
+    ainsi que ses problèmes ciblés si elle n'en indique pas.
+
+    Raises:
+        ValidationError si le prix n'est pas un nombre
+    """
+    price = product_data.get('price')
+    if classification is not None:
+        product_data = dict(product_data, category=classification.category,
+                            target_issues=product_data.get('target_issues') or classification.target_issues)
+    return ScrapedProduct(
+        name=name,
+        brand=brand,
+        description=product_data.get('description', '') or name,
+        ingredients=product_data.get('ingredients', ''),
+        price=ScrapedProduct._meta.get_field('price').to_python(price) if price else 0,
+        size=product_data.get('size'),
+        category=product_data.get('category', 'MOISTURIZER'),
+        target_skin_types=product_data.get('target_skin_types', ['NORMAL']),
+        target_issues=product_data.get('target_issues', []),
+        image=product_data.get('image'),
+        url=product_data.get('url'),
+        source_site=source_site,
+        source_url=product_data.get('source_url'),
+        match_group=product_matcher.match(name, brand),
+        is_active=True,
+    )
+
+
+def _apply(product, product_data, fields, source_site):
+    """
+    Appliquer une ligne scrapée à un produit existant
+
+    Les valeurs None, les listes mal formées et les valeurs non convertibles
+    (prix invalide...) sont ignorées.
+
+    Returns:
+        Ensemble des champs modifiés
+    """
+    changed = set()
+    for field in fields:
+        value = product_data.get(field.name)
+        if value is None or (field.name in LIST_FIELDS and not isinstance(value, list)):
+            continue
+        try:
+            value = field.to_python(value)
+        except ValidationError:
+            continue
+        if getattr(product, field.attname) != value:
+            setattr(product, field.attname, value)
+            changed.add(field.name)
+
+    if not product.source_site:
+        product.source_site = source_site
+        changed.add('source_site')
+    if not product.is_active:
+        product.is_active = True
+        changed.add('is_active')
+    if changed & {'name', 'brand'} or not product.match_group:
+        group = product_matcher.match(product.name, product.brand)
+        if group != product.match_group:
+            product.match_group = group
+            changed.add('match_group')
+    return changed
+
+
+def _refresh_recommendation_index(products):
+    """Reporter les produits écrits dans l'index de recommandation (après commit)"""
+    from recommendations.product_index import product_index
+
+    for product in products:
+        product_index.upsert('scraped', product)
+
+
+def ingest_products(products_data, default_source_site='pharma-shop.tn', match=MATCH_URL,
+                    batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Créer ou mettre à jour un lot de produits scrapés en quelques requêtes
+
+    Args:
+        products_data: Dictionnaires de produits (name, brand, url, price...)
+        default_source_site: Site source des lignes qui n'en indiquent pas
+        match: Clé de dédoublonnage (MATCH_URL ou MATCH_NAME)
+        batch_size: Lignes par requête INSERT / UPDATE
+
+    Returns:
+        IngestResult(saved, updated, unchanged, skipped, errors)
+    """
+    rows, skipped, errors = [], 0, []
+    for product_data in products_data:
+        name = (product_data.get('name') or '').strip()
+        brand = (product_data.get('brand') or '').strip()
+        source_site = (product_data.get('source_site') or default_source_site).strip()
+        if not name or not brand:
+            skipped += 1
+            continue
+        rows.append((product_data, name, brand, source_site, _key(match, product_data, name, brand, source_site)))
+
+    # Lignes sans catégorie : classées en un lot (un passage par produit)
+    unclassified = [row for row in rows if not row[0].get('category')]
+    classifications = {
+        id(row[0]): result
+        for row, result in zip(unclassified, product_classifier.classify_many([row[0] for row in unclassified]))
+    }
+
+    existing = _load_existing(match, {key for *_, key in rows if key is not None})
+    fields = _updatable_fields()
+
+    creates, pending = [], {}  # pending : clé -> produit créé dans ce lot (doublons du lot)
+    updates, update_fields = {}, set()
+    saved = updated = unchanged = 0
+    for product_data, name, brand, source_site, key in rows:
+        product = None
+        if key is not None:
+            product = existing.get(key) or pending.get(key)
+
+        if product is None:
+            try:
+                product = _new_product(product_data, name, brand, source_site, classifications.get(id(product_data)))
+            except ValidationError as e:
+                skipped += 1
+                errors.append(f"Produit {name[:30]}: {'; '.join(e.messages)}")
+                continue
+            creates.append(product)
+            if key is not None:
+                pending[key] = product
+            saved += 1
+            continue
+
+        changed = _apply(product, dict(product_data, name=name, brand=brand), fields, source_site)
+        updated += 1
+        if not changed:
+            unchanged += 1
+        elif product.pk is not None:
+            updates[product.pk] = product
+            update_fields |= changed
+
+    if creates or updates:
+        deltas = Counter()
+        with transaction.atomic():
+            ScrapedProduct.objects.bulk_create(creates, batch_size=batch_size)
+            if updates:
+                now = timezone.now()
+                for product in updates.values():
+                    product.updated_at = now
+                ScrapedProduct.objects.bulk_update(
+                    list(updates.values()), sorted(update_fields | {'updated_at'}), batch_size=batch_size
+                )
+
+            # Compteurs et index plein texte : bulk_create / bulk_update n'émettent pas post_save
+            for product in creates:
+                deltas.update(product_deltas(None, stat_key(product)))
+                product._stat_key = stat_key(product)
+            for product in updates.values():
+                deltas.update(product_deltas(product._stat_key, stat_key(product)))
+                product._stat_key = stat_key(product)
+            apply_deltas(deltas)
+            written = [product for product in creates if product.pk is not None] + list(updates.values())
+            index_products(written)
+            # Une transaction annulée ne doit pas laisser de produits dans l'index en mémoire
+            transaction.on_commit(lambda: _refresh_recommendation_index(written))
+
+    logger.info(f"Ingestion: {saved} créés, {updated} mis à jour ({unchanged} inchangés), {skipped} ignorés")
+    return IngestResult(saved, updated, unchanged, skipped, errors)
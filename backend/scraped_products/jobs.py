@@ -0,0 +1,379 @@
+"""
+Explorations de sites en arrière-plan
+=====================================
+
+scrape_web_products en mode asynchrone crée une ScrapingSession puis délègue
+l'exploration à un pool de workers local au lieu de garder la requête HTTP
+ouverte pendant tout le crawl. Après chaque page, le worker enregistre un
+point de reprise sur la session dans une seule transaction :
+    - les produits de la page (ingest.py, dédoublonnage par nom/marque/site),
+    - les compteurs de la session (F() : pas de lecture-modification-écriture),
+    - last_completed_page et heartbeat_at (signal de vie du worker),
+    - les ScrapingLog de la page, écrits en un seul bulk_save.
+
+Une page n'est donc jamais comptée deux fois : si le processus s'arrête, la
+session reste RUNNING avec un heartbeat_at qui vieillit, et l'exploration
+reprend à la page suivant last_completed_page (resume_scraping_jobs, au
+démarrage ou via la commande du même nom, ou POST .../resume/ ; le polling
+signale seulement une session abandonnée, il ne la relance pas).
+
+La prise en charge d'une session est une mise à jour conditionnelle qui
+enregistre un nouveau claim_token, et chaque écriture du worker (point de
+reprise, fin, échec) est filtrée sur ce jeton. Un worker lent jugé abandonné
+peut encore télécharger une page pendant qu'un autre reprend la session, mais
+son point de reprise suivant est refusé (SessionReleased, transaction annulée) :
+seul le détenteur du jeton courant écrit sur la session.
+
+Avec le cache HTTP du moteur (SCRAPER_ENGINE['HTTP_CACHE_DIR'], http_cache.py),
+une nouvelle exploration du même site est incrémentale : les pages inchangées
+depuis leur dernière ingestion ne sont ni analysées ni ingérées (seul leur
+point de reprise est enregistré), et seuls les produits nouveaux ou modifiés
+des autres pages sont ingérés (changed_items). Une page n'est notée ingérée
+dans le cache (mark_ingested) qu'une fois son point de reprise validé en
+base : une page dont la transaction est annulée est retraitée entièrement au
+passage suivant.
+
+Configuration (settings.SCRAPING_JOBS):
+    MAX_WORKERS: Nombre de threads du pool d'exploration
+    MAX_PAGES: Pages maximales par exploration
+    STALE_AFTER: Délai sans heartbeat après lequel une session RUNNING est reprise (secondes)
+    RESUME_ON_STARTUP: Reprendre les sessions abandonnées au démarrage du serveur (gunicorn.conf.py)
+    EVENTS_POLL_INTERVAL: Intervalle de rafraîchissement du flux SSE (secondes)
+    EVENTS_TIMEOUT: Durée maximale d'un flux SSE (secondes)
+"""
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from skin_ai.bulk import bulk_save
+from .engine import page_urls, scraper_engine
+from .extraction import PHARMA_SHOP_PROFILE, parse_document, parse_generic_listing, parse_pharma_shop_listing
+from .ingest import MATCH_NAME, ingest_products
+from .models import ScrapingLog, ScrapingSession
+
+logger = logging.getLogger(__name__)
+
+# Profils d'exploration (job_params['profile'])
+PHARMA_SHOP = 'pharma-shop.tn'
+GENERIC = 'generic'
+
+PRODUCTS_PER_PAGE = 24  # Produits par page de liste pharma-shop.tn
+
+# États d'une session pouvant être (re)pris par un worker
+ACTIVE_STATUSES = ('PENDING', 'RUNNING')
+
+DEFAULT_JOBS_CONFIG = {
+    'MAX_WORKERS': 2,
+    'MAX_PAGES': 100,
+    'STALE_AFTER': 300,
+    'RESUME_ON_STARTUP': False,
+    'EVENTS_POLL_INTERVAL': 1.0,
+    'EVENTS_TIMEOUT': 1800,
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class SessionReleased(Exception):
+    """La session n'appartient plus à ce worker (supprimée ou reprise par un autre)"""
+
+
+def get_jobs_config():
+    """Configuration des explorations en arrière-plan, complétée par les valeurs par défaut"""
+    config = dict(DEFAULT_JOBS_CONFIG)
+    config.update(getattr(settings, 'SCRAPING_JOBS', {}))
+    return config
+
+
+def get_executor():
+    """Pool de workers partagé, créé au premier usage"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=get_jobs_config()['MAX_WORKERS'],
+                thread_name_prefix='scraping-job'
+            )
+        return _executor
+
+
+def job_params(url, source_site, max_pages=1):
+    """Paramètres d'exploration enregistrés sur la session (profil déduit de l'URL)"""
+    return {
+        'url': url,
+        'source_site': source_site,
+        'max_pages': max_pages,
+        'profile': PHARMA_SHOP if 'pharma-shop.tn' in url else GENERIC,
+    }
+
+
+def _stale_before():
+    return timezone.now() - timedelta(seconds=get_jobs_config()['STALE_AFTER'])
+
+
+def _unattended():
+    """Sessions actives sans signal de vie récent d'un worker (filtre)"""
+    return Q(status__in=ACTIVE_STATUSES) & (Q(heartbeat_at__isnull=True) | Q(heartbeat_at__lt=_stale_before()))
+
+
+def abandoned_sessions():
+    """Explorations actives dont aucun worker ne donne signe de vie"""
+    return ScrapingSession.objects.filter(_unattended()).exclude(job_params={})
+
+
+def is_abandoned(session):
+    """Session active dont le worker ne donne plus signe de vie (voir abandoned_sessions)"""
+    if session.status not in ACTIVE_STATUSES or not session.job_params:
+        return False
+    return session.heartbeat_at is None or session.heartbeat_at < _stale_before()
+
+
+def submit_scraping_job(session):
+    """
+    Mettre une exploration en file d'attente dans le pool de workers
+
+    Args:
+        session: ScrapingSession dont job_params est renseigné
+    """
+    ScrapingLog.objects.create(
+        session=session,
+        log_type='INFO',
+        message=f"Exploration de {session.job_params.get('url')} mise en file d'attente"
+        + (f" (reprise après la page {session.last_completed_page})" if session.last_completed_page else '')
+    )
+    # Heartbeat de mise en file : la session n'est pas considérée abandonnée en attendant un worker
+    ScrapingSession.objects.filter(id=session.id).update(heartbeat_at=timezone.now())
+    get_executor().submit(run_scraping_job, session.id)
+
+
+def resume_scraping_jobs():
+    """
+    Remettre en file d'attente les sessions abandonnées (serveur redémarré pendant un crawl)
+
+    Returns:
+        Nombre de sessions reprises
+    """
+    sessions = list(abandoned_sessions())
+    for session in sessions:
+        submit_scraping_job(session)
+    if sessions:
+        logger.info(f"{len(sessions)} exploration(s) reprise(s)")
+    return len(sessions)
+
+
+def _claim(session_id):
+    """
+    Prendre en charge une session (mise à jour conditionnelle : un seul worker gagne)
+
+    Returns:
+        Jeton du worker, à fournir à chaque écriture, ou None si la session n'est pas disponible
+    """
+    token = uuid.uuid4()
+    claimed = ScrapingSession.objects.filter(Q(status='PENDING') | _unattended(), id=session_id).update(
+        status='RUNNING', heartbeat_at=timezone.now(), error_message='', claim_token=token
+    )
+    return token if claimed else None
+
+
+def _owned(session_id, token):
+    """Session encore explorée par le worker détenteur du jeton (filtre des écritures)"""
+    return ScrapingSession.objects.filter(id=session_id, status='RUNNING', claim_token=token)
+
+
+def _page_total(document, max_pages):
+    """Nombre de pages à explorer d'après la première page pharma-shop.tn"""
+    # Texte "Affichage 1-24 de X article(s)" et liens de pagination
+    total_products, max_page_num = PHARMA_SHOP_PROFILE.page_count(document)
+    pages = min(max_pages, get_jobs_config()['MAX_PAGES'])
+    if total_products:
+        pages = min(pages, total_products // PRODUCTS_PER_PAGE + 1)
+    if max_page_num > 1:
+        pages = min(pages, max_page_num)
+    return max(pages, 1)
+
+
+def _checkpoint(session_id, token, page, products, source_site, logs, found=None):
+    """
+    Enregistrer une page terminée : produits, compteurs, point de reprise et logs
+
+    Args:
+        products: Produits à ingérer (nouveaux ou modifiés avec le cache HTTP)
+        found: Produits trouvés sur la page (len(products) par défaut)
+
+    Raises:
+        SessionReleased si la session n'est plus RUNNING ou a été reprise par
+        un autre worker (transaction annulée : rien n'est écrit)
+    """
+    with transaction.atomic():
+        result = ingest_products(products, default_source_site=source_site, match=MATCH_NAME) if products else None
+        saved = result.saved + result.updated if result else 0
+        skipped = result.skipped if result else 0
+        if result:
+            logs.append(ScrapingLog(
+                log_type='SUCCESS',
+                message=f"Page {page}: {len(products)} produits trouvés, {result.saved} créés, "
+                        f"{result.updated} mis à jour"
+            ))
+            logs.extend(ScrapingLog(log_type='ERROR', message=error) for error in result.errors[:10])
+
+        claimed = _owned(session_id, token).update(
+            total_products_found=F('total_products_found') + (len(products) if found is None else found),
+            total_products_saved=F('total_products_saved') + saved,
+            total_products_skipped=F('total_products_skipped') + skipped,
+            last_completed_page=page,
+            heartbeat_at=timezone.now(),
+        )
+        if not claimed:
+            raise SessionReleased(session_id)
+
+        for log in logs:
+            log.session_id = session_id
+        bulk_save(ScrapingLog, logs)
+    logs.clear()
+
+
+def run_scraping_job(session_id, engine=None):
+    """
+    Explorer les pages d'une session à partir de la première page non terminée
+
+    Args:
+        session_id: Identifiant de la ScrapingSession
+        engine: ScraperEngine à utiliser (défaut : scraper_engine partagé)
+    """
+    engine = engine or scraper_engine
+    token = None
+    close_old_connections()
+    try:
+        token = _claim(session_id)
+        if token is None:
+            return  # Déjà terminée, ou explorée par un autre worker
+        session = ScrapingSession.objects.get(id=session_id)
+        params = session.job_params
+        url, source_site = params['url'], params.get('source_site') or 'unknown'
+        pharma_shop = params.get('profile') == PHARMA_SHOP
+        base_url = '/'.join(url.split('/')[:3])  # Domaine de base (liens relatifs)
+        logs = []
+
+        def parse_listing(content):
+            if pharma_shop:
+                return parse_pharma_shop_listing(content, base_url)
+            return parse_generic_listing(content, url, source_site)
+
+        def parse(response):
+            return parse_listing(response.content)
+
+        def ingest_page(page, page_url, products):
+            # Cache HTTP : seuls les produits nouveaux ou modifiés depuis le dernier passage
+            changed = engine.changed_items(page_url, products)
+            if len(changed) < len(products):
+                logs.append(ScrapingLog(
+                    log_type='INFO',
+                    message=f"Page {page}: {len(products) - len(changed)} produit(s) inchangé(s) depuis le dernier passage"
+                ))
+            _checkpoint(session_id, token, page, changed, source_site, logs, found=len(products))
+            engine.mark_ingested(page_url, products)
+
+        # Première exploration : la page 1 donne le nombre de pages
+        if not session.total_pages:
+            first_response = engine.get(url)
+            first_document = parse_document(first_response.content)
+            total_pages = _page_total(first_document, int(params.get('max_pages') or 1)) if pharma_shop else 1
+            _owned(session_id, token).update(total_pages=total_pages)
+            logs.append(ScrapingLog(log_type='INFO', message=f"{total_pages} page(s) à explorer sur {url}"))
+            products = parse_listing(first_document)
+            ingest_page(1, url, products)
+            last_page = 1
+            stop = not products
+        else:
+            total_pages, last_page, stop = session.total_pages, session.last_completed_page, False
+
+        # Pages suivantes : téléchargées en parallèle, point de reprise après chacune
+        if not stop and last_page < total_pages:
+            for result in engine.iter_pages(page_urls(url, total_pages)[last_page:], parse, skip_unchanged=True):
+                page = last_page + result.index + 1
+                if result.error is not None:
+                    logs.append(ScrapingLog(log_type='WARNING', message=f"Page {page} ignorée: {result.error}"))
+                    _checkpoint(session_id, token, page, [], source_site, logs)
+                    continue
+                if result.unchanged:
+                    # Déjà ingérée telle quelle : ni analyse ni écriture des produits
+                    logs.append(ScrapingLog(log_type='INFO', message=f"Page {page} inchangée depuis le dernier passage"))
+                    _checkpoint(session_id, token, page, [], source_site, logs)
+                    continue
+
+                ingest_page(page, result.url, result.data)
+                # Si aucune page suivante ou moins de produits que prévu, arrêter
+                if not result.data:
+                    break
+
+        if not _owned(session_id, token).update(
+            status='COMPLETED', completed_at=timezone.now(), heartbeat_at=timezone.now()
+        ):
+            raise SessionReleased(session_id)
+        session.refresh_from_db()
+        ScrapingLog.objects.create(
+            session_id=session_id,
+            log_type='SUCCESS',
+            message=f"Exploration terminée: {session.total_products_saved} produits sauvegardés sur "
+                    f"{session.total_products_found} trouvés ({session.last_completed_page}/{session.total_pages} pages)"
+        )
+
+    except SessionReleased:
+        logger.info(f"Exploration {session_id} interrompue: session reprise ailleurs ou supprimée")
+    except Exception as e:
+        # Les pages déjà enregistrées sont conservées : l'exploration peut reprendre
+        logger.error(f"Erreur lors de l'exploration {session_id}: {e}", exc_info=True)
+        if token is not None and _owned(session_id, token).update(
+            status='FAILED', error_message=str(e), completed_at=timezone.now()
+        ):
+            ScrapingLog.objects.create(session_id=session_id, log_type='ERROR', message=f"Exploration échouée: {e}")
+    finally:
+        close_old_connections()
+
+
+def restart_scraping_job(session):
+    """
+    Reprendre une session échouée ou abandonnée à la page suivant le dernier point de reprise
+
+    Returns:
+        False si la session est terminée ou encore explorée par un worker actif
+    """
+    # claim_token effacé : les écritures d'un worker encore vivant sont refusées
+    if not session.job_params or not ScrapingSession.objects.filter(Q(status='FAILED') | _unattended(), id=session.id).update(
+        status='PENDING', heartbeat_at=None, completed_at=None, error_message='', claim_token=None
+    ):
+        return False
+    session.refresh_from_db()
+    submit_scraping_job(session)
+    return True
+
+
+def session_status_payload(session, after_log=0):
+    """
+    État courant d'une exploration, renvoyé par le polling et le flux SSE
+
+    Args:
+        session: ScrapingSession
+        after_log: Identifiant du dernier log déjà reçu (seuls les suivants sont renvoyés)
+    """
+    logs = session.logs.filter(id__gt=after_log).order_by('id').values('id', 'log_type', 'message', 'created_at')
+    return {
+        'id': session.id,
+        'status': session.status,
+        'total_pages': session.total_pages,
+        'last_completed_page': session.last_completed_page,
+        'total_products_found': session.total_products_found,
+        'total_products_saved': session.total_products_saved,
+        'total_products_skipped': session.total_products_skipped,
+        'error_message': session.error_message,
+        'heartbeat_at': session.heartbeat_at,
+        'abandoned': is_abandoned(session),  # À relancer par POST .../resume/
+        'completed_at': session.completed_at,
+        'logs': list(logs),
+    }
@@ -0,0 +1,142 @@
+"""
+Comparer les backends d'extraction HTML sur les pages enregistrées
+
+Mesure, sur les pages de scraped_products/fixtures/html (ou les fichiers
+fournis), le temps d'analyse d'une page de liste pharma-shop.tn :
+    - legacy: ancien chemin (BeautifulSoup 'html.parser', find_all avec
+      re.compile et find() imbriqués par produit),
+    - html.parser: extraction.py avec le backend de repli (soupsieve),
+    - lxml: extraction.py avec lxml et XPath précompilés (si installé).
+
+Usage:
+    python manage.py benchmark_extraction
+    python manage.py benchmark_extraction --repeat 50 page1.html page2.html
+"""
+import os
+import re
+import time
+from bs4 import BeautifulSoup
+from django.core.management.base import BaseCommand, CommandError
+from scraped_products.classifier import product_classifier
+from scraped_products.extraction import HTML_PARSER, LXML, lxml_html, parse_pharma_shop_listing
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'fixtures', 'html')
+BASE_URL = 'https://pharma-shop.tn/839-visage'
+
+
+def legacy_parse_listing_page(content, base_url):
+    """Ancien analyseur de scrape_pharma_shop.py, conservé comme référence de mesure"""
+    soup = BeautifulSoup(content, 'html.parser')
+    product_elements = soup.find_all('div', class_=re.compile(r'thumbnail-container', re.I))
+    page_products = []
+
+    for element in product_elements:
+        name = None
+        name_elem = element.find('h2', class_='product-title')
+        if not name_elem:
+            name_elem = element.find('h2', class_=re.compile(r'product-title', re.I))
+        if name_elem:
+            name_link = name_elem.find('a')
+            if name_link:
+                name = name_link.get_text(strip=True).replace('...', '').strip()
+            else:
+                name = name_elem.get_text(strip=True)
+        else:
+            name_elem = element.find(['h2', 'h3'], class_=re.compile(r'title', re.I))
+            if name_elem:
+                name_link = name_elem.find('a')
+                name = name_link.get_text(strip=True) if name_link else name_elem.get_text(strip=True)
+        if not name or len(name) < 3:
+            continue
+        name = ' '.join(name.split())
+
+        price = 0.0
+        price_elem = element.find('span', class_='price')
+        if price_elem:
+            price_text = price_elem.get_text(strip=True).replace('\xa0', ' ').replace('TND', '').strip()
+            price_match = re.search(r'(\d+[.,]\d+)', price_text.replace(',', '.'))
+            if price_match:
+                price = float(price_match.group(1).replace(',', '.'))
+        if price <= 0:
+            price_container = element.find('div', class_='product-price-and-shipping')
+            if price_container:
+                price_match = re.search(r'(\d+[.,]\d+)\s*TND', price_container.get_text())
+                if price_match:
+                    price = float(price_match.group(1).replace(',', '.'))
+        if price <= 0:
+            continue
+
+        image_url = None
+        product_image_div = element.find('div', class_='product-image')
+        if product_image_div:
+            img_elem = product_image_div.find('img')
+            if img_elem:
+                image_url = img_elem.get('data-full-size-image-url') or img_elem.get('src')
+
+        product_url = None
+        name_link_elem = element.find('h2', class_=re.compile(r'product-title', re.I))
+        if name_link_elem:
+            link_elem = name_link_elem.find('a', href=True)
+            if link_elem:
+                product_url = link_elem.get('href')
+        if not product_url:
+            thumbnail = element.find('a', class_='product-thumbnail')
+            if thumbnail:
+                product_url = thumbnail.get('href')
+
+        brand = 'Marque inconnue'
+        brand_elem = element.find('div', class_='txt-marque')
+        if brand_elem:
+            brand_link = brand_elem.find('a')
+            brand = brand_link.get_text(strip=True) if brand_link else brand_elem.get_text(strip=True)
+        if brand == 'Marque inconnue' or not brand:
+            brand = name.split()[0]
+
+        category, target_issues = product_classifier.classify(name)
+        size_match = re.search(r'(\d+)\s*(ml|g|gr|kg|l)', name.lower())
+        page_products.append({
+            'name': name, 'brand': brand, 'price': price, 'category': category,
+            'target_issues': target_issues, 'image': image_url, 'url': product_url or base_url,
+            'size': f"{size_match.group(1)}{size_match.group(2).upper()}" if size_match else None,
+        })
+    return page_products
+
+
+class Command(BaseCommand):
+    help = "Compare le temps d'extraction des pages de liste : ancien chemin, html.parser et lxml"
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='*', help='Pages HTML enregistrées (défaut : fixtures/html/pharma_shop*.html)')
+        parser.add_argument('--repeat', type=int, default=20, help="Nombre d'analyses par page et par backend")
+
+    def handle(self, *args, **options):
+        files = options['files'] or sorted(
+            os.path.join(FIXTURES_DIR, name) for name in os.listdir(FIXTURES_DIR) if name.startswith('pharma_shop')
+        )
+        if not files:
+            raise CommandError("Aucune page HTML à mesurer")
+        pages = []
+        for path in files:
+            with open(path, 'rb') as f:
+                pages.append(f.read())
+
+        runs = [('legacy', lambda content: legacy_parse_listing_page(content, BASE_URL))]
+        runs.append((HTML_PARSER, lambda content: parse_pharma_shop_listing(content, BASE_URL, backend=HTML_PARSER)))
+        if lxml_html is not None:
+            runs.append((LXML, lambda content: parse_pharma_shop_listing(content, BASE_URL, backend=LXML)))
+        else:
+            self.stdout.write(self.style.WARNING("lxml n'est pas installé : backend lxml non mesuré"))
+
+        self.stdout.write(f"{len(pages)} page(s), {options['repeat']} analyses par page\n")
+        baseline = None
+        for label, parse in runs:
+            products = sum(len(parse(content)) for content in pages)  # Échauffement
+            started = time.perf_counter()
+            for _ in range(options['repeat']):
+                for content in pages:
+                    parse(content)
+            per_page = (time.perf_counter() - started) / (options['repeat'] * len(pages)) * 1000
+            baseline = baseline or per_page
+            self.stdout.write(
+                f"{label:<12} {per_page:8.2f} ms/page  x{baseline / per_page:5.1f}  ({products} produits)"
+            )
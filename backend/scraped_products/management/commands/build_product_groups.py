@@ -0,0 +1,44 @@
+"""
+Rattacher les produits scrapés à leur groupe d'équivalence entre sites
+
+Usage:
+    python manage.py build_product_groups          # Produits sans groupe uniquement
+    python manage.py build_product_groups --all    # Recalculer tous les groupes
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from scraped_products.models import ScrapedProduct
+from scraped_products.matching import product_matcher
+
+
+class Command(BaseCommand):
+    help = "Calcule ScrapedProduct.match_group (index d'équivalence des produits entre sites)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Recalculer les groupes de tous les produits')
+        parser.add_argument('--batch-size', type=int, default=500, help='Taille des lots de mise à jour')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            ScrapedProduct.objects.exclude(match_group='').update(match_group='')
+        product_matcher.load()
+
+        # Les plus anciens d'abord : le premier produit d'un groupe en devient le représentant
+        products = ScrapedProduct.objects.filter(match_group='').order_by('id').only('id', 'name', 'brand', 'match_group')
+        batch, updated = [], 0
+        for product in products.iterator():
+            product_matcher.assign(product)
+            batch.append(product)
+            if len(batch) >= options['batch_size']:
+                updated += self._flush(batch)
+        updated += self._flush(batch)
+
+        groups = ScrapedProduct.objects.exclude(match_group='').values('match_group').distinct().count()
+        self.stdout.write(self.style.SUCCESS(f"{updated} produits rattachés, {groups} groupes"))
+
+    def _flush(self, batch):
+        with transaction.atomic():
+            ScrapedProduct.objects.bulk_update(batch, ['match_group'])
+        count = len(batch)
+        batch.clear()
+        return count
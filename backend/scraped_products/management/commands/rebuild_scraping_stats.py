@@ -0,0 +1,17 @@
+"""
+Recalculer les statistiques matérialisées des produits scrapés
+
+Usage:
+    python manage.py rebuild_scraping_stats
+"""
+from django.core.management.base import BaseCommand
+from scraped_products.stats import product_counts, rebuild_stats
+
+
+class Command(BaseCommand):
+    help = "Recalcule ScrapedProductStat (compteurs par catégorie, site et état) depuis ScrapedProduct"
+
+    def handle(self, *args, **options):
+        rebuild_stats()
+        total, active = product_counts()
+        self.stdout.write(self.style.SUCCESS(f"Statistiques recalculées: {total} produits ({active} actifs)"))
@@ -0,0 +1,20 @@
+"""
+Reconstruire l'index plein texte des produits scrapés
+
+Usage:
+    python manage.py rebuild_search_index
+"""
+from django.core.management.base import BaseCommand
+from scraped_products.models import ScrapedProduct
+from scraped_products.search import fts_available, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index FTS5 (scraped_products_fts) depuis la table des produits"
+
+    def handle(self, *args, **options):
+        if not fts_available():
+            self.stdout.write(self.style.WARNING("Index plein texte non disponible sur cette base"))
+            return
+        rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"{ScrapedProduct.objects.count()} produits indexés"))
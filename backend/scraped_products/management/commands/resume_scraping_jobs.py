@@ -0,0 +1,41 @@
+"""
+Reprendre les explorations interrompues
+
+Les sessions RUNNING ou PENDING dont le worker ne donne plus signe de vie
+(settings.SCRAPING_JOBS['STALE_AFTER']) sont explorées à partir de la page
+suivant leur dernier point de reprise, une par une, dans ce processus.
+
+Usage:
+    python manage.py resume_scraping_jobs
+    python manage.py resume_scraping_jobs --list
+"""
+from django.core.management.base import BaseCommand
+from scraped_products.jobs import abandoned_sessions, run_scraping_job
+from scraped_products.models import ScrapingSession
+
+
+class Command(BaseCommand):
+    help = "Reprend les explorations abandonnées à partir de leur dernière page enregistrée"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--list', action='store_true', help='Lister les sessions abandonnées sans les reprendre')
+
+    def handle(self, *args, **options):
+        sessions = list(abandoned_sessions().order_by('id'))
+        if not sessions:
+            self.stdout.write("Aucune exploration à reprendre")
+            return
+
+        for session in sessions:
+            self.stdout.write(
+                f"#{session.id} {session.session_name}: page {session.last_completed_page}/{session.total_pages or '?'}"
+            )
+            if options['list']:
+                continue
+            run_scraping_job(session.id)
+            session = ScrapingSession.objects.get(id=session.id)
+            style = self.style.SUCCESS if session.status == 'COMPLETED' else self.style.ERROR
+            self.stdout.write(style(
+                f"   {session.status}: {session.total_products_saved} produits sauvegardés, "
+                f"page {session.last_completed_page}/{session.total_pages}"
+            ))
@@ -0,0 +1,246 @@
+"""
+Index d'équivalence des produits entre sites
+============================================
+
+Un même produit vendu sur plusieurs sites (noms légèrement différents,
+accents, ponctuation, contenance) est rattaché à un groupe canonique stocké
+dans ScrapedProduct.match_group. Toutes les offres d'un groupe sont ensuite
+récupérées par une seule requête indexée, sans recherche icontains.
+
+Appariement :
+    - texte normalisé (normalize_product_name, sans accents ni espaces) par marque,
+    - signature MinHash sur les trigrammes de caractères du nom,
+    - LSH par bandes pour trouver les groupes candidats de la même marque,
+    - confirmation par similarité de Jaccard exacte >= THRESHOLD.
+
+Le groupe est attribué à l'ingestion (save_scraped_products,
+save_products_batch, scrape_pharma_shop.py). Les produits existants sont
+rattachés avec : python manage.py build_product_groups
+
+Configuration (settings.PRODUCT_MATCHING):
+    THRESHOLD: Similarité de Jaccard minimale entre deux noms
+    NUM_PERM: Nombre de permutations MinHash
+    BANDS: Nombre de bandes LSH (NUM_PERM doit être divisible par BANDS)
+    REFRESH_INTERVAL: Relecture des groupes créés par d'autres processus (secondes, None = jamais)
+"""
+import hashlib
+import logging
+import re
+import threading
+import time
+import unicodedata
+import zlib
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MATCHING_CONFIG = {
+    'THRESHOLD': 0.7,
+    'NUM_PERM': 32,
+    'BANDS': 8,
+    'REFRESH_INTERVAL': 300,
+}
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = (1 << 32) - 1
+
+
+def get_matching_config():
+    """Configuration de l'appariement des produits, complétée par les valeurs par défaut"""
+    config = dict(DEFAULT_MATCHING_CONFIG)
+    config.update(getattr(settings, 'PRODUCT_MATCHING', {}))
+    return config
+
+
+def normalize_product_name(name, brand=''):
+    """Normalise le nom d'un produit pour la comparaison"""
+    if not name:
+        return ''
+    normalized = name.lower().strip()
+    # Enlever les caractères spéciaux et espaces multiples
+    normalized = re.sub(r'[^\w\s]', '', normalized)
+    normalized = re.sub(r'\s+', ' ', normalized)
+    return normalized
+
+
+def matching_text(name):
+    """Texte d'appariement : nom normalisé, sans accents ni espaces ("400 ml" = "400ml")"""
+    normalized = unicodedata.normalize('NFKD', normalize_product_name(name))
+    return ''.join(c for c in normalized if not unicodedata.combining(c) and not c.isspace())
+
+
+def shingles(text, size=3):
+    """Trigrammes de caractères d'un texte (le texte entier s'il est plus court)"""
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def group_key_for(brand_text, name_text):
+    """Clé de groupe déterministe : identique dans tous les processus pour un même produit"""
+    return hashlib.sha1(f"{brand_text}|{name_text}".encode('utf-8')).hexdigest()[:16]
+
+
+class ProductMatcher:
+    """Groupes d'équivalence des produits scrapés (MinHash + LSH en mémoire)"""
+
+    def __init__(self, threshold=0.7, num_perm=32, bands=8, refresh_interval=300):
+        if num_perm % bands:
+            raise ValueError("NUM_PERM doit être divisible par BANDS")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        self.refresh_interval = refresh_interval
+
+        # Permutations MinHash fixes (mêmes signatures dans tous les processus)
+        rng = np.random.RandomState(1)
+        self._a = rng.randint(1, _MAX_HASH, size=num_perm).astype(np.uint64)
+        self._b = rng.randint(0, _MAX_HASH, size=num_perm).astype(np.uint64)
+
+        self._lock = threading.RLock()
+        self._loaded_at = None
+        self._reset()
+
+    def _reset(self):
+        self._exact = {}  # (marque, nom) normalisés -> groupe
+        self._buckets = {}  # (marque, bande, valeurs) -> groupes
+        self._group_shingles = {}  # groupe -> trigrammes du produit canonique
+
+    def signature(self, grams):
+        """Signature MinHash d'un ensemble de trigrammes"""
+        hashes = np.fromiter((zlib.crc32(g.encode('utf-8')) for g in grams), dtype=np.uint64, count=len(grams))
+        permuted = (self._a[:, None] * hashes[None, :] + self._b[:, None]) % _MERSENNE_PRIME
+        return permuted.min(axis=1)
+
+    def _bands(self, brand_text, signature):
+        r = self.rows_per_band
+        return [(brand_text, band, signature[band * r:(band + 1) * r].tobytes()) for band in range(self.bands)]
+
+    # ------------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------------
+
+    def ensure_loaded(self):
+        """Charger les groupes existants au premier usage ou après REFRESH_INTERVAL"""
+        with self._lock:
+            expired = (
+                self.refresh_interval is not None and self._loaded_at is not None
+                and time.time() - self._loaded_at > self.refresh_interval
+            )
+            if self._loaded_at is None or expired:
+                self.load()
+
+    def load(self):
+        """Relire les groupes depuis la base (1 requête)"""
+        from .models import ScrapedProduct
+
+        started = time.perf_counter()
+        with self._lock:
+            self._reset()
+            rows = ScrapedProduct.objects.exclude(match_group='').order_by('id').values_list('name', 'brand', 'match_group')
+            for name, brand, group in rows.iterator():
+                self._register(matching_text(brand), matching_text(name), group)
+            self._loaded_at = time.time()
+        logger.info(f"Groupes de produits chargés: {len(self._group_shingles)} en {time.perf_counter() - started:.3f}s")
+
+    def _register(self, brand_text, name_text, group):
+        self._exact.setdefault((brand_text, name_text), group)
+        if group in self._group_shingles:
+            return
+        grams = shingles(name_text)
+        self._group_shingles[group] = grams
+        if grams:
+            for bucket in self._bands(brand_text, self.signature(grams)):
+                self._buckets.setdefault(bucket, set()).add(group)
+
+    # ------------------------------------------------------------------
+    # Appariement
+    # ------------------------------------------------------------------
+
+    def _find(self, brand_text, name_text, grams):
+        """Groupe existant le plus proche, ou None sous le seuil"""
+        group = self._exact.get((brand_text, name_text))
+        if group is not None or not grams:
+            return group
+
+        candidates = set()
+        for bucket in self._bands(brand_text, self.signature(grams)):
+            candidates.update(self._buckets.get(bucket, ()))
+
+        best_group, best_score = None, 0.0
+        for candidate in sorted(candidates):
+            score = jaccard(grams, self._group_shingles[candidate])
+            if score > best_score:
+                best_group, best_score = candidate, score
+        return best_group if best_score >= self.threshold else None
+
+    def lookup(self, name, brand):
+        """Groupe existant d'un produit, sans en créer (None si aucun)"""
+        brand_text = matching_text(brand)
+        name_text = matching_text(name)
+        with self._lock:
+            self.ensure_loaded()
+            return self._find(brand_text, name_text, shingles(name_text))
+
+    def match(self, name, brand):
+        """
+        Groupe canonique d'un produit, créé s'il n'existe pas encore
+
+        Args:
+            name: Nom du produit
+            brand: Marque du produit
+
+        Returns:
+            Clé de groupe (chaîne de 16 caractères)
+        """
+        brand_text = matching_text(brand)
+        name_text = matching_text(name)
+
+        with self._lock:
+            self.ensure_loaded()
+            group = self._find(brand_text, name_text, shingles(name_text))
+            if group is None:
+                group = group_key_for(brand_text, name_text)
+            self._register(brand_text, name_text, group)
+            return group
+
+    def assign(self, product):
+        """Renseigner product.match_group (à appeler avant save())"""
+        product.match_group = self.match(product.name, product.brand)
+        return product.match_group
+
+    def offers(self, groups, exclude_ids=()):
+        """
+        Offres actives de plusieurs groupes, en une requête indexée
+
+        Returns:
+            Dictionnaire groupe -> liste de ScrapedProduct (plus récents d'abord)
+        """
+        from .models import ScrapedProduct
+
+        offers = {group: [] for group in groups if group}
+        if not offers:
+            return offers
+        queryset = ScrapedProduct.objects.filter(match_group__in=list(offers), is_active=True)
+        if exclude_ids:
+            queryset = queryset.exclude(id__in=list(exclude_ids))
+        for product in queryset:
+            offers[product.match_group].append(product)
+        return offers
+
+
+_matching_config = get_matching_config()
+product_matcher = ProductMatcher(
+    threshold=_matching_config['THRESHOLD'],
+    num_perm=_matching_config['NUM_PERM'],
+    bands=_matching_config['BANDS'],
+    refresh_interval=_matching_config['REFRESH_INTERVAL']
+)
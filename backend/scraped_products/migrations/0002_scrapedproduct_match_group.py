@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 16:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraped_products', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scrapedproduct',
+            name='match_group',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=16, verbose_name='Groupe produit'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations
+
+FTS_TABLE = 'scraped_products_fts'
+
+
+def create_fts_index(apps, schema_editor):
+    """Table FTS5 de recherche plein texte (SQLite uniquement), remplie avec les produits existants"""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    ScrapedProduct = apps.get_model('scraped_products', 'ScrapedProduct')
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        "name, brand, description, "
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE}(rowid, name, brand, description) "
+        f"SELECT id, COALESCE(name, ''), COALESCE(brand, ''), COALESCE(description, '') "
+        f"FROM {ScrapedProduct._meta.db_table}"
+    )
+
+
+def drop_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraped_products', '0002_scrapedproduct_match_group'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_index, drop_fts_index),
+    ]
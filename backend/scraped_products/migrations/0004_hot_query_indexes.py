@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-17 16:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraped_products', '0003_scrapedproduct_fts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='scrapedproduct',
+            index=models.Index(fields=['url'], name='scraped_url_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scrapedproduct',
+            index=models.Index(fields=['name', 'brand', 'source_site'], name='scraped_dedup_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scrapedproduct',
+            index=models.Index(fields=['created_at'], name='scraped_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scrapedproduct',
+            index=models.Index(fields=['category', 'created_at'], name='scraped_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scrapedproduct',
+            index=models.Index(fields=['source_site', 'is_active'], name='scraped_source_idx'),
+        ),
+    ]
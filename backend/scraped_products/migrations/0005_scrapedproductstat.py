@@ -0,0 +1,44 @@
+# Generated by Django 5.2.6 on 2026-10-17 16:22
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_stats(apps, schema_editor):
+    """Compteurs initiaux à partir des produits existants"""
+    ScrapedProduct = apps.get_model('scraped_products', 'ScrapedProduct')
+    ScrapedProductStat = apps.get_model('scraped_products', 'ScrapedProductStat')
+    rows = ScrapedProduct.objects.order_by().values('category', 'source_site', 'is_active').annotate(count=Count('id'))
+    ScrapedProductStat.objects.bulk_create([
+        ScrapedProductStat(
+            category=row['category'] or '', source_site=row['source_site'] or '',
+            is_active=row['is_active'], count=row['count']
+        )
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraped_products', '0004_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScrapedProductStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(max_length=50, verbose_name='Catégorie')),
+                ('source_site', models.CharField(max_length=100, verbose_name='Site source')),
+                ('is_active', models.BooleanField(verbose_name='Actif')),
+                ('count', models.IntegerField(default=0, verbose_name='Nombre de produits')),
+            ],
+            options={
+                'verbose_name': 'Statistique Produits Scrapés',
+                'verbose_name_plural': 'Statistiques Produits Scrapés',
+                'constraints': [models.UniqueConstraint(fields=('category', 'source_site', 'is_active'), name='unique_scraped_product_stat')],
+            },
+        ),
+        migrations.RunPython(populate_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.6 on 2026-10-17 17:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraped_products', '0005_scrapedproductstat'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scrapingsession',
+            name='error_message',
+            field=models.TextField(blank=True, default='', verbose_name='Erreur'),
+        ),
+        migrations.AddField(
+            model_name='scrapingsession',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Dernier signal du worker'),
+        ),
+        migrations.AddField(
+            model_name='scrapingsession',
+            name='job_params',
+            field=models.JSONField(blank=True, default=dict, verbose_name="Paramètres de l'exploration"),
+        ),
+        migrations.AddField(
+            model_name='scrapingsession',
+            name='last_completed_page',
+            field=models.IntegerField(default=0, verbose_name='Dernière page traitée'),
+        ),
+        migrations.AddField(
+            model_name='scrapingsession',
+            name='total_pages',
+            field=models.IntegerField(default=0, verbose_name='Pages à explorer'),
+        ),
+        migrations.AlterField(
+            model_name='scrapingsession',
+            name='created_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Créé par'),
+        ),
+    ]
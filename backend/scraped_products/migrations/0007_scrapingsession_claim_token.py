@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 17:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraped_products', '0006_scrapingsession_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scrapingsession',
+            name='claim_token',
+            field=models.UUIDField(blank=True, editable=False, null=True, verbose_name='Jeton du worker'),
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -54,6 +54,9 @@ class ScrapedProduct(models.Model):
     source_site = models.CharField(max_length=100, verbose_name="Site source")
     source_url = models.URLField(blank=True, null=True, verbose_name="URL source")
     
+    # Groupe d'équivalence entre sites (voir scraped_products/matching.py)
+    match_group = models.CharField(max_length=16, blank=True, default='', db_index=True, verbose_name="Groupe produit")
+    
     # Métadonnées
     is_active = models.BooleanField(default=True, verbose_name="Actif")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Date de création")
@@ -72,10 +75,31 @@ class ScrapedProduct(models.Model):
         verbose_name = "Produit Scrapé"
         verbose_name_plural = "Produits Scrapés"
         ordering = ['-created_at']
+        # Index des requêtes fréquentes (plans vérifiés dans skin_ai/tests.py).
+        # created_at est indexé en ordre croissant : SQLite parcourt l'index à
+        # l'envers pour ORDER BY -created_at, -id sans tri temporaire. is_active
+        # (presque toujours vrai) est filtré en parcourant ces index plutôt
+        # qu'indexé en tête.
+        indexes = [
+            # Dédoublonnage à l'ingestion : URL, puis nom + marque + site
+            models.Index(fields=['url'], name='scraped_url_idx'),
+            models.Index(fields=['name', 'brand', 'source_site'], name='scraped_dedup_idx'),
+            # Listes et catalogue : produits les plus récents
+            models.Index(fields=['created_at'], name='scraped_created_idx'),
+            # Filtres par catégorie et statistiques par site
+            models.Index(fields=['category', 'created_at'], name='scraped_category_idx'),
+            models.Index(fields=['source_site', 'is_active'], name='scraped_source_idx'),
+        ]
     
     def __str__(self):
         return f"{self.brand} - {self.name}"
     
+    def save(self, *args, **kwargs):
+        # Le produit et ses compteurs (ScrapedProductStat, via post_save) sont écrits
+        # dans la même transaction ; delete() est déjà atomique
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+    
     def get_target_skin_types_display(self):
         """Retourne les types de peau ciblés sous forme de chaîne"""
         if not self.target_skin_types:
@@ -123,12 +147,23 @@ class ScrapingSession(models.Model):
         verbose_name="Statut"
     )
     
+    # Exploration en arrière-plan (voir scraped_products/jobs.py) : paramètres,
+    # point de reprise après chaque page, signal de vie et jeton du worker
+    job_params = models.JSONField(default=dict, blank=True, verbose_name="Paramètres de l'exploration")
+    total_pages = models.IntegerField(default=0, verbose_name="Pages à explorer")
+    last_completed_page = models.IntegerField(default=0, verbose_name="Dernière page traitée")
+    heartbeat_at = models.DateTimeField(null=True, blank=True, verbose_name="Dernier signal du worker")
+    claim_token = models.UUIDField(null=True, blank=True, editable=False, verbose_name="Jeton du worker")
+    error_message = models.TextField(blank=True, default='', verbose_name="Erreur")
+    
     # Métadonnées
     started_at = models.DateTimeField(auto_now_add=True, verbose_name="Début")
     completed_at = models.DateTimeField(null=True, blank=True, verbose_name="Fin")
     created_by = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
+        null=True,
+        blank=True,
         verbose_name="Créé par"
     )
     
@@ -185,5 +220,26 @@ class ScrapingLog(models.Model):
         return f"{self.get_log_type_display()} - {self.message[:50]}..."
 
 
-
+class ScrapedProductStat(models.Model):
+    """
+    Compteurs matérialisés des produits scrapés par catégorie, site et état
+    
+    Tenus à jour dans la transaction de chaque écriture (voir scraped_products/stats.py) :
+    scraping_stats lit cette petite table au lieu d'agréger ScrapedProduct.
+    """
+    
+    category = models.CharField(max_length=50, verbose_name="Catégorie")
+    source_site = models.CharField(max_length=100, verbose_name="Site source")
+    is_active = models.BooleanField(verbose_name="Actif")
+    count = models.IntegerField(default=0, verbose_name="Nombre de produits")
+    
+    class Meta:
+        verbose_name = "Statistique Produits Scrapés"
+        verbose_name_plural = "Statistiques Produits Scrapés"
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'source_site', 'is_active'], name='unique_scraped_product_stat'),
+        ]
+    
+    def __str__(self):
+        return f"{self.source_site} / {self.category} ({'actifs' if self.is_active else 'inactifs'}): {self.count}"
 
@@ -0,0 +1,278 @@
+"""
+Recherche plein texte des produits scrapés
+==========================================
+
+Index SQLite FTS5 (table virtuelle scraped_products_fts, rowid = id du
+produit) sur le nom, la marque et la description :
+    - tokenizer unicode61 sans accents ("crème" = "creme"),
+    - index de préfixes (2 et 3 caractères) pour l'autocomplétion,
+    - classement BM25 pondéré (nom > marque > description).
+
+L'index est créé et rempli par la migration 0003, puis tenu à jour par les
+signaux post_save / post_delete (voir scraped_products/signals.py). Les
+écritures en masse (bulk_create, update) doivent appeler index_products.
+
+Sur une autre base que SQLite (ou sans FTS5), les fonctions retombent sur
+des recherches icontains.
+"""
+import logging
+import re
+from django.db import connection, DatabaseError
+from django.db.models import Count, Q
+from django.db.models.expressions import RawSQL
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'scraped_products_fts'
+
+# Poids BM25 des colonnes (name, brand, description)
+BM25_WEIGHTS = (10.0, 5.0, 1.0)
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+_fts_available = {}  # Nom de la base -> présence de l'index
+
+
+def fts_available():
+    """L'index FTS5 existe-t-il dans la base courante ?"""
+    name = connection.settings_dict['NAME']
+    if name not in _fts_available:
+        _fts_available[name] = connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names()
+    return _fts_available[name]
+
+
+def _table():
+    from .models import ScrapedProduct
+    return ScrapedProduct._meta.db_table
+
+
+def build_match_query(text, prefix_last=True, columns=None):
+    """
+    Requête MATCH FTS5 à partir d'une saisie utilisateur
+
+    Chaque mot devient un terme entre guillemets (pas d'opérateurs FTS
+    injectés) ; les termes sont combinés en ET. Le dernier mot est cherché
+    en préfixe pour la recherche pendant la frappe.
+
+    Returns:
+        Chaîne MATCH, ou None si la saisie ne contient aucun mot
+    """
+    tokens = _TOKEN_RE.findall(text or '')
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens]
+    if prefix_last:
+        terms[-1] += '*'
+    query = ' '.join(terms)
+    if columns:
+        query = f"{{{' '.join(columns)}}} : ({query})"
+    return query
+
+
+def _filter_sql(category=None, brand=None, include_inactive=False, brand_contains=None):
+    clauses, params = [], []
+    if not include_inactive:
+        clauses.append('p.is_active = 1')
+    if category:
+        clauses.append('p.category = %s')
+        params.append(category)
+    if brand:
+        clauses.append('p.brand = %s')
+        params.append(brand)
+    if brand_contains:
+        # Même comparaison que brand__icontains sur SQLite
+        clauses.append("p.brand LIKE %s ESCAPE '\\'")
+        params.append(f'%{connection.ops.prep_for_like_query(brand_contains)}%')
+    return ''.join(f' AND {clause}' for clause in clauses), params
+
+
+def _fallback_filter(text):
+    """Chaque mot dans le nom, la marque ou la description (icontains)"""
+    filters = Q()
+    for token in _TOKEN_RE.findall(text or ''):
+        filters &= Q(name__icontains=token) | Q(brand__icontains=token) | Q(description__icontains=token)
+    return filters
+
+
+def _fallback_queryset(text, category=None, brand=None, include_inactive=False, brand_contains=None):
+    from .models import ScrapedProduct
+
+    queryset = ScrapedProduct.objects.all() if include_inactive else ScrapedProduct.objects.filter(is_active=True)
+    queryset = queryset.filter(_fallback_filter(text))
+    if category:
+        queryset = queryset.filter(category=category)
+    if brand:
+        queryset = queryset.filter(brand=brand)
+    if brand_contains:
+        queryset = queryset.filter(brand__icontains=brand_contains)
+    return queryset
+
+
+def search_filter(text):
+    """
+    Filtre Q des produits correspondant à la saisie, à combiner avec une requête Django
+
+    Avec l'index FTS5, une sous-requête SQL (id IN (SELECT rowid ... MATCH)) :
+    les identifiants ne transitent pas par Python et la requête ne grossit pas
+    avec le nombre de résultats (limite de variables de SQLite). Ne classe
+    pas les résultats (voir search_ids).
+    """
+    match = build_match_query(text)
+    if match is None:
+        return Q(pk__in=[])
+    if not fts_available():
+        return _fallback_filter(text)
+    return Q(id__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', (match,)))
+
+
+def search_ids(text, category=None, brand=None, limit=50, include_inactive=False, brand_contains=None):
+    """
+    Identifiants des produits correspondant à la saisie, du plus pertinent au moins pertinent
+
+    Args:
+        text: Saisie utilisateur
+        category: Filtre exact sur la catégorie
+        brand: Filtre exact sur la marque
+        limit: Nombre maximal de résultats (None = tous)
+        include_inactive: Inclure les produits désactivés
+        brand_contains: Filtre partiel sur la marque (insensible à la casse)
+    """
+    match = build_match_query(text)
+    if match is None:
+        return []
+
+    if not fts_available():
+        queryset = _fallback_queryset(text, category, brand, include_inactive, brand_contains).order_by('-created_at')
+        return list(queryset.values_list('id', flat=True)[:limit])
+
+    filter_sql, filter_params = _filter_sql(category, brand, include_inactive, brand_contains)
+    sql = (
+        f'SELECT p.id FROM {FTS_TABLE} JOIN {_table()} p ON p.id = {FTS_TABLE}.rowid '
+        f'WHERE {FTS_TABLE} MATCH %s{filter_sql} '
+        f'ORDER BY bm25({FTS_TABLE}, %s, %s, %s), p.created_at DESC'
+    )
+    params = [match, *filter_params, *BM25_WEIGHTS]
+    if limit is not None:
+        sql += ' LIMIT %s'
+        params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search(text, category=None, brand=None, limit=50, include_inactive=False):
+    """Produits correspondant à la saisie, classés par pertinence (BM25)"""
+    from .models import ScrapedProduct
+
+    ids = search_ids(text, category, brand, limit, include_inactive)
+    products = ScrapedProduct.objects.in_bulk(ids)
+    return [products[i] for i in ids if i in products]
+
+
+def autocomplete(prefix, limit=10):
+    """
+    Suggestions pendant la frappe : noms de produits actifs dont le nom ou la
+    marque commence par les mots saisis
+
+    Returns:
+        Liste de dictionnaires {id, name, brand}
+    """
+    from .models import ScrapedProduct
+
+    match = build_match_query(prefix, columns=['name', 'brand'])
+    if match is None:
+        return []
+
+    if not fts_available():
+        queryset = ScrapedProduct.objects.filter(is_active=True, name__icontains=prefix.strip())
+        return list(queryset.values('id', 'name', 'brand')[:limit])
+
+    sql = (
+        f'SELECT p.id, p.name, p.brand FROM {FTS_TABLE} JOIN {_table()} p ON p.id = {FTS_TABLE}.rowid '
+        f'WHERE {FTS_TABLE} MATCH %s AND p.is_active = 1 '
+        f'ORDER BY bm25({FTS_TABLE}, %s, %s, %s) LIMIT %s'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [match, *BM25_WEIGHTS, limit])
+        return [{'id': row[0], 'name': row[1], 'brand': row[2]} for row in cursor.fetchall()]
+
+
+def facets(text, category=None, brand=None, limit=20):
+    """
+    Nombre de résultats par catégorie et par marque pour une saisie
+
+    Returns:
+        {'total': int, 'categories': [{value, count}], 'brands': [{value, count}]}
+    """
+    if build_match_query(text) is None:
+        return {'total': 0, 'categories': [], 'brands': []}
+
+    if not fts_available():
+        queryset = _fallback_queryset(text, category, brand)
+        return {
+            'total': queryset.count(),
+            'categories': [
+                {'value': row['category'], 'count': row['count']}
+                for row in queryset.values('category').annotate(count=Count('id')).order_by('-count')[:limit]
+            ],
+            'brands': [
+                {'value': row['brand'], 'count': row['count']}
+                for row in queryset.values('brand').annotate(count=Count('id')).order_by('-count')[:limit]
+            ],
+        }
+
+    match = build_match_query(text)
+    filter_sql, filter_params = _filter_sql(category, brand)
+    base = f'FROM {FTS_TABLE} JOIN {_table()} p ON p.id = {FTS_TABLE}.rowid WHERE {FTS_TABLE} MATCH %s{filter_sql}'
+    params = [match, *filter_params]
+    result = {}
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT COUNT(*) {base}', params)
+        result['total'] = cursor.fetchone()[0]
+        for key, column in (('categories', 'category'), ('brands', 'brand')):
+            cursor.execute(
+                f'SELECT p.{column}, COUNT(*) AS n {base} GROUP BY p.{column} ORDER BY n DESC, p.{column} LIMIT %s',
+                params + [limit]
+            )
+            result[key] = [{'value': row[0], 'count': row[1]} for row in cursor.fetchall()]
+    return result
+
+
+def index_products(products):
+    """Indexer (ou réindexer) des produits : à appeler après une écriture en masse"""
+    products = list(products)
+    if not products or not fts_available():
+        return
+    try:
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(p.id,) for p in products])
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE}(rowid, name, brand, description) VALUES (%s, %s, %s, %s)',
+                [(p.id, p.name or '', p.brand or '', p.description or '') for p in products]
+            )
+    except DatabaseError as e:
+        logger.error(f"Indexation plein texte impossible: {e}")
+
+
+def unindex_products(product_ids):
+    """Retirer des produits supprimés de l'index"""
+    product_ids = list(product_ids)
+    if not product_ids or not fts_available():
+        return
+    try:
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(i,) for i in product_ids])
+    except DatabaseError as e:
+        logger.error(f"Suppression de l'index plein texte impossible: {e}")
+
+
+def rebuild_index():
+    """Reconstruire l'index complet depuis la table des produits"""
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}(rowid, name, brand, description) "
+            f"SELECT id, COALESCE(name, ''), COALESCE(brand, ''), COALESCE(description, '') FROM {_table()}"
+        )
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import ScrapedProduct, ScrapingSession, ScrapingLog
+from .matching import product_matcher
 
 
 class ScrapedProductSerializer(serializers.ModelSerializer):
@@ -17,9 +18,9 @@ class ScrapedProductSerializer(serializers.ModelSerializer):
             'target_skin_types', 'target_skin_types_display',
             'target_issues', 'target_issues_display',
             'image', 'url', 'source_site', 'source_url',
-            'is_active', 'created_at', 'updated_at', 'scraped_by'
+            'is_active', 'created_at', 'updated_at', 'scraped_by', 'match_group'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'created_at', 'updated_at', 'match_group']
     
     def get_target_skin_types_display(self, obj):
         return obj.get_target_skin_types_display()
@@ -44,7 +45,8 @@ class ScrapedProductCreateSerializer(serializers.ModelSerializer):
         ]
     
     def create(self, validated_data):
-        # Créer le produit scrapé
+        # Créer le produit scrapé, rattaché à son groupe d'équivalence
+        validated_data['match_group'] = product_matcher.match(validated_data['name'], validated_data['brand'])
         product = ScrapedProduct.objects.create(**validated_data)
         return product
 
@@ -60,9 +62,10 @@ class ScrapingSessionSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'session_name', 'source_sites', 'total_products_found',
             'total_products_saved', 'total_products_skipped', 'status',
+            'total_pages', 'last_completed_page', 'error_message',
             'started_at', 'completed_at', 'created_by', 'duration', 'logs_count'
         ]
-        read_only_fields = ['id', 'started_at', 'completed_at']
+        read_only_fields = ['id', 'started_at', 'completed_at', 'total_pages', 'last_completed_page', 'error_message']
     
     def get_duration(self, obj):
         duration = obj.get_duration()
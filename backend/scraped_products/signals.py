@@ -0,0 +1,51 @@
+"""
+Synchronisation de l'index plein texte et des statistiques avec les produits scrapés
+"""
+import logging
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from .models import ScrapedProduct
+from .search import index_products, unindex_products
+from .stats import STAT_FIELDS, apply_deltas, product_deltas, rebuild_stats, stat_key
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=ScrapedProduct)
+def index_scraped_product(sender, instance, **kwargs):
+    index_products([instance])
+
+
+@receiver(post_delete, sender=ScrapedProduct)
+def unindex_scraped_product(sender, instance, **kwargs):
+    unindex_products([instance.id])
+
+
+@receiver(post_init, sender=ScrapedProduct)
+def remember_stat_key(sender, instance, **kwargs):
+    # Ligne de statistiques telle que lue en base, pour calculer le delta au save()
+    instance._stat_key = stat_key(instance) if instance.pk is not None else None
+
+
+@receiver(post_save, sender=ScrapedProduct)
+def update_stats_on_save(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and not set(update_fields) & set(STAT_FIELDS):
+        return
+    key = stat_key(instance)
+    before = None if created else instance._stat_key
+    if not created and (before is None or key is None):
+        # État précédent inconnu (instance construite avec un id existant, champs différés)
+        logger.warning(f"Statistiques recalculées : état précédent du produit {instance.pk} inconnu")
+        rebuild_stats()
+    else:
+        apply_deltas(product_deltas(before, key))
+    instance._stat_key = key
+
+
+@receiver(post_delete, sender=ScrapedProduct)
+def update_stats_on_delete(sender, instance, **kwargs):
+    before = instance._stat_key or stat_key(instance)
+    if before is None:
+        rebuild_stats()
+    else:
+        apply_deltas(product_deltas(before, None))
@@ -0,0 +1,120 @@
+"""
+Statistiques matérialisées des produits scrapés
+===============================================
+
+La table ScrapedProductStat compte les produits par (catégorie, site source,
+actif). Elle est mise à jour par deltas dans la transaction de chaque
+écriture, au lieu d'agréger toute la table ScrapedProduct à chaque appel de
+scraping_stats :
+    - save() / delete() : signaux post_save / post_delete (voir signals.py),
+      à partir de l'état lu au chargement de l'instance (post_init),
+    - écritures en masse (bulk_create, update) : apply_deltas() explicite.
+
+En cas de dérive (écriture SQL directe...), la table se reconstruit avec :
+python manage.py rebuild_scraping_stats
+"""
+import logging
+from collections import Counter
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+logger = logging.getLogger(__name__)
+
+# Champs qui déterminent la ligne de statistiques d'un produit
+STAT_FIELDS = ('category', 'source_site', 'is_active')
+
+
+def stat_key(product):
+    """Ligne de statistiques d'un produit : (catégorie, site, actif), None si un champ n'est pas chargé"""
+    values = product.__dict__
+    if any(field not in values for field in STAT_FIELDS):
+        return None
+    return (values['category'] or '', values['source_site'] or '', bool(values['is_active']))
+
+
+def product_deltas(before, after):
+    """Deltas de compteurs pour un produit passé de la ligne before à la ligne after (None = absent)"""
+    deltas = Counter()
+    if before != after:
+        if before is not None:
+            deltas[before] -= 1
+        if after is not None:
+            deltas[after] += 1
+    return deltas
+
+
+def apply_deltas(deltas):
+    """
+    Appliquer des deltas de compteurs {(catégorie, site, actif): delta}
+
+    Exécuté dans une transaction (imbriquée dans celle de l'appelant le cas
+    échéant) : les compteurs sont validés ou annulés avec les produits.
+    """
+    from .models import ScrapedProductStat
+
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    with transaction.atomic():
+        for (category, source_site, is_active), delta in deltas.items():
+            updated = ScrapedProductStat.objects.filter(
+                category=category, source_site=source_site, is_active=is_active
+            ).update(count=F('count') + delta)
+            if not updated:
+                ScrapedProductStat.objects.create(
+                    category=category, source_site=source_site, is_active=is_active, count=delta
+                )
+
+
+def rebuild_stats():
+    """Recalculer toute la table depuis ScrapedProduct (1 agrégation)"""
+    from .models import ScrapedProduct, ScrapedProductStat
+
+    rows = (
+        ScrapedProduct.objects.order_by()
+        .values('category', 'source_site', 'is_active')
+        .annotate(count=Count('id'))
+    )
+    with transaction.atomic():
+        ScrapedProductStat.objects.all().delete()
+        ScrapedProductStat.objects.bulk_create([
+            ScrapedProductStat(
+                category=row['category'] or '', source_site=row['source_site'] or '',
+                is_active=row['is_active'], count=row['count']
+            )
+            for row in rows
+        ])
+
+
+def product_stats():
+    """
+    Compteurs des produits actifs, lus dans la table matérialisée (1 requête)
+
+    Returns:
+        {'total_products': int, 'products_by_category': {catégorie: n}, 'products_by_source': {site: n}}
+    """
+    from .models import ScrapedProductStat
+
+    by_category, by_source = Counter(), Counter()
+    for category, source_site, count in ScrapedProductStat.objects.filter(
+        is_active=True, count__gt=0
+    ).values_list('category', 'source_site', 'count'):
+        by_category[category] += count
+        by_source[source_site] += count
+    return {
+        'total_products': sum(by_category.values()),
+        'products_by_category': dict(by_category),
+        'products_by_source': dict(by_source),
+    }
+
+
+def product_counts(source_site=None):
+    """Nombre total et nombre de produits actifs, tous sites ou pour un site (1 requête)"""
+    from .models import ScrapedProductStat
+
+    queryset = ScrapedProductStat.objects.all()
+    if source_site is not None:
+        queryset = queryset.filter(source_site=source_site)
+    rows = dict(queryset.values('is_active').annotate(n=Sum('count')).values_list('is_active', 'n'))
+    active = rows.get(True) or 0
+    return (rows.get(False) or 0) + active, active
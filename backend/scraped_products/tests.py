@@ -0,0 +1,622 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+from django.db import connection
+from django.db.models import Count
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from .classifier import CATEGORY_RULES, DEFAULT_CATEGORY, ISSUE_RULES, product_classifier
+from .engine import ScraperEngine
+from .extraction import (
+    HTML_PARSER, LXML, PHARMA_SHOP_PROFILE, lxml_html, parse_document, parse_generic_listing, parse_pharma_shop_listing
+)
+from .http_cache import HttpCache
+from .search import FTS_TABLE, autocomplete, build_match_query, facets, fts_available, search_filter, search_ids
+from .management.commands.benchmark_extraction import BASE_URL, FIXTURES_DIR, legacy_parse_listing_page
+from .ingest import MATCH_NAME, IngestResult, ingest_products
+from .jobs import (
+    PHARMA_SHOP, SessionReleased, _checkpoint, _claim, abandoned_sessions, restart_scraping_job, run_scraping_job,
+    session_status_payload,
+)
+from .models import ScrapedProduct, ScrapingLog, ScrapingSession
+from .stats import product_counts, product_stats, rebuild_stats
+from .views import save_page_products
+
+
+class ScrapingStatsTest(TestCase):
+    """La table de statistiques matérialisée suit les écritures produit par produit"""
+
+    def create(self, i, **fields):
+        values = dict(
+            name=f'Produit {i}', brand='Marque', category='SERUM', price=Decimal('9.90'),
+            source_site='site-a.tn', url=f'https://site-a.tn/p/{i}'
+        )
+        values.update(fields)
+        return ScrapedProduct.objects.create(**values)
+
+    def expected(self):
+        active = ScrapedProduct.objects.filter(is_active=True)
+        return {
+            'total_products': active.count(),
+            'products_by_category': dict(active.values('category').annotate(n=Count('id')).values_list('category', 'n')),
+            'products_by_source': dict(active.values('source_site').annotate(n=Count('id')).values_list('source_site', 'n')),
+        }
+
+    def test_stats_follow_writes(self):
+        products = [self.create(i) for i in range(6)]
+        self.create(6, category='MASK', source_site='site-b.tn')
+
+        # Désactivation, changement de catégorie, mise à jour partielle, suppression
+        products[0].is_active = False
+        products[0].save()
+        products[1].category = 'TONER'
+        products[1].save()
+        reloaded = ScrapedProduct.objects.only('id', 'name').get(id=products[2].id)
+        reloaded.name = 'Renommé'
+        reloaded.save(update_fields=['name'])
+        products[3].delete()
+
+        self.assertEqual(product_stats(), self.expected())
+        self.assertEqual(product_counts('site-a.tn'), (5, 4))
+        self.assertEqual(product_counts(), (6, 5))
+
+        rebuild_stats()
+        self.assertEqual(product_stats(), self.expected())
+
+    def test_stats_read_single_query(self):
+        for i in range(20):
+            self.create(i)
+        with self.assertNumQueries(1):
+            product_stats()
+
+
+class ProductSearchTest(TestCase):
+    """Recherche plein texte FTS5 : classement BM25, accents, préfixes, facettes et synchronisation"""
+
+    def setUp(self):
+        self.serum = self.create('serum', 'Sérum hydratant intense', 'Bioderma', 'SERUM', 'Sérum léger')
+        self.lab = self.create('lab', 'Crème visage', 'Hydratant Lab', 'MOISTURIZER', 'Texture riche')
+        self.night = self.create('nuit', 'Crème de nuit', 'Avène', 'MOISTURIZER', 'Formule hydratant et apaisante')
+        self.sun = self.create('solaire', 'Crème solaire SPF50', 'Avène', 'SUNSCREEN', 'Protection haute')
+
+    def create(self, slug, name, brand, category, description):
+        return ScrapedProduct.objects.create(
+            name=name, brand=brand, category=category, description=description, price=Decimal('15.00'),
+            source_site='pharma-shop.tn', url=f'https://pharma-shop.tn/p/{slug}'
+        )
+
+    def test_bm25_ranks_name_over_brand_over_description(self):
+        self.assertTrue(fts_available())
+        self.assertEqual(search_ids('hydratant'), [self.serum.id, self.lab.id, self.night.id])
+        self.assertEqual(search_ids('hydratant', category='MOISTURIZER'), [self.lab.id, self.night.id])
+        self.assertEqual(set(search_ids('creme avene')), {self.night.id, self.sun.id})  # Termes combinés en ET
+
+    def test_accent_insensitive(self):
+        self.assertEqual(search_ids('creme', limit=None), search_ids('crème', limit=None))
+        self.assertEqual(set(search_ids('CREME')), {self.lab.id, self.night.id, self.sun.id})
+        self.assertEqual(search_ids('serum'), [self.serum.id])
+        self.assertEqual(set(search_ids('avene')), {self.night.id, self.sun.id})
+
+    def test_prefix_autocomplete(self):
+        self.assertEqual({row['id'] for row in autocomplete('cr')}, {self.lab.id, self.night.id, self.sun.id})
+        self.assertEqual([row['name'] for row in autocomplete('creme so')], ['Crème solaire SPF50'])
+        self.assertEqual([row['id'] for row in autocomplete('biod')], [self.serum.id])  # Marque
+        self.assertEqual(autocomplete('apais'), [])  # Description non indexée pour l'autocomplétion
+        self.assertEqual(build_match_query('crème "so'), '"crème" "so"*')
+
+    def test_facet_counts(self):
+        self.assertEqual(facets('creme'), {
+            'total': 3,
+            'categories': [{'value': 'MOISTURIZER', 'count': 2}, {'value': 'SUNSCREEN', 'count': 1}],
+            'brands': [{'value': 'Avène', 'count': 2}, {'value': 'Hydratant Lab', 'count': 1}],
+        })
+        self.assertEqual(facets('creme', brand='Avène')['total'], 2)
+        self.assertEqual(facets('')['total'], 0)
+
+    def test_index_follows_save_and_delete(self):
+        self.serum.name = 'Lotion tonique'
+        self.serum.save()
+        self.assertEqual(search_ids('tonique'), [self.serum.id])
+        self.assertNotIn(self.serum.id, search_ids('intense'))
+
+        self.night.is_active = False
+        self.night.save()
+        self.assertEqual(search_ids('apaisante'), [])
+        self.assertEqual(search_ids('apaisante', include_inactive=True), [self.night.id])
+
+        night_id = self.night.id
+        self.night.delete()
+        self.assertEqual(search_ids('apaisante', include_inactive=True), [])
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {FTS_TABLE} WHERE rowid = %s', [night_id])
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_views_filter_in_sql(self):
+        # Liste : sous-requête FTS, sans liste d'identifiants dans la requête
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/scraped-products/products/', {'search': 'creme'})
+        self.assertEqual({p['id'] for p in response.json()['results']}, {self.lab.id, self.night.id, self.sun.id})
+        self.assertIn(f'SELECT rowid FROM {FTS_TABLE}', queries[-1]['sql'])
+
+        # Recherche : marque partielle appliquée avant la limite de 50 résultats
+        for i in range(60):
+            self.create(f'gel-{i}', f'Crème gel {i}', 'Uriage', 'MOISTURIZER', '')
+        response = self.client.get('/api/scraped-products/products/search/', {'q': 'creme', 'brand': 'avèn'})
+        self.assertEqual({p['id'] for p in response.json()}, {self.night.id, self.sun.id})
+        self.assertEqual(search_ids('creme', brand_contains='hydratant LAB'), [self.lab.id])
+        self.assertEqual(search_ids('creme', brand_contains='%'), [])
+
+    def test_icontains_fallback_without_fts(self):
+        with mock.patch('scraped_products.search.fts_available', return_value=False):
+            self.assertEqual(set(search_ids('hydratant')), {self.serum.id, self.lab.id, self.night.id})
+            self.assertEqual(set(search_ids('Crème', category='MOISTURIZER')), {self.lab.id, self.night.id})
+            self.assertEqual(ScrapedProduct.objects.filter(search_filter('Crème nuit')).count(), 1)
+            self.assertEqual({row['id'] for row in autocomplete('Crème')}, {self.lab.id, self.night.id, self.sun.id})
+            self.assertEqual(facets('Crème')['total'], 3)
+            self.assertEqual(facets('Crème')['categories'][0], {'value': 'MOISTURIZER', 'count': 2})
+
+
+class ProductClassifierTest(SimpleTestCase):
+    """Le classifieur compilé reproduit les règles any(word in name_lower ...) des scrapers"""
+
+    def reference(self, name):
+        name_lower = name.lower()
+        category = DEFAULT_CATEGORY
+        for rule_category, keywords in CATEGORY_RULES:
+            if any(word in name_lower for word in keywords):
+                category = rule_category
+                break
+        issues = [issue for issue, keywords in ISSUE_RULES if any(word in name_lower for word in keywords)]
+        return category, issues
+
+    def test_matches_keyword_rules(self):
+        names = [
+            'La Roche-Posay Anthelios SPF50+ Fluide', 'Bioderma Sébium Gel Moussant Acné 200ml',
+            'Avène Sérum Anti rides Éclaircissant', 'Masque Gommage Apaisant Peau Sensible',
+            'Lotion Tonique Anti-âge', 'Crème Hydratante 50ml', 'SVR Sebiaclear Mousse Nettoyante',
+            'Eau Micellaire Démaquillante', 'Scrub Exfoliant Taches', 'Crème Liftant Anti-Age Rougeurs',
+        ]
+        for name in names:
+            self.assertEqual(tuple(product_classifier.classify(name)), self.reference(name), name)
+
+    def test_description_fallback_and_batch(self):
+        self.assertEqual(product_classifier.classify('Crème visage', 'Sérum concentré anti-imperfections').category, 'SERUM')
+        self.assertEqual(product_classifier.classify('Masque nuit', 'Sérum').category, 'MASK')  # Le nom prime
+
+        products = [{'name': 'Gel nettoyant acné'}, {'name': 'Crème', 'category': 'TREATMENT'}]
+        product_classifier.classify_products(products)
+        self.assertEqual([(p['category'], p['target_issues']) for p in products], [('CLEANSER', ['acne']), ('TREATMENT', [])])
+
+
+class HtmlExtractionTest(SimpleTestCase):
+    """Les backends d'extraction donnent les mêmes produits que l'ancien analyseur BeautifulSoup"""
+
+    def fixture(self, name):
+        with open(os.path.join(FIXTURES_DIR, name), 'rb') as f:
+            return f.read()
+
+    def backends(self):
+        return [HTML_PARSER] + ([LXML] if lxml_html is not None else [])
+
+    def test_pharma_shop_listing(self):
+        content = self.fixture('pharma_shop_listing.html')
+        legacy = legacy_parse_listing_page(content, BASE_URL)
+        self.assertEqual(len(legacy), 22)  # 24 produits, dont un sans prix et un à 0 TND
+
+        for backend in self.backends():
+            products = parse_pharma_shop_listing(content, BASE_URL, backend=backend)
+            self.assertEqual(
+                [(p['name'], p['brand'], p['price'], p['category'], p['target_issues'], p['size'], p['image']) for p in products],
+                [(p['name'], p['brand'], p['price'], p['category'], p['target_issues'], p['size'], p['image']) for p in legacy],
+                backend
+            )
+            self.assertTrue(all(p['url'].startswith('https://pharma-shop.tn/visage/') for p in products))
+            self.assertEqual(PHARMA_SHOP_PROFILE.page_count(parse_document(content, backend)), (1342, 56))
+
+    def test_generic_listing(self):
+        content = self.fixture('generic_listing.html')
+        url = 'https://boutique.example/soins'
+        for backend in self.backends():
+            products = parse_generic_listing(content, url, 'boutique.example', backend=backend)
+            self.assertEqual(
+                [(p['name'], p['price'], p['category'], p['url'], p['image']) for p in products],
+                [
+                    ('Effaclar Gel Nettoyant Purifiant 400ml', 17.9, 'CLEANSER',
+                     'https://boutique.example/soins/gel-nettoyant-purifiant', 'https://boutique.example/img/gel.jpg'),
+                    ('Mela B3 Sérum Anti-taches 30ml', 39.5, 'SERUM',
+                     'https://boutique.example/soins/serum-anti-taches', 'https://cdn.example/serum.jpg'),
+                ],
+                backend
+            )
+
+    def test_empty_page(self):
+        for backend in self.backends():
+            self.assertEqual(parse_pharma_shop_listing(b'', BASE_URL, backend=backend), [])
+
+
+class IngestProductsTest(TestCase):
+    """Ingestion ensembliste : même résultat que la boucle produit par produit, en quelques requêtes"""
+
+    def rows(self, n, **fields):
+        rows = []
+        for i in range(n):
+            row = dict(
+                name=f'Produit {i}', brand='Marque', category='SERUM', price=9.9,
+                source_site='site-a.tn', url=f'https://site-a.tn/p/{i}'
+            )
+            row.update(fields)
+            rows.append(row)
+        return rows
+
+    def test_insert_update_unchanged(self):
+        result = ingest_products(self.rows(5) + [{'name': '', 'brand': 'Marque'}])
+        self.assertEqual((result.saved, result.updated, result.skipped), (5, 0, 1))
+
+        rows = self.rows(7)
+        rows[1]['price'] = '12.50'
+        rows[2]['category'] = 'MASK'
+        rows.append(dict(rows[6], size='50ml'))  # Doublon dans le lot : mise à jour du produit créé
+        inactive = ScrapedProduct.objects.get(url=rows[3]['url'])
+        inactive.is_active = False
+        inactive.save()
+        result = ingest_products(rows)
+        self.assertEqual(result, IngestResult(2, 6, 2, 0, []))
+
+        self.assertEqual(ScrapedProduct.objects.count(), 7)
+        self.assertEqual(ScrapedProduct.objects.get(url=rows[1]['url']).price, Decimal('12.50'))
+        self.assertTrue(ScrapedProduct.objects.get(url=rows[3]['url']).is_active)
+        self.assertEqual(ScrapedProduct.objects.get(url=rows[6]['url']).size, '50ml')
+
+        rebuilt = product_stats()
+        rebuild_stats()
+        self.assertEqual(rebuilt, product_stats())
+        self.assertEqual(product_stats()['products_by_category'], {'SERUM': 6, 'MASK': 1})
+
+    def test_queries_independent_of_batch_size(self):
+        ingest_products(self.rows(300))
+        with CaptureQueriesContext(connection) as queries:
+            result = ingest_products(self.rows(300, price=12) + self.rows(50, brand='Autre', url=None))
+        self.assertEqual((result.saved, result.updated), (50, 300))
+        self.assertLess(len(queries), 15)
+
+    def test_match_by_name(self):
+        ingest_products(self.rows(3, url=None), match=MATCH_NAME)
+        result = ingest_products(self.rows(3, url=None, price=5), match=MATCH_NAME)
+        self.assertEqual((result.saved, result.updated, result.unchanged), (0, 3, 0))
+        self.assertEqual(ScrapedProduct.objects.count(), 3)
+
+        # Sans URL, le dédoublonnage par URL crée toujours un nouveau produit
+        ingest_products(self.rows(1, url=None))
+        self.assertEqual(ScrapedProduct.objects.count(), 4)
+
+    def test_invalid_price_skipped(self):
+        result = ingest_products(self.rows(2, price='gratuit'))
+        self.assertEqual((result.saved, result.skipped, len(result.errors)), (0, 2, 2))
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Serveur de pages de test : /page/<n>, /flaky (503 puis 200), /versioned/<n> (ETag),
+    /listing?p=<n> (liste pharma-shop.tn, 2 produits par page), /missing (404)
+    """
+
+    protocol_version = 'HTTP/1.1'  # Connexions keep-alive
+    delay = 0.05
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append(self.path)
+            server.connections.add(self.client_address)
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            attempts = server.requests.count(self.path)
+        try:
+            time.sleep(self.delay)
+            if self.path == '/flaky' and attempts < 3:
+                self.respond(503, b'indisponible')
+            elif self.path.startswith('/versioned/'):
+                version = server.versions.get(self.path, 1)
+                if self.headers.get('If-None-Match') == f'"v{version}"':
+                    self.respond(304, b'', etag=f'"v{version}"')
+                else:
+                    self.respond(200, f'<html><body>{self.path} v{version}</body></html>'.encode(), etag=f'"v{version}"')
+            elif self.path.startswith('/listing') and self.path not in server.missing:
+                page = int(self.path.partition('p=')[2] or 1)
+                self.respond(200, listing_page(page, server.listing_pages).encode())
+            elif self.path.startswith('/page/') or self.path == '/flaky':
+                self.respond(200, f'<html><body>{self.path}</body></html>'.encode())
+            else:
+                self.respond(404, b'introuvable')
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def respond(self, status, body, etag=None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html')
+        if etag:
+            self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def listing_page(page, pages):
+    """Page de liste au format pharma-shop.tn : 2 produits et la pagination 1..pages"""
+    products = ''.join(
+        f'''<div class="thumbnail-container"><div class="product-image"><a class="product-thumbnail" href="/p/{page}-{i}"></a></div>
+        <h2 class="product-title"><a href="/p/{page}-{i}">Crème hydratante {page}-{i} 50ml</a></h2>
+        <span class="price">{10 + i},500 TND</span><div class="txt-marque"><a>Avène</a></div></div>'''
+        for i in range(2)
+    )
+    links = ''.join(f'<a href="/listing?p={n}">{n}</a>' for n in range(1, pages + 1))
+    return f'<html><body>{products}<nav class="pagination">{links}</nav></body></html>'
+
+
+class StubServerMixin:
+    """Serveur HTTP local (StubHandler) démarré pour chaque test"""
+
+    def setUp(self):
+        super().setUp()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        self.server.lock = threading.Lock()
+        self.server.requests, self.server.connections, self.server.versions = [], set(), {}
+        self.server.missing, self.server.listing_pages = set(), 3
+        self.server.active = self.server.max_active = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        super().tearDown()
+
+    def engine(self, **options):
+        values = dict(per_host_concurrency=4, rate=None, backoff_base=0.01, backoff_max=0.05, timeout=5)
+        values.update(options)
+        engine = ScraperEngine(**values)
+        self.addCleanup(engine.close)
+        return engine
+
+
+class ScraperEngineTest(StubServerMixin, SimpleTestCase):
+    """Moteur de scraping contre un serveur HTTP local"""
+
+    def test_pages_fetched_concurrently_and_parsed_in_order(self):
+        urls = [f'{self.base}/page/{i}' for i in range(12)]
+        started = time.monotonic()
+        pages = list(self.engine().iter_pages(urls, lambda response: response.text))
+        elapsed = time.monotonic() - started
+
+        self.assertEqual([page.url for page in pages], urls)
+        self.assertTrue(all(f'/page/{i}<' in page.data for i, page in enumerate(pages)))
+        self.assertEqual(self.server.max_active, 4)  # Concurrence par hôte respectée
+        self.assertLessEqual(len(self.server.connections), 4)  # Connexions réutilisées (keep-alive)
+        self.assertLess(elapsed, 12 * StubHandler.delay)
+
+    def test_rate_limit(self):
+        urls = [f'{self.base}/page/{i}' for i in range(6)]
+        started = time.monotonic()
+        list(self.engine(rate=20, burst=1).iter_pages(urls, lambda response: None))
+        self.assertGreaterEqual(time.monotonic() - started, 5 / 20)
+
+    def test_retry_then_errors(self):
+        pages = list(self.engine(max_retries=3).iter_pages(
+            [f'{self.base}/flaky', f'{self.base}/missing'], lambda response: response.status_code
+        ))
+        self.assertEqual(pages[0].data, 200)
+        self.assertEqual(self.server.requests.count('/flaky'), 3)
+        self.assertIsInstance(pages[1].error, requests.HTTPError)
+        self.assertEqual(self.server.requests.count('/missing'), 1)  # 404 : pas de nouvelle tentative
+
+    def test_stop_early(self):
+        urls = [f'{self.base}/page/{i}' for i in range(50)]
+        for page in self.engine(per_host_concurrency=2).iter_pages(urls, lambda response: None):
+            if page.index == 2:
+                break
+        self.assertLess(len(self.server.requests), 20)
+
+    def test_conditional_requests_skip_unchanged_pages(self):
+        cache = HttpCache(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, cache.directory, True)
+        engine = self.engine(cache=cache)
+        urls = [f'{self.base}/versioned/{i}' for i in range(4)]
+        parse = lambda response: response.text
+
+        first = list(engine.iter_pages(urls, parse, skip_unchanged=True))
+        self.assertFalse(any(page.unchanged for page in first))
+        # Pages non ingérées : retéléchargées sans requête conditionnelle
+        self.assertFalse(any(page.unchanged for page in engine.iter_pages(urls, parse, skip_unchanged=True)))
+        for page in first:
+            engine.mark_ingested(page.url, [])
+
+        self.server.versions['/versioned/2'] = 2
+        second = list(engine.iter_pages(urls, parse, skip_unchanged=True))
+        self.assertEqual([page.unchanged for page in second], [True, True, False, True])
+        self.assertEqual([page.data is None for page in second], [True, True, False, True])  # Pas d'analyse
+        self.assertIn('v2', second[2].data)
+        self.assertEqual(second[0].response.status_code, 304)
+        self.assertIn(b'/versioned/0 v1', second[0].response.content)  # Contenu relu depuis le cache
+
+    def test_changed_items(self):
+        cache = HttpCache(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, cache.directory, True)
+        engine = self.engine(cache=cache)
+        url = f'{self.base}/versioned/0'
+        engine.get(url)
+        items = [{'url': f'/p/{i}', 'price': 10} for i in range(3)]
+        self.assertEqual(engine.changed_items(url, items), items)
+        self.assertEqual(engine.changed_items(url, items), items)  # Ingestion non confirmée
+        engine.mark_ingested(url, items)
+        self.assertEqual(engine.changed_items(url, items), [])
+
+        items[1] = {'url': '/p/1', 'price': 12}
+        items.append({'url': '/p/3', 'price': 5})
+        self.assertEqual(engine.changed_items(url, items), [items[1], items[3]])
+        engine.mark_ingested(url, items)
+        self.assertEqual(engine.changed_items(url, items), [])
+        self.assertTrue(engine.get(url).unchanged)
+
+        engine.forget(url)
+        self.assertEqual(engine.get(url).unchanged, False)
+        self.assertEqual(engine.changed_items(url, items), items)
+
+
+class ScrapingJobTest(StubServerMixin, TestCase):
+    """Explorations en arrière-plan : point de reprise par page et reprise après arrêt"""
+
+    def session(self, **fields):
+        params = {'url': f'{self.base}/listing', 'source_site': 'pharma-shop.tn', 'max_pages': 10, 'profile': PHARMA_SHOP}
+        return ScrapingSession.objects.create(session_name='Test', source_sites=['pharma-shop.tn'], job_params=params, **fields)
+
+    def listing_requests(self):
+        return sorted(path for path in self.server.requests if path.startswith('/listing'))  # Pages téléchargées en parallèle
+
+    def test_checkpoint_after_each_page(self):
+        session = self.session()
+        run_scraping_job(session.id, engine=self.engine())
+        session.refresh_from_db()
+        self.assertEqual(session.status, 'COMPLETED')
+        self.assertEqual((session.total_pages, session.last_completed_page), (3, 3))
+        self.assertEqual((session.total_products_found, session.total_products_saved), (6, 6))
+        self.assertEqual(ScrapedProduct.objects.filter(source_site='pharma-shop.tn').count(), 6)
+        self.assertEqual(self.listing_requests(), ['/listing', '/listing?p=2', '/listing?p=3'])  # Page 1 lue une fois
+        self.assertEqual(session.logs.filter(log_type='SUCCESS').count(), 4)  # 3 pages + fin
+
+        payload = session_status_payload(session, after_log=session.logs.order_by('id')[1].id)
+        self.assertEqual(len(payload['logs']), session.logs.count() - 2)
+
+    def test_rescrape_with_http_cache_ingests_changes_only(self):
+        cache = HttpCache(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, cache.directory, True)
+        engine = self.engine(cache=cache)
+        run_scraping_job(self.session().id, engine=engine)
+
+        # Même site inchangé : pages 2 et 3 ni analysées ni ingérées, aucun produit de la page 1 réécrit
+        with mock.patch('scraped_products.jobs.ingest_products', wraps=ingest_products) as ingest:
+            session = self.session()
+            run_scraping_job(session.id, engine=engine)
+        ingest.assert_not_called()
+        session.refresh_from_db()
+        self.assertEqual((session.status, session.last_completed_page, session.total_products_found), ('COMPLETED', 3, 2))
+        self.assertEqual(session.logs.filter(message__endswith='inchangée depuis le dernier passage').count(), 2)
+
+        # Nouvelle page (pagination modifiée partout) : seuls ses produits sont ingérés
+        self.server.listing_pages = 4
+        with mock.patch('scraped_products.jobs.ingest_products', wraps=ingest_products) as ingest:
+            session = self.session()
+            run_scraping_job(session.id, engine=engine)
+        self.assertEqual([len(call.args[0]) for call in ingest.call_args_list], [2])
+        session.refresh_from_db()
+        self.assertEqual((session.total_pages, session.total_products_found, session.total_products_saved), (4, 8, 2))
+        self.assertEqual(ScrapedProduct.objects.filter(source_site='pharma-shop.tn').count(), 8)
+
+    def test_sync_scrape_saves_changed_products_only(self):
+        cache = HttpCache(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, cache.directory, True)
+        engine = self.engine(cache=cache)
+        url = f'{self.base}/listing'
+        engine.get(url)
+        products = [{'name': f'Crème {i}', 'brand': 'Marque', 'price': '10.000', 'url': f'{self.base}/p/{i}'} for i in range(2)]
+        with mock.patch('scraped_products.views.scraper_engine', engine):
+            self.assertEqual(save_page_products(url, products), 2)
+            self.assertEqual(save_page_products(url, products), 0)
+            products[1] = dict(products[1], price='12.000')
+            self.assertEqual(save_page_products(url, products), 1)
+        self.assertEqual(ScrapedProduct.objects.get(name='Crème 1').price, Decimal('12.000'))
+
+    def test_failed_page_logged_and_skipped(self):
+        self.server.missing.add('/listing?p=2')
+        session = self.session()
+        run_scraping_job(session.id, engine=self.engine())
+        session.refresh_from_db()
+        self.assertEqual((session.status, session.last_completed_page, session.total_products_found), ('COMPLETED', 3, 4))
+        self.assertTrue(session.logs.filter(log_type='WARNING', message__startswith='Page 2').exists())
+
+    def test_resume_from_last_completed_page(self):
+        # Serveur arrêté après la page 1 : session RUNNING, heartbeat ancien
+        session = self.session(status='RUNNING', total_pages=3, last_completed_page=1, total_products_found=2,
+                               heartbeat_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(list(abandoned_sessions()), [session])
+        run_scraping_job(session.id, engine=self.engine())
+        session.refresh_from_db()
+        self.assertEqual(self.listing_requests(), ['/listing?p=2', '/listing?p=3'])
+        self.assertEqual((session.status, session.last_completed_page, session.total_products_found), ('COMPLETED', 3, 6))
+
+    def test_active_session_not_claimed_twice(self):
+        session = self.session(status='RUNNING', heartbeat_at=timezone.now())
+        self.assertEqual(list(abandoned_sessions()), [])
+        run_scraping_job(session.id, engine=self.engine())
+        self.assertEqual(self.server.requests, [])
+        self.assertFalse(restart_scraping_job(session))
+
+    def test_slow_worker_loses_its_claim(self):
+        # Worker vivant mais lent, jugé abandonné : un second worker reprend la session
+        session = self.session()
+        slow = _claim(session.id)
+        ScrapingSession.objects.filter(id=session.id).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        current = _claim(session.id)
+        self.assertIsNotNone(current)
+        self.assertNotEqual(slow, current)
+
+        products = [{'name': 'Crème lente', 'brand': 'Marque', 'price': '10.000', 'url': f'{self.base}/p/lente'}]
+        with self.assertRaises(SessionReleased):
+            _checkpoint(session.id, slow, 1, products, 'pharma-shop.tn', [])
+        self.assertFalse(ScrapedProduct.objects.filter(name='Crème lente').exists())  # Transaction annulée
+
+        _checkpoint(session.id, current, 1, products, 'pharma-shop.tn', [])
+        session.refresh_from_db()
+        self.assertEqual((session.last_completed_page, session.total_products_saved), (1, 1))
+
+    def test_status_does_not_restart_abandoned_session(self):
+        session = self.session(status='RUNNING', heartbeat_at=timezone.now() - timedelta(hours=1))
+        with mock.patch('scraped_products.jobs.get_executor') as executor:
+            payload = self.client.get(f'/api/scraped-products/sessions/{session.id}/status/').json()
+            self.assertEqual((payload['status'], payload['abandoned']), ('RUNNING', True))
+            executor.return_value.submit.assert_not_called()
+
+            response = self.client.post(f'/api/scraped-products/sessions/{session.id}/resume/')
+        self.assertEqual(response.status_code, 202)
+        executor.return_value.submit.assert_called_once_with(run_scraping_job, session.id)
+
+    def test_failure_keeps_progress_and_restarts(self):
+        session = self.session()
+        engine = self.engine()
+        with mock.patch('scraped_products.jobs.ingest_products', side_effect=[
+            IngestResult(2, 0, 0, 0, []), RuntimeError('base indisponible')
+        ]), self.assertLogs('scraped_products.jobs', 'ERROR'):
+            run_scraping_job(session.id, engine=engine)
+        session.refresh_from_db()
+        self.assertEqual((session.status, session.last_completed_page), ('FAILED', 1))
+        self.assertEqual(session.error_message, 'base indisponible')
+
+        with mock.patch('scraped_products.jobs.get_executor') as executor:
+            self.assertTrue(restart_scraping_job(session))
+        executor.return_value.submit.assert_called_once_with(run_scraping_job, session.id)
+        run_scraping_job(session.id, engine=engine)
+        session.refresh_from_db()
+        self.assertEqual((session.status, session.last_completed_page, session.total_products_saved), ('COMPLETED', 3, 6))
+
+    def test_async_scrape_returns_immediately(self):
+        with mock.patch('scraped_products.jobs.get_executor') as executor:
+            response = self.client.post('/api/scraped-products/scrape-web/', {
+                'url': 'https://pharma-shop.tn/839-visage', 'source_site': 'pharma-shop.tn',
+                'max_pages': 5, 'auto_save': True, 'async': True,
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, 202)
+        session = ScrapingSession.objects.get(id=response.json()['session_id'])
+        self.assertEqual((session.status, session.job_params['profile'], session.job_params['max_pages']), ('PENDING', PHARMA_SHOP, 5))
+        executor.return_value.submit.assert_called_once_with(run_scraping_job, session.id)
+        self.assertEqual(self.client.get(response.json()['status_url']).json()['status'], 'PENDING')
@@ -6,10 +6,15 @@ urlpatterns = [
     path('products/', views.ScrapedProductListCreateView.as_view(), name='scraped-products-list'),
     path('products/<int:pk>/', views.ScrapedProductDetailView.as_view(), name='scraped-product-detail'),
     path('products/search/', views.search_products, name='search-products'),
+    path('products/search/autocomplete/', views.autocomplete_products, name='autocomplete-products'),
+    path('products/search/facets/', views.search_facets, name='search-facets'),
     
     # Sessions de scraping
     path('sessions/', views.ScrapingSessionListCreateView.as_view(), name='scraping-sessions-list'),
     path('sessions/<int:pk>/', views.ScrapingSessionDetailView.as_view(), name='scraping-session-detail'),
+    path('sessions/<int:pk>/status/', views.scraping_session_status, name='scraping-session-status'),
+    path('sessions/<int:pk>/events/', views.scraping_session_events, name='scraping-session-events'),
+    path('sessions/<int:pk>/resume/', views.resume_scraping_session, name='resume-scraping-session'),
     
     # Actions de scraping
     path('start-session/', views.start_scraping_session, name='start-scraping-session'),
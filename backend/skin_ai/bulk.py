@@ -0,0 +1,55 @@
+"""
+Écritures groupées en base
+==========================
+
+Sur SQLite, chaque create() hors transaction est une transaction (et un
+fsync) distincte qui prend le verrou d'écriture de toute la base. Les
+écritures multiples passent donc par bulk_save : un seul bulk_create par
+lot, le tout dans une transaction atomique.
+
+Avec unique_fields, l'écriture est un upsert idempotent
+(INSERT ... ON CONFLICT DO UPDATE) : relancer la même écriture met à jour
+les lignes existantes au lieu de créer des doublons. Les champs doivent
+être couverts par une contrainte d'unicité du modèle.
+
+Utilisé par les recommandations (ProductRecommender.save_recommendations,
+upsert sur analyse + produit), le chat (réponse de l'IA + date de la
+session) et le scraping (logs de session).
+"""
+from django.db import transaction
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def bulk_save(model, objects, unique_fields=None, update_fields=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Insérer (ou mettre à jour) des instances en une seule transaction
+
+    Les signaux post_save et les méthodes save() ne sont pas appelés.
+
+    Args:
+        model: Classe du modèle Django
+        objects: Instances non sauvegardées
+        unique_fields: Champs identifiant une ligne existante (upsert si fourni)
+        update_fields: Champs mis à jour en cas de conflit (tous les champs concrets par défaut)
+        batch_size: Nombre de lignes par requête INSERT
+
+    Returns:
+        Liste des instances écrites
+    """
+    objects = list(objects)
+    if not objects:
+        return []
+
+    options = {'batch_size': batch_size}
+    if unique_fields:
+        if update_fields is None:
+            update_fields = [
+                field.name for field in model._meta.concrete_fields
+                if not field.primary_key and field.name not in unique_fields
+                and not getattr(field, 'auto_now_add', False)
+            ]
+        options.update(update_conflicts=True, unique_fields=unique_fields, update_fields=update_fields)
+
+    with transaction.atomic():
+        return model.objects.bulk_create(objects, **options)
@@ -0,0 +1,154 @@
+"""
+Services chargés à la première utilisation
+==========================================
+
+Les singletons coûteux (modèles de détection, moteur de recommandation, GAN,
+intégration MLOps) sont exposés via LazyService : l'import du module ne charge
+rien, l'instance est créée au premier accès à un attribut. Les commandes
+manage.py (migrate, check, createsuperuser...) démarrent donc sans charger de
+modèles ni interroger la base.
+
+Mode préchargement (settings.MODEL_LOADING['PRELOAD']) : wsgi.py charge les
+services listés dans le processus maître avant le fork des workers Gunicorn
+(lancer Gunicorn avec --preload). Les poids restent partagés en lecture seule
+par copy-on-write ; gc.freeze() évite que le ramasse-miettes ne touche les
+pages partagées.
+
+Configuration (settings.MODEL_LOADING):
+    PRELOAD: Charger les services au démarrage du serveur WSGI
+    PRELOAD_SERVICES: Services à précharger ("module.attribut")
+"""
+import gc
+import importlib
+import logging
+import os
+import threading
+import time
+from django.conf import settings
+from django.utils.functional import LazyObject, empty
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_LOADING_CONFIG = {
+    'PRELOAD': False,
+    'PRELOAD_SERVICES': ['detection.services.skin_analysis_service'],
+}
+
+PROCESS_STARTED_AT = time.time()
+
+# Nom du service -> informations de chargement
+_registry = {}
+_registry_lock = threading.Lock()
+_startup = {}
+
+
+def get_model_loading_config():
+    """Configuration du chargement des modèles, complétée par les valeurs par défaut"""
+    config = dict(DEFAULT_MODEL_LOADING_CONFIG)
+    config.update(getattr(settings, 'MODEL_LOADING', {}))
+    return config
+
+
+def _max_rss_mb():
+    """Mémoire résidente maximale du processus (Mo), None si indisponible"""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+class LazyService(LazyObject):
+    """
+    Proxy vers un service créé au premier accès
+
+    Contrairement à SimpleLazyObject, l'initialisation est protégée par un
+    verrou (une seule création même si plusieurs threads arrivent en même
+    temps) et sa durée est enregistrée pour le rapport de démarrage.
+    """
+
+    def __init__(self, factory, name):
+        self.__dict__['_factory'] = factory
+        self.__dict__['_name'] = name
+        self.__dict__['_lock'] = threading.Lock()
+        super().__init__()
+        with _registry_lock:
+            _registry[name] = {'loaded': False, 'load_time': None, 'loaded_at': None, 'pid': None}
+
+    def _setup(self):
+        with self._lock:
+            if self._wrapped is not empty:
+                return
+            rss_before = _max_rss_mb()
+            started = time.perf_counter()
+            wrapped = self._factory()
+            load_time = time.perf_counter() - started
+            rss_after = _max_rss_mb()
+
+            with _registry_lock:
+                _registry[self._name] = {
+                    'loaded': True,
+                    'load_time': round(load_time, 3),
+                    'loaded_at': time.time(),
+                    'pid': os.getpid(),
+                    'max_rss_increase_mb': round(rss_after - rss_before, 1) if rss_after is not None else None,
+                }
+            logger.info(f"Service {self._name} chargé en {load_time:.2f}s (pid {os.getpid()})")
+            self._wrapped = wrapped
+
+    @property
+    def is_loaded(self):
+        return self._wrapped is not empty
+
+    def __repr__(self):
+        state = 'chargé' if self.is_loaded else 'non chargé'
+        return f"<LazyService {self._name} ({state})>"
+
+
+def record_startup(step, seconds):
+    """Enregistrer la durée d'une étape de démarrage (ex: django_setup)"""
+    _startup[step] = round(seconds, 3)
+
+
+def preload_services(names=None):
+    """
+    Charger les services dans le processus courant (maître Gunicorn avec --preload)
+
+    Args:
+        names: Chemins "module.attribut" (PRELOAD_SERVICES par défaut)
+    """
+    if names is None:
+        names = get_model_loading_config()['PRELOAD_SERVICES']
+
+    started = time.perf_counter()
+    for path in names:
+        module_name, _, attr = path.rpartition('.')
+        try:
+            service = getattr(importlib.import_module(module_name), attr)
+            if isinstance(service, LazyService):
+                service._setup()
+        except Exception as e:
+            logger.error(f"Préchargement de {path} impossible: {e}")
+
+    # Les objets chargés ne seront plus parcourus par le GC : les pages
+    # partagées avec les workers forkés ne sont pas recopiées
+    gc.freeze()
+    record_startup('preload', time.perf_counter() - started)
+    _startup['preloaded_in_pid'] = os.getpid()
+
+
+def get_startup_report():
+    """Rapport de démarrage : étapes, services chargés et mémoire du processus"""
+    with _registry_lock:
+        services = {name: dict(info) for name, info in _registry.items()}
+    return {
+        'pid': os.getpid(),
+        'uptime': round(time.time() - PROCESS_STARTED_AT, 1),
+        'preload_enabled': get_model_loading_config()['PRELOAD'],
+        'startup': dict(_startup),
+        'services': services,
+        'max_rss_mb': _max_rss_mb(),
+    }
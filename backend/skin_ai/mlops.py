@@ -0,0 +1,23 @@
+"""
+Intégration MLOps optionnelle
+=============================
+
+Le paquet mlops/ est à la racine du dépôt, à côté de backend/ : ce module
+l'ajoute une seule fois à sys.path et expose mlops_integration aux modules qui
+journalisent les prédictions (detection/jobs.py, detection/mlops_views.py).
+Sans le paquet ou ses dépendances, MLOPS_ENABLED vaut False.
+"""
+import sys
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent.parent
+
+try:
+    if str(REPO_DIR) not in sys.path:
+        # En fin de sys.path : les dossiers de la racine ne masquent pas les paquets installés
+        sys.path.append(str(REPO_DIR))
+    from mlops.integration.django_integration import mlops_integration
+    MLOPS_ENABLED = True
+except ImportError:
+    MLOPS_ENABLED = False
+    mlops_integration = None
@@ -0,0 +1,22 @@
+"""
+Renderers DRF partagés
+======================
+
+Utilisés par les flux server-sent events des analyses asynchrones
+(detection) et des explorations en arrière-plan (scraped_products).
+"""
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Renderer pour les réponses server-sent events (text/event-stream)"""
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = 'utf-8'
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, (bytes, str)):
+            return data
+        return json.dumps(data, cls=DjangoJSONEncoder)
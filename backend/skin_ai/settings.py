@@ -200,6 +200,96 @@ DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 ML_MODELS_PATH = os.path.join(BASE_DIR, '..', 'ml_models')
 DATASETS_PATH = os.path.join(BASE_DIR, '..', 'data')
 
+# Chargement des modèles : à la première utilisation par défaut (manage.py ne charge
+# rien). PRELOAD charge les services dans le maître Gunicorn (gunicorn --preload) pour
+# partager les poids entre workers par copy-on-write.
+MODEL_LOADING = {
+    'PRELOAD': False,
+    'PRELOAD_SERVICES': ['detection.services.skin_analysis_service'],
+}
+
+# Diagnostic de peau : YOLO et EfficientNet tournent en parallèle avant la fusion.
+# Limiter les threads torch de chaque étape pour ne pas sursouscrire les cœurs CPU
+# (YOLO_THREADS + EFFICIENTNET_THREADS <= nombre de cœurs ; None = valeur par défaut de torch)
+SKIN_DIAGNOSTIC = {
+    'PARALLEL_STAGES': True,
+    'YOLO_THREADS': None,
+    'EFFICIENTNET_THREADS': None,
+    # Runtime d'inférence : 'eager', 'onnx' ou 'torchscript' (artefacts produits par
+    # mlops/scripts/export_models.py ; retour automatique à eager si absents)
+    'RUNTIME': 'eager',
+    'QUANTIZED': False,  # Utiliser les artefacts quantifiés int8 (RUNTIME 'onnx' uniquement)
+    'MMAP_WEIGHTS': False,  # Poids EfficientNet mappés en mémoire (partagés entre processus)
+}
+
+# Broker d'inférence (micro-batching des analyses concurrentes)
+INFERENCE_BROKER = {
+    'ENABLED': True,
+    'MAX_BATCH_SIZE': 8,  # Images maximum par micro-batch
+    'MAX_WAIT_MS': 10,  # Attente maximale pour compléter un micro-batch
+    'TIMEOUT': 120,  # Attente maximale d'un résultat côté requête (secondes)
+}
+
+# Cache des résultats d'analyse (clé : contenu de l'image + version des modèles + infos utilisateur)
+ANALYSIS_RESULT_CACHE = {
+    'ENABLED': True,
+    'MAX_ENTRIES': 512,  # Taille du LRU en mémoire (par worker)
+    'DISK_DIR': None,  # Ex: os.path.join(BASE_DIR, 'cache', 'analyses') pour partager entre workers
+}
+
+# Analyses asynchrones (upload avec async=true)
+ANALYSIS_JOBS = {
+    'MAX_WORKERS': 2,  # Threads du pool d'analyse
+    'STALE_AFTER': 300,  # Analyse PENDING/RUNNING sans heartbeat depuis ce délai = interrompue (secondes)
+    'RESUME_ON_STARTUP': False,  # Relancer les analyses interrompues au démarrage (gunicorn.conf.py)
+    'EVENTS_POLL_INTERVAL': 0.5,  # Rafraîchissement du flux SSE (secondes)
+    'EVENTS_TIMEOUT': 300,  # Durée maximale d'un flux SSE (secondes)
+}
+
+# Index en mémoire des produits pour les recommandations
+RECOMMENDATION_INDEX = {
+    'REFRESH_INTERVAL': 300,  # Reconstruction complète périodique (secondes, None = jamais)
+    'SYNC_INTERVAL': 5,  # Lecture de l'empreinte partagée du catalogue (écritures des autres workers)
+}
+
+# Cache des recommandations par signature de profil, par worker (invalidé à chaque modification du catalogue)
+RECOMMENDATION_CACHE = {
+    'ENABLED': True,
+    'MAX_ENTRIES': 256,  # Signatures (type de peau x problèmes x confiance) en cache
+}
+
+# Index d'équivalence des produits entre sites (MinHash + LSH)
+PRODUCT_MATCHING = {
+    'THRESHOLD': 0.7,  # Similarité de Jaccard minimale entre deux noms
+    'NUM_PERM': 32,  # Permutations MinHash
+    'BANDS': 8,  # Bandes LSH
+    'REFRESH_INTERVAL': 300,  # Relecture des groupes créés par d'autres processus (secondes)
+}
+
+# Moteur de scraping concurrent (connexions keep-alive, limites par hôte)
+SCRAPER_ENGINE = {
+    'MAX_CONNECTIONS': 10,  # Pool de connexions HTTP partagé
+    'PER_HOST_CONCURRENCY': 4,  # Requêtes simultanées maximales par hôte
+    'RATE': 4.0,  # Requêtes par seconde par hôte
+    'BURST': 4,  # Requêtes autorisées d'affilée
+    'MAX_RETRIES': 3,  # Nouvelles tentatives (erreurs réseau, 429, 5xx)
+    'BACKOFF_BASE': 0.5,  # Premier délai de backoff (secondes, doublé à chaque essai)
+    'BACKOFF_MAX': 10.0,  # Délai de backoff maximal (secondes)
+    'TIMEOUT': 30,  # Timeout d'une requête (secondes)
+    'PREFETCH': 4,  # Pages téléchargées d'avance pendant l'analyse
+    'HTTP_CACHE_DIR': os.path.join(BASE_DIR, 'cache', 'scraper'),  # Cache HTTP : re-scrapes incrémentaux, pages et produits inchangés ignorés (None = désactivé)
+}
+
+# Explorations en arrière-plan (scrape-web avec async=true), reprises page par page
+SCRAPING_JOBS = {
+    'MAX_WORKERS': 2,  # Threads du pool d'exploration
+    'MAX_PAGES': 100,  # Pages maximales par exploration
+    'STALE_AFTER': 300,  # Session RUNNING sans heartbeat depuis ce délai = abandonnée (secondes)
+    'RESUME_ON_STARTUP': False,  # Reprendre les sessions abandonnées au démarrage (gunicorn.conf.py)
+    'EVENTS_POLL_INTERVAL': 1.0,  # Rafraîchissement du flux SSE (secondes)
+    'EVENTS_TIMEOUT': 1800,  # Durée maximale d'un flux SSE (secondes)
+}
+
 # Logging
 LOGGING = {
     'version': 1,
@@ -217,5 +307,11 @@ LOGGING = {
             'level': 'INFO',
             'propagate': True,
         },
+        # Progression des explorations (scrape_web_products, jobs, ingestion)
+        'scraped_products': {
+            'handlers': ['file'],
+            'level': 'INFO',
+            'propagate': True,
+        },
     },
 }
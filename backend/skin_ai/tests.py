@@ -0,0 +1,157 @@
+"""
+Plans d'exécution des requêtes fréquentes
+=========================================
+
+Les tables sont remplies de données synthétiques volumineuses, puis chaque
+requête chaude est exécutée telle que le code l'émet (capturée par
+CaptureQueriesContext) et son plan est vérifié avec EXPLAIN QUERY PLAN :
+l'index attendu est utilisé, sans parcours complet de la table ni tri
+temporaire lorsque l'index fournit déjà l'ordre.
+"""
+import unittest
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from chat_ai.models import ChatMessage, ChatSession
+from detection.models import SkinAnalysis
+from scraped_products.models import ScrapedProduct
+
+SEED_PRODUCTS = 20000
+SEED_USERS = 50
+SEED_ANALYSES_PER_USER = 40
+SEED_SESSIONS = 100
+SEED_MESSAGES_PER_SESSION = 50
+
+CATEGORIES = ['CLEANSER', 'MOISTURIZER', 'SERUM', 'SUNSCREEN', 'TREATMENT', 'MASK', 'TONER', 'EXFOLIANT']
+
+
+def query_plans(fn):
+    """Exécuter fn et retourner le plan (lignes EXPLAIN QUERY PLAN) de chaque requête émise"""
+    with CaptureQueriesContext(connection) as ctx:
+        fn()
+    plans = []
+    with connection.cursor() as cursor:
+        for query in ctx.captured_queries:
+            cursor.execute(f"EXPLAIN QUERY PLAN {query['sql']}")
+            plans.append([row[-1] for row in cursor.fetchall()])
+    return plans
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN spécifique à SQLite")
+class HotQueryPlanTest(TestCase):
+    """Les requêtes de dédoublonnage, de listes et d'historique utilisent un index"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        now = timezone.now()
+
+        ScrapedProduct.objects.bulk_create([
+            ScrapedProduct(
+                name=f'Produit {i}', brand=f'Marque {i % 300}', category=CATEGORIES[i % len(CATEGORIES)],
+                price=Decimal('10.00'), source_site=f'site{i % 12}.tn', url=f'https://site{i % 12}.tn/p/{i}',
+                is_active=i % 5 != 0
+            )
+            for i in range(SEED_PRODUCTS)
+        ], batch_size=1000)
+
+        users = User.objects.bulk_create([
+            User(username=f'user{i}', email=f'user{i}@example.com') for i in range(SEED_USERS)
+        ])
+        cls.user = users[0]
+        SkinAnalysis.objects.bulk_create([
+            SkinAnalysis(user=user, image='uploads/skin_analyses/test.jpg')
+            for user in users for _ in range(SEED_ANALYSES_PER_USER)
+        ], batch_size=1000)
+
+        sessions = ChatSession.objects.bulk_create([
+            ChatSession(user=users[i % SEED_USERS], session_id=f'session-{i}', title=f'Session {i}')
+            for i in range(SEED_SESSIONS)
+        ])
+        cls.session = sessions[0]
+        ChatMessage.objects.bulk_create([
+            ChatMessage(session=session, role='user', content='Bonjour', timestamp=now + timedelta(seconds=i))
+            for session in sessions for i in range(SEED_MESSAGES_PER_SESSION)
+        ], batch_size=1000)
+
+        # Statistiques de l'optimiseur, comme sur une base en production
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def assertUsesIndex(self, fn, index, ordered=True):
+        """Toutes les requêtes émises par fn passent par l'index (et sans tri temporaire si ordered)"""
+        plans = query_plans(fn)
+        self.assertTrue(plans, "Aucune requête exécutée")
+        for plan in plans:
+            text = '\n'.join(plan)
+            self.assertTrue(any(index in line for line in plan), f"Index {index} non utilisé:\n{text}")
+            self.assertFalse(
+                any(line.startswith('SCAN') and 'INDEX' not in line for line in plan),
+                f"Parcours complet de table:\n{text}"
+            )
+            if ordered:
+                self.assertNotIn('TEMP B-TREE', text, f"Tri temporaire:\n{text}")
+
+    # ------------------------------------------------------------------
+    # Dédoublonnage à l'ingestion (save_scraped_products, scrape_pharma_shop)
+    # ------------------------------------------------------------------
+
+    def test_dedup_by_url(self):
+        self.assertUsesIndex(
+            lambda: ScrapedProduct.objects.filter(url='https://site3.tn/p/1503').first(),
+            'scraped_url_idx', ordered=False
+        )
+
+    def test_dedup_by_name_brand_source(self):
+        self.assertUsesIndex(
+            lambda: ScrapedProduct.objects.filter(name='Produit 1503', brand='Marque 3', source_site='site3.tn').first(),
+            'scraped_dedup_idx', ordered=False
+        )
+
+    # ------------------------------------------------------------------
+    # Listes et statistiques des produits
+    # ------------------------------------------------------------------
+
+    def test_recent_active_products(self):
+        self.assertUsesIndex(
+            lambda: list(ScrapedProduct.objects.filter(is_active=True).order_by('-created_at')[:10]),
+            'scraped_created_idx'
+        )
+
+    def test_catalogue_keyset_order(self):
+        self.assertUsesIndex(
+            lambda: list(ScrapedProduct.objects.filter(is_active=True).order_by('-created_at', '-id')[:50]),
+            'scraped_created_idx'
+        )
+
+    def test_products_by_category(self):
+        self.assertUsesIndex(
+            lambda: list(ScrapedProduct.objects.filter(is_active=True, category='SERUM').order_by('-created_at')[:50]),
+            'scraped_category_idx'
+        )
+
+    def test_source_site_counts(self):
+        self.assertUsesIndex(
+            lambda: ScrapedProduct.objects.filter(source_site='site3.tn', is_active=True).count(),
+            'scraped_source_idx', ordered=False
+        )
+
+    # ------------------------------------------------------------------
+    # Historiques
+    # ------------------------------------------------------------------
+
+    def test_user_analysis_history(self):
+        self.assertUsesIndex(
+            lambda: list(SkinAnalysis.objects.filter(user=self.user).order_by('-analysis_date')),
+            'skin_analysis_user_date_idx'
+        )
+
+    def test_chat_session_history(self):
+        self.assertUsesIndex(
+            lambda: list(ChatMessage.objects.filter(session=self.session).order_by('timestamp')[:50]),
+            'chat_message_session_ts_idx'
+        )
@@ -2,12 +2,21 @@
 WSGI config for skin_ai project.
 """
 import os
+import time
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'skin_ai.settings')
 
+_started = time.perf_counter()
 application = get_wsgi_application()
 
+from skin_ai.lazy_services import get_model_loading_config, preload_services, record_startup  # noqa: E402
 
+record_startup('django_setup', time.perf_counter() - _started)
 
+# Précharger les modèles avant le fork des workers (gunicorn --preload)
+if get_model_loading_config()['PRELOAD']:
+    preload_services()
 
+# La reprise des explorations et analyses interrompues est faite une seule fois
+# par démarrage, dans le premier worker Gunicorn (voir gunicorn.conf.py)
@@ -36,13 +36,15 @@ import {
 import { apiService } from '../services/api';
 import { realScrapingService } from '../services/realScrapingService';
 import { webScrapingService } from '../services/webScrapingService';
-import { Product } from '../types';
+import { CatalogueParams, CatalogueStats, Product } from '../types';
 import ProductOrderModal from '../components/ProductOrderModal';
 import CartModal from '../components/CartModal';
 import AvatarCircleAI from '../components/AvatarCircleAI';
 import ChatAI from '../components/ChatAI';
 import { cartService } from '../services/cartService';
 
+const CATALOGUE_PAGE_SIZE = 100;  // Produits chargés par page du catalogue
+
 const ProductsPage: React.FC = () => {
   const navigate = useNavigate();
   const [products, setProducts] = useState<Product[]>([]);
@@ -73,14 +75,21 @@ const ProductsPage: React.FC = () => {
   const [scrapedProducts, setScrapedProducts] = useState<Product[]>([]);
   const [scrapingProgress, setScrapingProgress] = useState({ current: 0, total: 0 });
   const [autoSave, setAutoSave] = useState(true);  // Sauvegarder automatiquement par défaut
-  const [productsStats, setProductsStats] = useState<any>(null);  // Statistiques des produits
+  const [productsStats, setProductsStats] = useState<CatalogueStats | null>(null);  // Statistiques des produits
+  const [nextCursor, setNextCursor] = useState<string | null>(null);  // Page suivante du catalogue
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [appliedSearch, setAppliedSearch] = useState('');  // Recherche envoyée au serveur (validée par Entrée ou le bouton)
 
   useEffect(() => {
-    loadProducts();
     updateCartCount();
     loadUserProfile();
   }, []);
 
+  // Les filtres sont appliqués par le serveur : tout changement recharge la première page
+  useEffect(() => {
+    loadProducts();
+  }, [appliedSearch, categoryFilter, skinTypeFilter]);
+
   const loadUserProfile = async () => {
     try {
       const response = await apiService.getProfile();
@@ -96,43 +105,25 @@ const ProductsPage: React.FC = () => {
     setCartItemsCount(cart.totalItems);
   };
 
+  // Filtres du catalogue, appliqués par le serveur sur toutes les pages
+  const catalogueFilters = (): CatalogueParams => ({
+    page_size: CATALOGUE_PAGE_SIZE,
+    q: appliedSearch || undefined,
+    category: categoryFilter || undefined,
+    skin_type: skinTypeFilter || undefined,
+  });
+
+  // Première page du catalogue (pagination par curseur, les pages suivantes via loadMoreProducts)
   const loadProducts = async () => {
     try {
       setLoading(true);
       setError(null);
+      setNextCursor(null);
       
-      console.log('📦 Chargement des produits de la base de données...');
-      const response = await apiService.getProducts();
-      
-      // Gérer le nouveau format avec stats ou l'ancien format (liste directe)
-      const responseData = response.data as any;
-      
-      if (responseData.products && Array.isArray(responseData.products)) {
-        // Nouveau format avec stats
-        setProducts(responseData.products);
-        setProductsStats(responseData.stats);
-        console.log('📊 Statistiques des produits:', responseData.stats);
-        if (responseData.stats) {
-          console.log(`   - Total: ${responseData.stats.total}`);
-          console.log(`   - De la base: ${responseData.stats.from_database}`);
-          console.log(`   - Scrapés actifs: ${responseData.stats.scraped_active}`);
-          console.log(`   - Scrapés total: ${responseData.stats.scraped_total}`);
-          console.log(`   - Scrapés inactifs: ${responseData.stats.scraped_inactive}`);
-          
-          // Afficher un message si le nombre de produits scrapés ne correspond pas
-          if (responseData.stats.scraped_total > 0 && responseData.stats.scraped_active < responseData.stats.scraped_total) {
-            console.warn(`⚠️ Attention: ${responseData.stats.scraped_inactive} produits scrapés sont inactifs (is_active=False)`);
-          }
-        }
-      } else if (Array.isArray(responseData)) {
-        // Ancien format (liste directe)
-        setProducts(responseData);
-        setProductsStats(null);
-        console.log(`📦 ${responseData.length} produits chargés depuis la base de données`);
-      } else {
-        console.error('Format de réponse inattendu:', responseData);
-        setError('Format de réponse inattendu du serveur');
-      }
+      const { data } = await apiService.getCatalogue(catalogueFilters());
+      setProducts(data.results);
+      setNextCursor(data.next_cursor);
+      setProductsStats(data.stats ?? null);
     } catch (err: any) {
       console.error('Erreur lors du chargement des produits:', err);
       setError('Erreur lors du chargement des produits');
@@ -141,6 +132,23 @@ const ProductsPage: React.FC = () => {
     }
   };
 
+  const loadMoreProducts = async () => {
+    if (!nextCursor) {
+      return;
+    }
+    try {
+      setLoadingMore(true);
+      const { data } = await apiService.getCatalogue({ ...catalogueFilters(), cursor: nextCursor });
+      setProducts(previous => [...previous, ...data.results]);
+      setNextCursor(data.next_cursor);
+    } catch (err: any) {
+      console.error('Erreur lors du chargement des produits:', err);
+      setError('Erreur lors du chargement des produits');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const getCategoryLabel = (category: string) => {
     const labels: { [key: string]: string } = {
       'CLEANSER': 'Nettoyant',
@@ -204,10 +212,13 @@ const ProductsPage: React.FC = () => {
         search_query: scrapingQuery || undefined,
         source_site: scrapingSource,
         max_pages: scrapingMaxPages,
-        auto_save: autoSave,  // Sauvegarder automatiquement
+        auto_save: autoSave,  // Sauvegarder automatiquement (exploration en arrière-plan)
+      }, (progress) => {
+        setSnackbarMessage(`⏳ Page ${progress.last_completed_page}/${progress.total_pages || '?'} : ${progress.total_products_saved.toLocaleString()} produits sauvegardés`);
+        setSnackbarOpen(true);
       });
 
-      if (response.success && response.products.length > 0) {
+      if (response.success && (response.products.length > 0 || response.total_saved !== undefined)) {
         setScrapedProducts(response.products);
         // Ne pas ajouter directement aux produits, attendre le rechargement depuis la base de données
         
@@ -306,38 +317,22 @@ const ProductsPage: React.FC = () => {
     setSnackbarOpen(false);
   };
 
-  // Fonction de recherche
+  // Fonction de recherche : la recherche porte sur tout le catalogue, côté serveur
   const handleSearch = async () => {
-    if (!searchTerm.trim()) {
-      // Si la recherche est vide, recharger tous les produits
+    const query = searchTerm.trim();
+    if (query === appliedSearch) {
+      // Même recherche : recharger la première page
       await loadProducts();
       return;
     }
+    setAppliedSearch(query);
+  };
 
-    try {
-      setLoading(true);
-      setError(null);
-      
-      // Recherche dans la base de données locale (pas besoin de recharger depuis le serveur)
-      // Les produits sont déjà chargés dans le state 'products'
-      const filteredProducts = products.filter(product => {
-        const searchLower = searchTerm.toLowerCase();
-        return (
-          product.name.toLowerCase().includes(searchLower) ||
-          product.brand.toLowerCase().includes(searchLower) ||
-          (product.description && product.description.toLowerCase().includes(searchLower))
-        );
-      });
-      
-      // Ne pas modifier 'products', juste utiliser filteredProducts pour l'affichage
-      // Le filtrage se fait déjà dans le render avec filteredProducts
-      console.log(`🔍 Recherche "${searchTerm}": ${filteredProducts.length} résultat(s) trouvé(s)`);
-    } catch (err: any) {
-      console.error('Erreur lors de la recherche:', err);
-      setError('Erreur lors de la recherche');
-    } finally {
-      setLoading(false);
-    }
+  const resetFilters = () => {
+    setSearchTerm('');
+    setAppliedSearch('');
+    setCategoryFilter('');
+    setSkinTypeFilter('');
   };
 
 
@@ -373,23 +368,7 @@ const ProductsPage: React.FC = () => {
   };
 
 
-  // Filtrer les produits selon les critères de recherche
-  const filteredProducts = products.filter(product => {
-    // Filtre de recherche textuelle (ne s'applique que si searchTerm n'est pas vide)
-    const matchesSearch = !searchTerm.trim() || 
-      (product.name && product.name.toLowerCase().includes(searchTerm.toLowerCase())) ||
-      (product.brand && product.brand.toLowerCase().includes(searchTerm.toLowerCase())) ||
-      (product.description && product.description.toLowerCase().includes(searchTerm.toLowerCase()));
-    
-    // Filtre de catégorie (ne s'applique que si categoryFilter n'est pas vide)
-    const matchesCategory = !categoryFilter || product.category === categoryFilter;
-    
-    // Filtre de type de peau (ne s'applique que si skinTypeFilter n'est pas vide)
-    const matchesSkinType = !skinTypeFilter || 
-      (product.target_skin_types && Array.isArray(product.target_skin_types) && product.target_skin_types.includes(skinTypeFilter));
-    
-    return matchesSearch && matchesCategory && matchesSkinType;
-  });
+  const hasActiveFilters = Boolean(appliedSearch || categoryFilter || skinTypeFilter);
 
   if (loading) {
     return (
@@ -497,7 +476,7 @@ const ProductsPage: React.FC = () => {
               </Typography>
               <Box sx={{ display: 'flex', flexDirection: 'column', gap: 0.5 }}>
                 <Typography variant="body2">
-                  • <strong>Total produits affichés :</strong> {productsStats.total.toLocaleString()}
+                  • <strong>Total produits au catalogue :</strong> {productsStats.total.toLocaleString()}
                 </Typography>
                 {productsStats.from_database > 0 && (
                   <Typography variant="body2">
@@ -729,7 +708,7 @@ const ProductsPage: React.FC = () => {
           {/* Produits */}
           <Box sx={{ mb: 2, display: 'flex', justifyContent: 'space-between', alignItems: 'center', flexWrap: 'wrap', gap: 2 }}>
             <Typography variant="h6" gutterBottom>
-              📦 Produits ({filteredProducts.length.toLocaleString()} / {products.length.toLocaleString()} total)
+              📦 Produits ({products.length.toLocaleString()} chargés{hasActiveFilters ? ' correspondant aux filtres' : ''}{productsStats ? ` • ${productsStats.total.toLocaleString()} au catalogue` : ''})
             </Typography>
             {products.length > 0 && (
               <Box sx={{ display: 'flex', gap: 2, alignItems: 'center', flexWrap: 'wrap' }}>
@@ -750,17 +729,13 @@ const ProductsPage: React.FC = () => {
           </Box>
           
           {/* Message si des filtres sont actifs */}
-          {(searchTerm.trim() || categoryFilter || skinTypeFilter) && filteredProducts.length < products.length && (
+          {hasActiveFilters && (
             <Alert severity="info" sx={{ mb: 2 }}>
               <Typography variant="body2">
-                {products.length - filteredProducts.length} produit(s) masqué(s) par les filtres actifs.
+                Seuls les produits correspondant aux filtres actifs sont affichés.
                 <Button 
                   size="small" 
-                  onClick={() => {
-                    setSearchTerm('');
-                    setCategoryFilter('');
-                    setSkinTypeFilter('');
-                  }}
+                  onClick={resetFilters}
                   sx={{ ml: 1 }}
                 >
                   Réinitialiser les filtres
@@ -770,18 +745,18 @@ const ProductsPage: React.FC = () => {
           )}
           
           {/* Message si aucun produit n'est affiché */}
-          {products.length === 0 && !loading && (
+          {products.length === 0 && !loading && !hasActiveFilters && (
             <Alert severity="warning" sx={{ mb: 2 }}>
               <Typography variant="body2">
                 Aucun produit trouvé dans la base de données. 
-                {productsStats?.scraped_inactive > 0 && (
+                {productsStats && productsStats.scraped_inactive > 0 && (
                   <span> Il y a {productsStats.scraped_inactive} produit(s) inactif(s) dans la base de données.</span>
                 )}
               </Typography>
             </Alert>
           )}
           
-          {filteredProducts.length === 0 ? (
+          {products.length === 0 ? (
             <Box sx={{ textAlign: 'center', py: 8 }}>
               <CartIcon sx={{ fontSize: 64, color: 'text.secondary', mb: 2 }} />
               <Typography variant="h6" color="text.secondary" gutterBottom>
@@ -793,7 +768,7 @@ const ProductsPage: React.FC = () => {
             </Box>
           ) : (
             <Box sx={{ display: 'flex', flexWrap: 'wrap', gap: 3 }}>
-              {filteredProducts.map((product) => (
+              {products.map((product) => (
                 <Box sx={{ flex: { xs: '1 1 100%', sm: '1 1 calc(50% - 12px)', md: '1 1 calc(33.333% - 16px)' }, minWidth: 0 }} key={product.id}>
                   <Card sx={{ height: '100%', display: 'flex', flexDirection: 'column' }}>
                     {product.image && (
@@ -942,6 +917,20 @@ const ProductsPage: React.FC = () => {
             </Box>
           )}
 
+          {/* Page suivante du catalogue (curseur) */}
+          {nextCursor && (
+            <Box sx={{ textAlign: 'center', mt: 3 }}>
+              <Button
+                variant="outlined"
+                onClick={loadMoreProducts}
+                disabled={loadingMore}
+                startIcon={loadingMore ? <CircularProgress size={16} /> : undefined}
+              >
+                Charger plus de produits
+              </Button>
+            </Box>
+          )}
+
           {/* Modal de commande */}
           <ProductOrderModal
             open={orderModalOpen}
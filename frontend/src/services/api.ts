@@ -1,5 +1,5 @@
 import axios, { AxiosInstance, AxiosResponse } from 'axios';
-import { AuthTokens, User, SkinAnalysis, Product, Recommendation, GANSimulation } from '../types';
+import { AuthTokens, User, SkinAnalysis, Product, Recommendation, GANSimulation, CataloguePage, CatalogueParams } from '../types';
 
 class ApiService {
   private api: AxiosInstance;
@@ -214,6 +214,11 @@ class ApiService {
     return this.api.get('/products/');
   }
 
+  // Catalogue paginé par curseur : passer next_cursor de la page précédente
+  async getCatalogue(params: CatalogueParams = {}): Promise<AxiosResponse<CataloguePage>> {
+    return this.api.get('/products/catalogue/', { params });
+  }
+
   async getProduct(productId: number): Promise<AxiosResponse<Product>> {
     return this.api.get(`/products/${productId}/`);
   }
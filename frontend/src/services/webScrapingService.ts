@@ -9,6 +9,7 @@ export interface ScrapeWebRequest {
   source_site?: string;
   max_pages?: number;
   auto_save?: boolean;  // Sauvegarder automatiquement dans la base de données
+  async?: boolean;  // Exploration en arrière-plan (activée avec auto_save)
 }
 
 export interface ScrapeWebResponse {
@@ -19,8 +20,31 @@ export interface ScrapeWebResponse {
   url?: string;
   error?: string;
   message?: string;  // Message de confirmation
+  session_id?: number;  // Session de l'exploration en arrière-plan
 }
 
+export interface ScrapingLogEntry {
+  id: number;
+  log_type: 'INFO' | 'WARNING' | 'ERROR' | 'SUCCESS';
+  message: string;
+  created_at: string;
+}
+
+export interface ScrapingSessionStatus {
+  id: number;
+  status: 'PENDING' | 'RUNNING' | 'COMPLETED' | 'FAILED';
+  total_pages: number;
+  last_completed_page: number;
+  total_products_found: number;
+  total_products_saved: number;
+  total_products_skipped: number;
+  error_message: string;
+  abandoned: boolean;  // Aucun worker actif : à relancer par POST .../resume/
+  logs: ScrapingLogEntry[];  // Nouveaux logs depuis le dernier polling
+}
+
+const STATUS_POLL_INTERVAL = 2000;  // Polling de l'état d'une exploration (ms)
+
 class WebScrapingService {
   private api = axios.create({
     baseURL: BASE_URL,
@@ -30,12 +54,20 @@ class WebScrapingService {
     },
   });
 
-  async scrapeWebProducts(request: ScrapeWebRequest): Promise<ScrapeWebResponse> {
+  async scrapeWebProducts(
+    request: ScrapeWebRequest,
+    onProgress?: (status: ScrapingSessionStatus) => void
+  ): Promise<ScrapeWebResponse> {
     try {
+      // Avec auto_save, l'exploration tourne en arrière-plan : la requête retourne
+      // immédiatement (202) et la progression est suivie sur la session
       const response = await this.api.post<ScrapeWebResponse>(
         '/scraped-products/scrape-web/',
-        request
+        { ...request, async: request.async ?? !!request.auto_save }
       );
+      if (response.status === 202 && response.data.session_id) {
+        return await this.waitForSession(response.data.session_id, request, onProgress);
+      }
       return response.data;
     } catch (error: any) {
       console.error('Erreur lors du scraping web:', error);
@@ -61,6 +93,46 @@ class WebScrapingService {
     }
   }
 
+  private async waitForSession(
+    sessionId: number,
+    request: ScrapeWebRequest,
+    onProgress?: (status: ScrapingSessionStatus) => void
+  ): Promise<ScrapeWebResponse> {
+    let afterLog = 0;
+    for (;;) {
+      await new Promise(resolve => setTimeout(resolve, STATUS_POLL_INTERVAL));
+      const { data: status } = await this.api.get<ScrapingSessionStatus>(
+        `/scraped-products/sessions/${sessionId}/status/`,
+        { params: { after_log: afterLog } }
+      );
+      if (status.logs.length > 0) {
+        afterLog = status.logs[status.logs.length - 1].id;
+      }
+      onProgress?.(status);
+
+      if (status.abandoned) {
+        // Serveur redémarré pendant l'exploration : reprise à la dernière page enregistrée
+        // (409 si un autre client l'a déjà relancée)
+        await this.api.post(`/scraped-products/sessions/${sessionId}/resume/`).catch(() => undefined);
+        continue;
+      }
+
+      if (status.status === 'COMPLETED' || status.status === 'FAILED') {
+        return {
+          success: status.status === 'COMPLETED' && status.total_products_found > 0,
+          products: [],
+          total_found: status.total_products_found,
+          total_saved: status.total_products_saved,
+          url: request.url || '',
+          session_id: sessionId,
+          error: status.status === 'FAILED'
+            ? status.error_message
+            : (status.total_products_found === 0 ? 'Aucun produit trouvé. Vérifiez que l\'URL est correcte et que le site est accessible.' : undefined),
+        };
+      }
+    }
+  }
+
   async saveScrapedProducts(products: Product[]): Promise<any> {
     try {
       console.log(`📤 Envoi de ${products.length} produits au backend pour sauvegarde...`);
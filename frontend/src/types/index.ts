@@ -80,6 +80,35 @@ export interface Product {
   is_active?: boolean;
 }
 
+export interface CatalogueStats {
+  total: number;
+  from_database: number;
+  scraped_active: number;
+  scraped_total: number;
+  scraped_inactive: number;
+}
+
+// Page du catalogue unifié (GET /products/catalogue/), paginé par curseur
+export interface CataloguePage {
+  results: Product[];
+  next_cursor: string | null;
+  page_size: number;
+  stats?: CatalogueStats;  // Première page uniquement
+}
+
+export interface CatalogueParams {
+  cursor?: string;
+  page_size?: number;
+  source?: 'database' | 'scraped';
+  category?: string;
+  brand?: string;
+  source_site?: string;
+  min_price?: string;
+  max_price?: string;
+  q?: string;
+  skin_type?: string;
+}
+
 export interface Recommendation {
   id: number;
   product: Product;
@@ -21,6 +21,21 @@ XGBOOST_MODEL_PATH = MODELS_BASE_PATH / 'context_correction_xgb.joblib'
 PREPROC_MODEL_PATH = MODELS_BASE_PATH / 'Modelefusion_preproc.joblib'
 LABEL_ENC_MODEL_PATH = MODELS_BASE_PATH / 'context_correction_label_encoder.joblib'
 
+# Artefacts exportés pour l'inférence CPU optimisée (ONNX Runtime / TorchScript)
+EXPORTED_MODELS_PATH = MODELS_BASE_PATH / 'exported'
+EXPORTED_MODEL_FILES = {
+    'efficientnet': {'onnx': 'efficientnet.onnx', 'torchscript': 'efficientnet.torchscript.pt'},
+    'yolo': {'onnx': 'yolo.onnx', 'torchscript': 'yolo.torchscript'},
+}
+
+# Tolérances du contrôle de parité exporté vs eager
+EXPORT_PARITY_CONFIG = {
+    'max_abs_diff': 1e-3,  # Écart maximal des probabilités (float32)
+    'max_abs_diff_int8': 5e-2,  # Écart maximal des probabilités (int8 dynamique)
+    'min_top1_agreement': 1.0,  # Part des prédictions identiques (float32)
+    'min_top1_agreement_int8': 0.98,  # Part des prédictions identiques (int8 dynamique)
+}
+
 # Configuration du training
 TRAINING_CONFIG = {
     'batch_size': 32,
@@ -1,20 +1,95 @@
 """
 Chargement des modèles depuis le registry pour la production
 """
+import json
 import logging
-from typing import Optional, Dict
+import shutil
+from datetime import datetime
+from typing import Optional, Dict, List
 from pathlib import Path
+import cv2
+import numpy as np
 import torch
 import joblib
 from ultralytics import YOLO
 from mlops.deployment.model_registry import ModelRegistry
 from mlops.config.mlflow_config import (
     YOLO_MODEL_PATH, EFFICIENTNET_MODEL_PATH, XGBOOST_MODEL_PATH,
-    PREPROC_MODEL_PATH, LABEL_ENC_MODEL_PATH
+    PREPROC_MODEL_PATH, LABEL_ENC_MODEL_PATH,
+    EXPORTED_MODELS_PATH, EXPORTED_MODEL_FILES, EXPORT_PARITY_CONFIG
 )
 
 logger = logging.getLogger(__name__)
 
+EXPORT_FORMATS = ('onnx', 'torchscript')
+
+
+def get_exported_model_path(model_name: str, export_format: str, quantized: bool = False,
+                            output_dir: Optional[Path] = None) -> Path:
+    """
+    Chemin d'un artefact exporté (ex: exported/efficientnet.int8.onnx)
+    
+    Args:
+        model_name: 'efficientnet' ou 'yolo'
+        export_format: 'onnx' ou 'torchscript'
+        quantized: Variante quantifiée int8 dynamique
+        output_dir: Dossier des artefacts (EXPORTED_MODELS_PATH par défaut)
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Format d'export non supporté: {export_format}")
+    filename = EXPORTED_MODEL_FILES[model_name][export_format]
+    if quantized:
+        stem, _, ext = filename.partition('.')
+        filename = f"{stem}.int8.{ext}"
+    return Path(output_dir or EXPORTED_MODELS_PATH) / filename
+
+
+def check_export_options(export_format: str, quantize: bool = False):
+    """
+    Vérifier une combinaison format / quantification
+    
+    La quantification int8 dynamique n'est proposée que pour ONNX (ONNX
+    Runtime quantifie aussi les convolutions). En TorchScript,
+    quantize_dynamic ne couvre que les couches Linear : l'artefact resterait
+    float32 pour l'essentiel tout en étant nommé *.int8.*.
+    
+    Raises:
+        ValueError si le format est inconnu ou si quantize est demandé hors ONNX
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Format d'export non supporté: {export_format}")
+    if quantize and export_format != 'onnx':
+        raise ValueError("La quantification int8 dynamique n'est disponible que pour l'export ONNX")
+
+
+def efficientnet_inputs(sample_images: List) -> torch.Tensor:
+    """
+    Prétraiter des images comme SkinDiagnostic.transform_eff pour EfficientNet
+    
+    Args:
+        sample_images: Chemins ou tableaux BGR (convention OpenCV, comme pour YOLO)
+    
+    Returns:
+        Tenseur normalisé (N, 3, 224, 224)
+    """
+    from PIL import Image
+    import torchvision.transforms as transforms
+    
+    transform = transforms.Compose([
+        transforms.Resize((224, 224)),
+        transforms.ToTensor(),
+        transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
+    ])
+    tensors = []
+    for image in sample_images:
+        if isinstance(image, np.ndarray):
+            img = Image.fromarray(np.ascontiguousarray(image[..., ::-1]))
+        else:
+            img = Image.open(image).convert('RGB')
+        tensors.append(transform(img))
+    return torch.stack(tensors)
+
+
 class ModelLoader:
     """Charger les modèles pour l'inférence"""
     
@@ -150,3 +225,265 @@ class ModelLoader:
             'label_encoder': self.load_label_encoder(),
         }
 
+
+    # ------------------------------------------------------------------
+    # Export pour l'inférence CPU optimisée
+    # ------------------------------------------------------------------
+    
+    def export_efficientnet(self, export_format: str = 'onnx', quantize: bool = False,
+                            output_dir: Optional[Path] = None, opset: int = 17) -> Optional[Path]:
+        """
+        Exporter EfficientNet en ONNX ou TorchScript
+        
+        Args:
+            export_format: 'onnx' ou 'torchscript'
+            quantize: Quantification int8 dynamique (ONNX uniquement, voir check_export_options)
+            output_dir: Dossier des artefacts (EXPORTED_MODELS_PATH par défaut)
+            opset: Version d'opset ONNX
+        
+        Returns:
+            Chemin de l'artefact exporté ou None en cas d'erreur
+        """
+        try:
+            check_export_options(export_format, quantize)
+            model = self.models.get('efficientnet') or self.load_efficientnet_model()
+            if model is None:
+                return None
+            model = model.cpu().eval()
+            
+            output_path = get_exported_model_path('efficientnet', export_format, quantize, output_dir)
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            dummy = torch.randn(1, 3, 224, 224)
+            
+            if export_format == 'onnx':
+                fp32_path = get_exported_model_path('efficientnet', 'onnx', False, output_dir)
+                torch.onnx.export(
+                    model, dummy, str(fp32_path),
+                    input_names=['input'], output_names=['logits'],
+                    dynamic_axes={'input': {0: 'batch'}, 'logits': {0: 'batch'}},
+                    opset_version=opset
+                )
+                if quantize:
+                    self._quantize_onnx(fp32_path, output_path)
+            else:
+                with torch.no_grad():
+                    scripted = torch.jit.trace(model, dummy)
+                torch.jit.freeze(scripted.eval()).save(str(output_path))
+            
+            logger.info(f"EfficientNet exported to {output_path}")
+            return output_path
+        except Exception as e:
+            logger.error(f"Error exporting EfficientNet model: {e}")
+            return None
+    
+    def export_yolo(self, export_format: str = 'onnx', quantize: bool = False,
+                    output_dir: Optional[Path] = None, imgsz: int = 640) -> Optional[Path]:
+        """
+        Exporter YOLO en ONNX ou TorchScript via l'exporteur Ultralytics
+        
+        Le modèle exporté se recharge directement avec YOLO(chemin), le pré- et
+        post-traitement Ultralytics restent donc identiques. L'export ONNX a un
+        axe batch dynamique ; l'export TorchScript est tracé sur une image mais
+        Ultralytics le sert aussi par lots (vérifié par check_yolo_parity).
+        
+        Args:
+            export_format: 'onnx' ou 'torchscript'
+            quantize: Quantification int8 dynamique (ONNX uniquement, voir check_export_options)
+            output_dir: Dossier des artefacts (EXPORTED_MODELS_PATH par défaut)
+            imgsz: Taille d'entrée de l'export
+        
+        Returns:
+            Chemin de l'artefact exporté ou None en cas d'erreur
+        """
+        try:
+            check_export_options(export_format, quantize)
+            
+            model = self.models.get('yolo') or self.load_yolo_model()
+            if model is None:
+                return None
+            
+            # L'exporteur Ultralytics écrit l'artefact à côté des poids
+            exported = Path(model.export(
+                format=export_format, imgsz=imgsz, dynamic=export_format == 'onnx',
+                device='cpu', verbose=False
+            ))
+            
+            fp32_path = get_exported_model_path('yolo', export_format, False, output_dir)
+            fp32_path.parent.mkdir(parents=True, exist_ok=True)
+            shutil.move(str(exported), str(fp32_path))
+            
+            output_path = fp32_path
+            if quantize:
+                output_path = get_exported_model_path('yolo', export_format, True, output_dir)
+                self._quantize_onnx(fp32_path, output_path)
+            
+            logger.info(f"YOLO exported to {output_path}")
+            return output_path
+        except Exception as e:
+            logger.error(f"Error exporting YOLO model: {e}")
+            return None
+    
+    def _quantize_onnx(self, input_path: Path, output_path: Path):
+        """Quantification int8 dynamique d'un modèle ONNX (poids int8, activations à la volée)"""
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(str(input_path), str(output_path), weight_type=QuantType.QInt8)
+    
+    def check_efficientnet_parity(self, exported_path: Path, sample_inputs: Optional[torch.Tensor] = None,
+                                  quantized: bool = False, sample_images: Optional[List] = None) -> Dict:
+        """
+        Comparer les probabilités de l'artefact exporté avec le modèle eager
+        
+        Sur du bruit aléatoire les probabilités sont proches de l'uniforme et
+        l'accord top-1 ne dit rien du comportement en production : les images
+        réelles passent par le même prétraitement que SkinDiagnostic.transform_eff.
+        
+        Args:
+            exported_path: Artefact .onnx ou TorchScript
+            sample_inputs: Tenseur (N, 3, 224, 224) déjà normalisé
+            quantized: Appliquer les tolérances int8
+            sample_images: Chemins ou tableaux BGR, prioritaires sur sample_inputs
+                (tenseur aléatoire si aucun des deux n'est fourni)
+        
+        Returns:
+            Rapport {max_abs_diff, top1_agreement, samples, inputs, passed}
+        """
+        model = self.models.get('efficientnet') or self.load_efficientnet_model()
+        if sample_images:
+            sample_inputs, inputs = efficientnet_inputs(sample_images), 'images'
+        elif sample_inputs is not None:
+            inputs = 'tensor'
+        else:
+            sample_inputs = torch.randn(16, 3, 224, 224, generator=torch.Generator().manual_seed(0))
+            inputs = 'random'
+        
+        with torch.no_grad():
+            eager = torch.softmax(model.cpu().eval()(sample_inputs), dim=1).numpy()
+        
+        exported_path = Path(exported_path)
+        if exported_path.suffix == '.onnx':
+            import onnxruntime as ort
+            session = ort.InferenceSession(str(exported_path), providers=['CPUExecutionProvider'])
+            logits = session.run(None, {session.get_inputs()[0].name: sample_inputs.numpy()})[0]
+            exported = torch.softmax(torch.from_numpy(logits), dim=1).numpy()
+        else:
+            scripted = torch.jit.load(str(exported_path), map_location='cpu')
+            with torch.no_grad():
+                exported = torch.softmax(scripted(sample_inputs), dim=1).numpy()
+        
+        report = self._parity_report(eager, exported, quantized)
+        report['inputs'] = inputs
+        return report
+    
+    def check_yolo_parity(self, exported_path: Path, sample_images: Optional[List] = None,
+                          quantized: bool = False, conf: float = 0.1) -> Dict:
+        """
+        Comparer les confiances par classe de l'artefact YOLO exporté avec le modèle eager
+        
+        Pour chaque image on compare la confiance maximale par classe (le vecteur
+        utilisé par SkinDiagnostic) et la classe dominante. Le modèle eager est
+        appelé image par image ; l'artefact reçoit les images de mêmes
+        dimensions en un seul lot, comme SkinDiagnostic.detect_troubles_batch,
+        ce qui vérifie aussi l'inférence par lots de l'export.
+        
+        Args:
+            exported_path: Artefact YOLO exporté
+            sample_images: Chemins ou tableaux BGR (images aléatoires par défaut)
+            quantized: Appliquer les tolérances int8
+            conf: Seuil de confiance des détections
+        """
+        eager_model = self.models.get('yolo') or self.load_yolo_model()
+        exported_model = YOLO(str(exported_path), task='detect')
+        
+        if not sample_images:
+            rng = np.random.default_rng(0)
+            sample_images = [rng.integers(0, 256, (640, 640, 3), dtype=np.uint8) for _ in range(4)]
+        
+        num_classes = len(eager_model.names)
+        
+        # Orientation EXIF ignorée, comme SkinDiagnostic.load_image
+        images = [
+            image if isinstance(image, np.ndarray) else cv2.imread(str(image), cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION)
+            for image in sample_images
+        ]
+        
+        def class_confidences(model, batched=False):
+            groups = {}
+            for i, image in enumerate(images):
+                groups.setdefault(image.shape if batched else i, []).append(i)
+            rows = np.zeros((len(images), num_classes))
+            for indices in groups.values():
+                results = model([images[i] for i in indices], conf=conf, verbose=False)
+                for i, r in zip(indices, results):
+                    for cls_id, score in zip(r.boxes.cls.cpu().numpy().astype(int), r.boxes.conf.cpu().numpy()):
+                        rows[i, cls_id] = max(rows[i, cls_id], float(score))
+            return rows
+        
+        return self._parity_report(
+            class_confidences(eager_model), class_confidences(exported_model, batched=True), quantized
+        )
+    
+    def _parity_report(self, eager: np.ndarray, exported: np.ndarray, quantized: bool) -> Dict:
+        """Écart maximal et accord top-1 entre sorties eager et exportées"""
+        max_abs_diff = float(np.max(np.abs(eager - exported))) if eager.size else 0.0
+        top1_agreement = float(np.mean(eager.argmax(axis=1) == exported.argmax(axis=1))) if len(eager) else 1.0
+        
+        suffix = '_int8' if quantized else ''
+        passed = (max_abs_diff <= EXPORT_PARITY_CONFIG[f'max_abs_diff{suffix}'] and
+                  top1_agreement >= EXPORT_PARITY_CONFIG[f'min_top1_agreement{suffix}'])
+        return {
+            'max_abs_diff': max_abs_diff,
+            'top1_agreement': top1_agreement,
+            'samples': int(len(eager)),
+            'passed': bool(passed),
+        }
+    
+    def export_all(self, export_format: str = 'onnx', quantize: bool = False,
+                   output_dir: Optional[Path] = None, sample_images: Optional[List] = None) -> Dict:
+        """
+        Exporter EfficientNet et YOLO, vérifier la parité et écrire manifest.json
+        
+        Args:
+            sample_images: Images réelles (chemins ou tableaux BGR) utilisées par
+                les contrôles de parité des deux modèles
+        
+        Returns:
+            Manifest {model_name: {path, format, quantized, parity}}
+        
+        Raises:
+            ValueError si la combinaison format / quantification n'est pas supportée
+        """
+        check_export_options(export_format, quantize)
+        output_dir = Path(output_dir or EXPORTED_MODELS_PATH)
+        manifest = {'exported_at': datetime.now().isoformat(), 'models': {}}
+        if not sample_images:
+            logger.warning("No sample images given, parity is only checked on synthetic inputs")
+        
+        exports = {
+            'efficientnet': (self.export_efficientnet(export_format, quantize, output_dir),
+                             lambda path: self.check_efficientnet_parity(
+                                 path, quantized=quantize, sample_images=sample_images)),
+            'yolo': (self.export_yolo(export_format, quantize, output_dir),
+                     lambda path: self.check_yolo_parity(path, sample_images, quantized=quantize)),
+        }
+        
+        for model_name, (path, check_parity) in exports.items():
+            if path is None:
+                manifest['models'][model_name] = {'error': 'export failed'}
+                continue
+            try:
+                parity = check_parity(path)
+            except Exception as e:
+                logger.error(f"Parity check failed for {model_name}: {e}")
+                parity = {'passed': False, 'error': str(e)}
+            if not parity.get('passed'):
+                logger.warning(f"{model_name} export does not match the eager model: {parity}")
+            manifest['models'][model_name] = {
+                'path': path.name,
+                'format': export_format,
+                'quantized': '.int8.' in path.name,
+                'parity': parity,
+            }
+        
+        with open(output_dir / 'manifest.json', 'w') as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
@@ -14,7 +14,6 @@ sys.path.insert(0, str(BASE_DIR))
 
 try:
     from mlops.deployment.model_registry import ModelRegistry
-    from mlops.deployment.model_loader import ModelLoader
     from mlops.monitoring.model_monitor import ModelMonitor
     from mlops.monitoring.performance_tracker import PerformanceTracker
     from mlops.monitoring.alerting import AlertingSystem
@@ -23,6 +22,15 @@ except ImportError as e:
     MLOPS_AVAILABLE = False
     logging.getLogger(__name__).warning(f"MLOps modules not available: {e}")
 
+# Singleton créé au premier usage (l'import de ce module ne charge rien)
+try:
+    from skin_ai.lazy_services import LazyService
+except ImportError:
+    from django.utils.functional import SimpleLazyObject
+
+    def LazyService(factory, name):
+        return SimpleLazyObject(factory)
+
 logger = logging.getLogger(__name__)
 
 class DjangoMLOpsIntegration:
@@ -48,6 +56,14 @@ class DjangoMLOpsIntegration:
         self.use_registry = use_registry
         self.enabled = True
         
+        try:
+            # Import différé : ModelLoader importe torch et ultralytics
+            from mlops.deployment.model_loader import ModelLoader
+        except ImportError as e:
+            self.enabled = False
+            logger.warning(f"MLOps modules not available: {e}")
+            return
+        
         try:
             self.registry = ModelRegistry() if use_registry else None
             self.model_loader = ModelLoader(use_registry=use_registry)
@@ -151,6 +167,6 @@ class DjangoMLOpsIntegration:
             return {}
 
 
-# Instance globale pour Django
-mlops_integration = DjangoMLOpsIntegration(use_registry=False)
+# Instance globale pour Django (créée au premier usage)
+mlops_integration = LazyService(lambda: DjangoMLOpsIntegration(use_registry=False), 'mlops_integration')
 
@@ -0,0 +1,49 @@
+"""
+Script pour exporter EfficientNet et YOLO vers ONNX / TorchScript
+
+Usage:
+    python mlops/scripts/export_models.py --format onnx
+    python mlops/scripts/export_models.py --format onnx --quantize --images data/samples/*.jpg
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from mlops.deployment.model_loader import ModelLoader, EXPORT_FORMATS, check_export_options
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporter les modèles de détection pour l'inférence CPU")
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default='onnx', help="Format d'export")
+    parser.add_argument('--quantize', action='store_true', help='Quantification int8 dynamique (ONNX uniquement)')
+    parser.add_argument('--output-dir', default=None, help='Dossier des artefacts exportés')
+    parser.add_argument('--images', nargs='*', default=None, help='Images réelles pour le contrôle de parité (EfficientNet et YOLO)')
+    args = parser.parse_args()
+    try:
+        check_export_options(args.format, args.quantize)
+    except ValueError as e:
+        parser.error(str(e))
+
+    loader = ModelLoader()
+    manifest = loader.export_all(
+        export_format=args.format,
+        quantize=args.quantize,
+        output_dir=args.output_dir,
+        sample_images=args.images
+    )
+    print(json.dumps(manifest, indent=2))
+
+    # Code de sortie non nul si un export ne passe pas le contrôle de parité
+    failed = [name for name, info in manifest['models'].items() if not info.get('parity', {}).get('passed')]
+    if failed:
+        print(f"❌ Parité non respectée pour: {', '.join(failed)}")
+        sys.exit(1)
+    print("✅ Export terminé, parité vérifiée")
+
+
+if __name__ == '__main__':
+    main()
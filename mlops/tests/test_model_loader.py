@@ -0,0 +1,98 @@
+"""
+Tests des contrôles de parité des modèles exportés
+"""
+import cv2
+import numpy as np
+import pytest
+import torch
+from mlops.deployment.model_loader import ModelLoader
+
+
+class TinyClassifier(torch.nn.Module):
+    """Classifieur 3 classes : moyenne des canaux x matrice fixe"""
+
+    def __init__(self, weight):
+        super().__init__()
+        self.weight = torch.nn.Parameter(torch.tensor(weight))
+
+    def forward(self, x):
+        return x.mean(dim=(2, 3)) @ self.weight
+
+
+WEIGHT = [[4.0, -2.0, 1.0], [-1.0, 3.0, -2.0], [0.5, 0.5, 3.5]]
+
+
+def sample_images(tmp_path):
+    """Images teintées (une classe dominante chacune) : chemins et tableaux BGR"""
+    images = []
+    for channel in range(3):
+        img = np.full((120, 90, 3), 40, dtype=np.uint8)
+        img[..., 2 - channel] = 230  # BGR
+        path = tmp_path / f'image_{channel}.png'
+        cv2.imwrite(str(path), img)
+        images += [str(path), img]
+    return images
+
+
+def export(tmp_path, weight):
+    """Artefact TorchScript d'un TinyClassifier"""
+    path = tmp_path / 'efficientnet.torchscript.pt'
+    torch.jit.trace(TinyClassifier(weight).eval(), torch.randn(1, 3, 224, 224)).save(str(path))
+    return path
+
+
+def test_efficientnet_parity_on_sample_images(tmp_path):
+    """Les images réelles passent par le prétraitement de production"""
+    loader = ModelLoader()
+    loader.models['efficientnet'] = TinyClassifier(WEIGHT)
+
+    report = loader.check_efficientnet_parity(export(tmp_path, WEIGHT), sample_images=sample_images(tmp_path))
+    assert report['inputs'] == 'images'
+    assert report['samples'] == 6
+    assert report['top1_agreement'] == 1.0
+    assert report['passed']
+
+
+def test_efficientnet_parity_detects_top1_disagreement(tmp_path):
+    """Un export aux classes permutées échoue sur les images réelles"""
+    loader = ModelLoader()
+    loader.models['efficientnet'] = TinyClassifier(WEIGHT)
+    permuted = [row[1:] + row[:1] for row in WEIGHT]
+
+    report = loader.check_efficientnet_parity(export(tmp_path, permuted), sample_images=sample_images(tmp_path))
+    assert report['top1_agreement'] < 1.0
+    assert not report['passed']
+
+
+def test_export_all_checks_both_models_on_sample_images(tmp_path, monkeypatch):
+    """export_all transmet les images aux deux contrôles de parité"""
+    loader = ModelLoader()
+    images = sample_images(tmp_path)
+    received = {}
+
+    def check_parity(model_name):
+        def check(path, sample_images=None, quantized=False):
+            received[model_name] = sample_images
+            return {'passed': True}
+        return check
+
+    monkeypatch.setattr(loader, 'export_efficientnet', lambda *args: tmp_path / 'efficientnet.onnx')
+    monkeypatch.setattr(loader, 'export_yolo', lambda *args: tmp_path / 'yolo.onnx')
+    monkeypatch.setattr(loader, 'check_efficientnet_parity', check_parity('efficientnet'))
+    monkeypatch.setattr(loader, 'check_yolo_parity', check_parity('yolo'))
+
+    manifest = loader.export_all(output_dir=tmp_path, sample_images=images)
+    assert received == {'efficientnet': images, 'yolo': images}
+    assert all(info['parity']['passed'] for info in manifest['models'].values())
+
+
+def test_torchscript_quantization_rejected(tmp_path):
+    """La quantification int8 n'est proposée que pour ONNX"""
+    loader = ModelLoader()
+    loader.models['efficientnet'] = TinyClassifier(WEIGHT)
+
+    assert loader.export_efficientnet('torchscript', quantize=True, output_dir=tmp_path) is None
+    assert not list(tmp_path.iterdir())
+    with pytest.raises(ValueError):
+        loader.export_all(export_format='torchscript', quantize=True, output_dir=tmp_path)
+    assert loader.export_efficientnet('torchscript', output_dir=tmp_path) == tmp_path / 'efficientnet.torchscript.pt'